@@ -0,0 +1,166 @@
+# aggregation.py
+import numpy as np
+from flwr.common import bytes_to_ndarray
+from compression import ENCODINGS, _is_float
+
+def _as_array(tensor):
+    """Serileştirilmiş (bytes) tensor'u tek tek aç: aynı anda tek tensor bellekte"""
+    return bytes_to_ndarray(tensor) if isinstance(tensor, bytes) else tensor
+
+def encoded_count(encoding, reference):
+    """Kodlanmış listede beklenen dizi sayısı (compression.UpdateEncoder formatı)"""
+    if encoding in ("float32", "float16"):
+        return len(reference)
+    return sum(2 if _is_float(ref) else 1 for ref in reference)
+
+class StreamingAggregator:
+    """
+    Ağırlıklı delta toplamı için akışlı (streaming) aggregator.
+
+    Her client güncellemesi geldiği gibi, önceden ayrılmış bir scratch
+    buffer'a çözülür (decode + global modele göre delta) ve toplam buffer'ına
+    eklenir: sums += w * Δ. Client başına delta listesi ya da katman başına
+    geçici dizi tutulmaz; bellek O(model) (sums + scratch). Buffer'lar şekil
+    değişmedikçe round'lar arasında yeniden kullanılır.
+    """
+    def __init__(self, dtype=np.float64):
+        self.dtype = np.dtype(dtype)
+        self.sums = None
+        self.scratch = None
+        self.total_weight = 0.0
+        self.count = 0
+
+    def reset(self, reference):
+        """Yeni aggregation: buffer'ları sıfırla (şekiller değiştiyse yeniden ayır)"""
+        shapes = [ref.shape for ref in reference]
+        if self.sums is None or [s.shape for s in self.sums] != shapes:
+            self.sums = [np.zeros(shape, dtype=self.dtype) for shape in shapes]
+            self.scratch = [np.empty(shape, dtype=self.dtype) for shape in shapes]
+        else:
+            for s in self.sums:
+                s.fill(0)
+        self.total_weight = 0.0
+        self.count = 0
+
+    def add(self, tensors, encoding, is_delta, reference, weight, norm_weight=None):
+        """
+        Bir client güncellemesini ekle: sums += weight * Δ.
+        tensors: kodlanmış liste (bytes ya da ndarray), reference: client'ın aldığı global model.
+        norm_weight: ortalamanın paydasına eklenecek ağırlık (varsayılan: weight;
+        async'te staleness indirimi paya girer, paydaya girmez).
+        Hatalı güncelleme ValueError verir ve toplamı değiştirmez.
+        """
+        self._decode(tensors, encoding, is_delta, reference)
+        for s, d in zip(self.sums, self.scratch):
+            np.multiply(d, weight, out=d)
+            np.add(s, d, out=s)
+        self.total_weight += weight if norm_weight is None else norm_weight
+        self.count += 1
+
+    def _decode(self, tensors, encoding, is_delta, reference):
+        """Güncellemeyi scratch buffer'larına delta olarak çöz (topk her zaman delta)"""
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Bilinmeyen kodlama: {encoding}")
+        expected = encoded_count(encoding, reference)
+        if len(tensors) != expected:
+            raise ValueError(f"Kodlanmış tensor sayısı uyumsuz ({len(tensors)} != {expected})")
+
+        pos = 0
+        for ref, out in zip(reference, self.scratch):
+            if not _is_float(ref) or encoding in ("float32", "float16"):
+                array = _as_array(tensors[pos])
+                pos += 1
+                if array.shape != ref.shape:
+                    raise ValueError(f"Şekil uyumsuz {array.shape} != {ref.shape}")
+                if not is_delta:
+                    np.subtract(array, ref, out=out, dtype=self.dtype)  # Çözme + delta tek geçiş
+                    continue
+                np.copyto(out, array, casting="unsafe")
+            elif encoding == "int8":
+                q, scale = _as_array(tensors[pos]), _as_array(tensors[pos + 1])
+                pos += 2
+                if q.shape != ref.shape:
+                    raise ValueError(f"Şekil uyumsuz {q.shape} != {ref.shape}")
+                np.multiply(q, self.dtype.type(scale[0]), out=out)
+            else:
+                idx, values = _as_array(tensors[pos]), _as_array(tensors[pos + 1])
+                pos += 2
+                if idx.shape != values.shape or (idx.size and (idx.min() < 0 or idx.max() >= ref.size)):
+                    raise ValueError("Geçersiz topk indeksleri")
+                out.fill(0)
+                out.reshape(-1)[idx] = values
+                continue  # topk zaten delta
+
+            if not is_delta:
+                np.subtract(out, ref, out=out)
+
+    def result(self, reference, scale=1.0, total_weight=None):
+        """
+        Yeni global model: reference + scale * sums / total_weight
+        (total_weight verilmezse eklenen ağırlıkların toplamı). Ağırlık sıfırsa None.
+        """
+        total = self.total_weight if total_weight is None else total_weight
+        if total <= 0:
+            return None
+
+        new_global = []
+        for ref, s, tmp in zip(reference, self.sums, self.scratch):
+            np.multiply(s, scale / total, out=tmp)
+            np.add(tmp, ref, out=tmp)
+            if not _is_float(ref):
+                np.rint(tmp, out=tmp)
+            new_global.append(tmp.astype(ref.dtype))
+        return new_global
+
+def benchmark(num_clients=40, encoding="float32"):
+    """Eski yol (tüm delta'lar + katman başına toplam) vs streaming: süre ve tepe bellek"""
+    import time
+    import tracemalloc
+    from flwr.common import ndarrays_to_parameters
+    from model import get_model, get_ndarrays
+    from compression import UpdateEncoder, compute_delta, decode_update
+
+    reference = get_ndarrays(get_model())
+    encoder = UpdateEncoder(encoding)
+    rng = np.random.default_rng(0)
+    updates = []
+    for _ in range(num_clients):
+        arrays = [(r + rng.standard_normal(r.shape).astype(r.dtype) * 0.01) if _is_float(r) else r
+                  for r in reference]
+        encoded, _ = encoder.encode(arrays)
+        updates.append((ndarrays_to_parameters(encoded).tensors, float(rng.uniform(1, 3))))
+
+    def naive():
+        deltas = [(compute_delta(decode_update([bytes_to_ndarray(x) for x in t], encoding, reference),
+                                 reference), w) for t, w in updates]
+        total = sum(w for _, w in deltas)
+        return [r + sum(d[i].astype(np.float64) * w for d, w in deltas) / total
+                for i, r in enumerate(reference)]
+
+    aggregator = StreamingAggregator()
+
+    def streaming():
+        aggregator.reset(reference)
+        for tensors, w in updates:
+            aggregator.add(tensors, encoding, False, reference, w)
+        return aggregator.result(reference)
+
+    for name, fn in (("Naive", naive), ("Streaming", streaming)):
+        fn()  # ısınma (streaming buffer'ları ayrılır)
+        tracemalloc.start()
+        start = time.perf_counter()
+        out = fn()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f" {name:10s}: {elapsed*1000:7.1f} ms | tepe bellek {peak / (1024 * 1024):7.1f} MB")
+    expected = naive()
+    diff = max(float(np.abs(a.astype(np.float64) - b).max()) for a, b in zip(out, expected))
+    print(f" Max fark: {diff:.2e}")
+
+if __name__ == "__main__":
+    import sys
+
+    num_clients = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    print(f" Aggregation benchmark: {num_clients} client")
+    benchmark(num_clients)
@@ -0,0 +1,219 @@
+# async_server.py
+import time
+import concurrent.futures
+import flwr as fl
+from typing import Dict, Optional
+from flwr.common import Code, FitIns, FitRes, Parameters, parameters_to_ndarrays, ndarrays_to_parameters
+from flwr.server.client_proxy import ClientProxy
+from flwr.server.history import History
+from server import PriorityFedAvg, priority_weighted_average, fit_config
+
+def polynomial_staleness(staleness, exponent=0.5):
+    """FedAsync polinom indirimi: s(τ) = (1 + τ)^-a"""
+    return (1.0 + staleness) ** (-exponent)
+
+class AsyncPriorityFedAvg(PriorityFedAvg):
+    """
+    Asenkron, staleness-aware PriorityFedAvg (FedBuff).
+
+    Round beklenmez: her gelen güncelleme buffer'a eklenir, K güncelleme
+    birikince global modele uygulanır ve model versiyonu artar:
+        global += server_lr * Σ(w_i * s(τ_i) * Δ_i) / Σ w_i
+    w_i: priority × network quality × num_examples × iş oranı, τ_i: client'ın eğitime
+    başladığı versiyondan bu yana geçen güncelleme sayısı. Güncellemeler
+    StreamingAggregator'da birikir; buffer delta listesi değil sayaçtır.
+    """
+
+    def __init__(self, *args, buffer_size=3, staleness_exponent=0.5, server_lr=1.0,
+                 max_staleness=10, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buffer_size = buffer_size
+        self.staleness_exponent = staleness_exponent
+        self.server_lr = server_lr
+        self.max_staleness = max_staleness
+
+        self.model_version = 0
+        self.versions = {}       # versiyon -> global ndarrays (delta referansı)
+        self._parameters = {}    # versiyon -> serileştirilmiş Parameters
+        self.buffered = 0
+
+    def set_global(self, ndarrays):
+        """Yeni global versiyonu kaydet, çok eski versiyonları at"""
+        self.global_ndarrays = ndarrays
+        self.versions[self.model_version] = ndarrays
+        self._parameters[self.model_version] = ndarrays_to_parameters(ndarrays)
+
+        oldest = self.model_version - self.max_staleness
+        for version in [v for v in self.versions if v < oldest]:
+            del self.versions[version]
+            del self._parameters[version]
+
+    def global_parameters(self) -> Parameters:
+        return self._parameters[self.model_version]
+
+    def fit_ins(self) -> FitIns:
+        """Güncel global model ile fit talimatı"""
+        config = dict(self.on_fit_config_fn(self.model_version + 1)) if self.on_fit_config_fn else {}
+        config["model_version"] = self.model_version
+        return FitIns(self.global_parameters(), config)
+
+    def add_update(self, client_proxy: ClientProxy, fit_res: FitRes, base_version: int) -> bool:
+        """Gelen güncellemeyi buffer'a ekle; buffer dolduysa uygula (True döner)"""
+        metrics = fit_res.metrics
+        drone_id = metrics.get("drone_id", "?")
+        staleness = self.model_version - base_version
+
+        if metrics.get("skipped", False) or not fit_res.parameters.tensors:
+            print(f"   ⚠️  Drone {drone_id}: boş/atlanan güncelleme")
+            return False
+        if base_version not in self.versions:
+            print(f"   ⚠️  Drone {drone_id}: çok eski güncelleme (τ={staleness}), atıldı")
+            return False
+
+        if self.buffered == 0:
+            self.aggregator.reset(self.global_ndarrays)
+
+        weight = self.update_weight(fit_res)
+        discount = polynomial_staleness(staleness, self.staleness_exponent)
+        try:
+            # İndirim paya girer, paydaya girmez: Σ(w_i * s(τ_i) * Δ_i) / Σ w_i
+            self.accumulate(fit_res, weight * discount, reference=self.versions[base_version],
+                            norm_weight=weight)
+        except ValueError as e:
+            print(f"   ❌ Drone {drone_id}: Decode hatası ({e})")
+            return False
+
+        self.buffered += 1
+        print(f"   📥 Drone {drone_id} ({metrics.get('priority', '?')}): v{base_version} "
+              f"τ={staleness} s={discount:.2f} | buffer {self.buffered}/{self.buffer_size}")
+
+        if self.buffered < self.buffer_size:
+            return False
+        self.flush()
+        return True
+
+    def flush(self):
+        """Biriken güncellemeleri staleness indirimi ile global modele uygula"""
+        if not self.buffered:
+            return
+
+        new_global = self.aggregator.result(self.global_ndarrays, scale=self.server_lr)
+        self.buffered = 0
+
+        if new_global is not None:
+            new_global = self.server_step(new_global)
+            self.model_version += 1
+            self.set_global(new_global)
+            self.save_checkpoint(self.model_version)
+            print(f"   🔄 Global model v{self.model_version}")
+
+class AsyncFedServer(fl.server.Server):
+    """
+    Asenkron Flower server döngüsü.
+
+    Her client bağımsız çalışır: biten client'ın güncellemesi strategy
+    buffer'ına verilir ve client hemen güncel global modelle yeniden
+    görevlendirilir. Yavaş drone'lar hızlıları bekletmez.
+    num_rounds = global model güncelleme (versiyon) sayısı.
+    """
+
+    def fit(self, num_rounds: int, timeout: Optional[float]):
+        history = History()
+        strategy: AsyncPriorityFedAvg = self.strategy
+
+        initial = self._get_initial_parameters(server_round=0, timeout=timeout)
+        strategy.set_global(parameters_to_ndarrays(initial))
+        self._evaluate_centralized(history, 0)
+
+        # Bağlanan client'ları bekle
+        self._client_manager.wait_for(strategy.min_available_clients)
+        clients = list(self._client_manager.all().values())
+        print(f"\n⚡ Async FL: {len(clients)} drone, buffer K={strategy.buffer_size}, "
+              f"{num_rounds} global güncelleme")
+
+        start_time = time.perf_counter()
+        in_flight: Dict[concurrent.futures.Future, tuple] = {}
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers or len(clients))
+
+        def dispatch(client_proxy):
+            ins = strategy.fit_ins()
+            future = executor.submit(client_proxy.fit, ins, timeout, strategy.model_version)
+            in_flight[future] = (client_proxy, strategy.model_version)
+
+        for client_proxy in clients:
+            dispatch(client_proxy)
+
+        while strategy.model_version < num_rounds and in_flight:
+            done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                client_proxy, base_version = in_flight.pop(future)
+                try:
+                    fit_res = future.result()
+                except Exception as e:
+                    print(f"   ❌ Client {client_proxy.cid}: {e}")
+                    fit_res = None
+
+                if fit_res is not None and fit_res.status.code == Code.OK:
+                    if strategy.add_update(client_proxy, fit_res, base_version):
+                        elapsed = time.perf_counter() - start_time
+                        print(f"   ⏱️  v{strategy.model_version} @ {elapsed:.1f}s")
+                        self._evaluate_centralized(history, strategy.model_version)
+
+                if strategy.model_version < num_rounds:
+                    dispatch(client_proxy)
+
+        # Hâlâ eğitimde olanların sonucu kullanılmaz
+        executor.shutdown(wait=True)
+        elapsed = time.perf_counter() - start_time
+
+        # Son model ile federated evaluation
+        self.parameters = strategy.global_parameters()
+        res_fed = self.evaluate_round(server_round=strategy.model_version, timeout=timeout)
+        if res_fed is not None and res_fed[0] is not None:
+            loss_fed, metrics_fed, _ = res_fed
+            history.add_loss_distributed(server_round=strategy.model_version, loss=loss_fed)
+            history.add_metrics_distributed(server_round=strategy.model_version, metrics=metrics_fed)
+            print(f"\n📊 v{strategy.model_version} evaluation: {metrics_fed} ({elapsed:.1f}s)")
+
+        return history, elapsed
+
+    def _evaluate_centralized(self, history, version):
+        res = self.strategy.evaluate(version, parameters=self.strategy.global_parameters())
+        if res is not None:
+            loss, metrics = res
+            history.add_loss_centralized(server_round=version, loss=loss)
+            history.add_metrics_centralized(server_round=version, metrics=metrics)
+
+def main(num_updates=12, buffer_size=3):
+    """Asenkron (FedBuff) server - yavaş drone'lar round'u bekletmez"""
+    print("🌸 Flower Async Federated Learning Server (FedBuff)")
+    print("="*60)
+
+    strategy = AsyncPriorityFedAvg(
+        min_available_clients=5,
+        fraction_evaluate=0.8,
+        min_evaluate_clients=3,
+        evaluate_metrics_aggregation_fn=priority_weighted_average,
+        on_fit_config_fn=fit_config,
+        buffer_size=buffer_size,
+    )
+    server = AsyncFedServer(
+        client_manager=fl.server.SimpleClientManager(),
+        strategy=strategy,
+    )
+
+    print("📡 Adres: 127.0.0.1:8080")
+    print("⏳ 5 drone'un bağlanması bekleniyor.. .\n")
+
+    fl.server.start_server(
+        server_address="127.0.0.1:8080",
+        server=server,
+        config=fl.server.ServerConfig(num_rounds=num_updates),
+    )
+
+if __name__ == "__main__":
+    import sys
+
+    num_updates = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    buffer_size = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    main(num_updates, buffer_size)
@@ -4,92 +4,37 @@ import flwr as fl
 import time
 import random
 import numpy as np
-from collections import OrderedDict
-from model import get_model
+from model import get_model, get_ndarrays, set_ndarrays
 from dataset import get_dataloaders
 from train import train_model, test
-
-# Drone network profilleri
-DRONE_PROFILES = {
-    1: {
-        "name": "Sehir Merkezi",
-        "priority": "LOW",
-        "packet_loss": 0.05,  # 5%
-        "latency_range": (0.1, 0.5),  # saniye
-        "disconnect_prob": 0.01  # 1%
-    },
-    2: {
-        "name": "Sanayi Bolgesi",
-        "priority": "MEDIUM",
-        "packet_loss": 0.15,  # 15%
-        "latency_range": (0.3, 1.0),
-        "disconnect_prob": 0.05
-    },
-    3: {
-        "name": "Orman (KRITIK)",
-        "priority": "HIGH",
-        "packet_loss": 0.40,  # 40% - Çok kötü! 
-        "latency_range":  (1.0, 3.0),
-        "disconnect_prob": 0.15  # 15%
-    },
-    4: {
-        "name": "Daglik Alan",
-        "priority": "HIGH",
-        "packet_loss":  0.35,  # 35%
-        "latency_range":  (0.8, 2.5),
-        "disconnect_prob":  0.12
-    },
-    5: {
-        "name": "Karma/Test",
-        "priority": "LOW",
-        "packet_loss": 0.08,  # 8%
-        "latency_range": (0.2, 0.7),
-        "disconnect_prob":  0.02
-    }
-}
-
-class NetworkSimulator:
-    """Network koşullarını simüle et"""
-    
-    def __init__(self, drone_id):
-        self.profile = DRONE_PROFILES[drone_id]
-        self.drone_id = drone_id
-    
-    def simulate_latency(self):
-        """Rastgele gecikme ekle"""
-        min_lat, max_lat = self.profile["latency_range"]
-        latency = random.uniform(min_lat, max_lat)
-        print(f"    Network latency: {latency:.2f}s")
-        time.sleep(latency)
-    
-    def check_packet_loss(self):
-        """Paket kaybı kontrolü"""
-        if random.random() < self.profile["packet_loss"]:
-            print(f"   ⚠️  Paket kaybı!  ({self.profile['packet_loss']*100:.0f}% şansı)")
-            return True
-        return False
-    
-    def check_disconnection(self):
-        """Bağlantı kesintisi kontrolü"""
-        if random.random() < self.profile["disconnect_prob"]:
-            print(f"    Bağlantı kesildi!  Yeniden bağlanılıyor...")
-            time.sleep(random.uniform(2, 5))  # Reconnect süresi
-            return True
-        return False
-    
-    def get_priority_weight(self):
-        """Öncelik ağırlığı"""
-        priority_weights = {"HIGH": 2.0, "MEDIUM": 1.5, "LOW": 1.0}
-        return priority_weights[self.profile["priority"]]
+from feature_cache import FeatureCache
+from compression import UpdateEncoder, WIRE_RATIO, wire_bytes, compute_delta
+from shared_arena import shared_parameter_views
+from network import DRONE_PROFILES, NetworkSimulator, RealClock, VirtualClock, get_drone_profile
 
 class DroneClient(fl.client.NumPyClient):
     """
     Flower Client - Network challenges ile
     """
-    def __init__(self, drone_id, epochs_per_round=7):
+    def __init__(self, drone_id, epochs_per_round=7, resident_data=True, encoding=None,
+                 delta_updates=False, data_id=None, virtual_clock=False, trace=None):
         self.drone_id = drone_id
+        self.profile = get_drone_profile(drone_id)
         self. epochs_per_round = epochs_per_round
-        self.network = NetworkSimulator(drone_id)
+        
+        # virtual_clock: ağ beklemeleri uyumaz, simüle zamanı ilerletir (simulation.py)
+        # trace: kayıtlı link izi (network.LinkTrace), profil gecikme/kayıp/bant genişliğinin yerine
+        self.network = NetworkSimulator(drone_id, clock=VirtualClock() if virtual_clock else RealClock(),
+                                        trace=trace)
+        
+        # Upload kodlaması (varsayılan: drone profili; server fit config ile ezebilir)
+        self.encoder = UpdateEncoder(encoding or self.profile.get("encoding", "float32"))
+        
+        # Delta modu: ağırlıklar yerine alınan global modele göre fark gönderilir
+        self.delta_updates = delta_updates
+        
+        # Paylaşılan bellek aktarımı (aynı makinedeki server): blok adı -> SharedMemory
+        self._shm_handles = {}
         
         # Device
         self.device = torch.device('mps' if torch.backends.mps.is_available() else 'cpu')
@@ -97,16 +42,26 @@ class DroneClient(fl.client.NumPyClient):
         # Model
         self.model = get_model().to(self.device)
         
-        # Data
+        # Data (resident: tüm veri bellekte tek tensor, collate yolu yok)
+        # data_id: simülasyonda veri dizini drone id'sinden farklı olabilir
+        self.data_id = data_id if data_id is not None else drone_id
+        self.resident_data = resident_data
         self.train_loader, self.test_loader = get_dataloaders(
-            drone_id=drone_id,
-            batch_size=16
+            drone_id=self.data_id,
+            batch_size=16,
+            resident=resident_data
         )
         
-        profile = DRONE_PROFILES[drone_id]
+        # Test seti global feature'ları: global backbone değişmeyen round'larda
+        # (tüm güncellemeler kaybolduğunda) evaluation sadece head'i çalıştırır
+        self.feature_cache = FeatureCache(max_entries=len(self.test_loader.dataset))
+        
+        profile = self.profile
         print(f" Drone {drone_id} ({profile['name']}) - Priority: {profile['priority']}")
         print(f"   Network: Loss={profile['packet_loss']*100:.0f}%, "
-              f"Latency={profile['latency_range'][0]}-{profile['latency_range'][1]}s")
+              f"Latency={profile['latency_range'][0]}-{profile['latency_range'][1]}s, "
+              f"BW={profile['bandwidth_mbps']} Mbit/s, Upload: {self.encoder.encoding}"
+              f"{', trace' if trace is not None else ''}")
     
     def get_parameters(self, config):
         """Model parametrelerini döndür"""
@@ -118,73 +73,192 @@ class DroneClient(fl.client.NumPyClient):
             # Paket kayıpsa boş liste döndür (retry gerekecek)
             return []
         
-        return [val.cpu().numpy() for _, val in self.model.state_dict().items()]
+        return get_ndarrays(self.model, self.exchange_keys(config))
+    
+    def exchange_keys(self, config):
+        """
+        Exchange edilen state_dict anahtarları: server config'te "param_keys"
+        gönderdiyse (örn. FedBN) isimle o şema, yoksa tüm state_dict
+        """
+        if config and config.get("param_keys"):
+            return config["param_keys"].split(",")
+        return list(self.model.state_dict().keys())
     
-    def set_parameters(self, parameters):
-        """Server'dan gelen parametreleri modele yükle"""
+    def received_parameters(self, parameters, config):
+        """
+        Server'ın gönderdiği global parametreler. Config'te paylaşılan bellek
+        bilgisi varsa mesaj boştur; parametreler bloktaki view'lardır (kopya yok).
+        """
+        if parameters or not (config and config.get("shm_name")):
+            return parameters
+        state_dict = self.model.state_dict()
+        templates = [(tuple(state_dict[k].shape), state_dict[k].cpu().numpy().dtype)
+                     for k in self.exchange_keys(config)]
+        return shared_parameter_views(config, templates, self._shm_handles)
+    
+    def set_parameters(self, parameters, config=None):
+        """Server'dan gelen parametreleri modele yükle (anahtar isimleriyle eşleştirerek)"""
+        parameters = self.received_parameters(parameters, config)
         if not parameters:  # Boş gelirse skip
             print(f"   ⚠️  Parametre alınamadı, eski model kullanılıyor")
             return
         
-        params_dict = zip(self.model. state_dict().keys(), parameters)
-        state_dict = OrderedDict({k: torch.tensor(v) for k, v in params_dict})
-        self.model.load_state_dict(state_dict, strict=True)
+        set_ndarrays(self.model, self.exchange_keys(config), parameters)
     
     def fit(self, parameters, config):
         """Training round"""
-        print(f"\n Drone {self.drone_id} ({DRONE_PROFILES[self. drone_id]['name']}) - Training başlıyor...")
+        job = self.begin_fit(parameters, config)
+        if "result" in job:
+            return job["result"]
+        
+        # Train (gerçek hesaplama süresi ölçülür)
+        compute_start = time.perf_counter()
+        history, best_acc = train_model(
+            self.model,
+            self.train_loader,
+            self.test_loader,
+            epochs=job["epochs"],
+            lr=job["lr"],
+            device=self.device,
+            deadline=job["deadline"]
+        )
+        compute_time = time.perf_counter() - compute_start
+        return self.finish_fit(config, job, history, compute_time)
+    
+    def begin_fit(self, parameters, config):
+        """
+        fit'in eğitim öncesi kısmı: bağlantı kontrolü, parametre yükleme, epoch/deadline planı.
+        Dönüş: eğitim işi (VectorizedTrainer / ProcessPoolTrainer formatında) ya da
+        {"result": fit sonucu} (round atlandıysa)
+        """
+        print(f"\n Drone {self.drone_id} ({self.profile['name']}) - Training başlıyor...")
+        net_start = self.network.net_time
+        round_start = self.network.clock.now()  # Simülasyonda sanal saat
         
         # Bağlantı kesintisi kontrolü
         if self.network. check_disconnection():
             print(f"    Round atlandı (bağlantı sorunu)")
             # Eski parametreleri döndür
-            return self.get_parameters(config={}), 0, {"drone_id": self.drone_id, "skipped": True}
+            parameters = self.get_parameters(config=config)
+            net_time = self.network.net_time - net_start
+            return {"result": (parameters, 0, {"drone_id": self.drone_id, "skipped": True,
+                                               "net_time_s": net_time, "compute_time_s": 0.0,
+                                               "sim_time_s": net_time})}
+        
+        # Global parametreler (paylaşılan bellekten gelebilir; delta referansı olarak saklanır)
+        parameters = self.received_parameters(parameters, config)
+        
+        # Upload kodlaması (server fit config ile ezebilir)
+        encoding = config.get("encoding") or self.encoder.encoding
+        
+        # Round deadline: server bütçe gönderdiyse tahmini upload süresi düşülerek o zamana kadar eğit.
+        # Bütçe ağın saatiyle harcanır (VirtualClock'ta simüle bekleme süreleri de sayılır);
+        # eğitim gerçek hesaplama süresiyle ilerlediği (finish_fit'te saate eklendiği) için
+        # kalan süre time.monotonic() tabanlı deadline'a çevrilir
+        deadline = None
+        if config.get("round_deadline_s"):
+            expected_bytes = wire_bytes(parameters) * WIRE_RATIO.get(encoding, 1.0) if parameters else 0
+            upload_margin = self.network.expected_transfer_time(expected_bytes)
+            elapsed = self.network.clock.now() - round_start
+            deadline = time.monotonic() + float(config["round_deadline_s"]) - elapsed - upload_margin
         
         # Server'dan gelen parametreleri yükle
-        self.set_parameters(parameters)
+        self.set_parameters(parameters, config)
         
         # Priority'ye göre epoch ayarla
         priority_weight = self.network.get_priority_weight()
         adjusted_epochs = int(self.epochs_per_round * priority_weight)
         
-        print(f"    Priority: {DRONE_PROFILES[self.drone_id]['priority']} "
+        print(f"    Priority: {self.profile['priority']} "
               f"→ {adjusted_epochs} epochs (base: {self.epochs_per_round})")
         
-        # Train
-        history, best_acc = train_model(
-            self.model,
-            self.train_loader,
-            self.test_loader,
-            epochs=adjusted_epochs,
-            lr=0.001,
-            device=self.device
+        return {
+            "model": self.model,
+            "train_loader": self.train_loader,
+            "test_loader": self.test_loader,
+            "epochs": adjusted_epochs,
+            "lr": 0.001,
+            "deadline": deadline,
+            "label": f"Drone {self.drone_id}",
+            "data_id": self.data_id,
+            "resident": self.resident_data,
+            "net_start": net_start,
+            "encoding": encoding,
+            "parameters": parameters
+        }
+    
+    def finish_fit(self, config, job, history, compute_time):
+        """fit'in eğitim sonrası kısmı: kodlama, upload simülasyonu, metrikler"""
+        parameters = job["parameters"]
+        net_start = job["net_start"]
+        encoding = job["encoding"]
+        self.network.elapse(compute_time)  # Sanal saat: link izi eğitim süresi kadar ilerler
+        work_fraction = history['steps'] / max(history['planned_steps'], 1)
+        if history['deadline_hit']:
+            print(f"    ⏰ Deadline: {history['steps']}/{history['planned_steps']} adım "
+                  f"({work_fraction*100:.0f}% iş)")
+        
+        # Güncel parametreler (seçili kodlama ile sıkıştırılmış)
+        updated_parameters = get_ndarrays(self.model, self.exchange_keys(config))
+        raw_bytes = wire_bytes(updated_parameters)
+        
+        # Delta: global modelden fark (topk ve int8 her zaman delta ister: int8 ölçek
+        # hatası mutlak ağırlığa değil küçük farka uygulanır)
+        send_delta = self.delta_updates or config.get("delta_updates", False) or encoding in ("topk", "int8")
+        is_delta = bool(send_delta and parameters and len(parameters) == len(updated_parameters))
+        if is_delta:
+            updated_parameters = compute_delta(updated_parameters, parameters)
+        
+        updated_parameters, encoding = self.encoder.encode(
+            updated_parameters, is_delta=is_delta, encoding=encoding
         )
+        upload_bytes = wire_bytes(updated_parameters)
         
-        # Network latency (upload)
+        # Upload: gecikme + boyut / bant genişliği; paket kaybında retry
         print(f"    Model uploading...")
-        self.network. simulate_latency()
-        
-        # Paket kaybı varsa retry
+        upload_time = self.network.transfer(upload_bytes)
         retry_count = 0
-        while self.network.check_packet_loss() and retry_count < 3:
+        lost = self.network.check_packet_loss()
+        while lost and retry_count < 3:
             print(f"    Retry {retry_count+1}/3...")
-            time.sleep(1)
+            self.network.retry_backoff()
+            upload_time += self.network.transfer(upload_bytes)
+            lost = self.network.check_packet_loss()
             retry_count += 1
-        
-        # Güncel parametreleri döndür
-        updated_parameters = self.get_parameters(config={})
+        if lost:
+            # Tüm denemeler kayıp: server boş güncelleme alır (aggregation'da atlanır);
+            # top-k residual'ı bu round'dan önceki haline döner
+            updated_parameters = []
+            self.encoder.rollback()
+        else:
+            self.encoder.commit()
+        net_time = self.network.net_time - net_start
         
         # İstatistikler
         num_examples = len(self.train_loader.dataset)
         metrics = {
             "drone_id": self.drone_id,
-            "priority": DRONE_PROFILES[self.drone_id]['priority'],
+            "priority": self.profile['priority'],
             "train_acc": history['train_acc'][-1],
             "test_acc": history['test_acc'][-1],
-            "network_quality": 1.0 - DRONE_PROFILES[self.drone_id]['packet_loss']
+            "network_quality": 1.0 - self.profile['packet_loss'],
+            "encoding": encoding,
+            "delta": is_delta,
+            "upload_bytes": upload_bytes,
+            "raw_bytes": raw_bytes,
+            "upload_time_s": upload_time,
+            "steps": history['steps'],
+            "planned_steps": history['planned_steps'],
+            "work_fraction": work_fraction,
+            "net_time_s": net_time,
+            "compute_time_s": compute_time,
+            "sim_time_s": net_time + compute_time  # Round'un drone tarafı simüle süresi
         }
         
         print(f" Drone {self.drone_id} - Training tamamlandı!  Test Acc: {history['test_acc'][-1]:.2f}%")
+        if updated_parameters:
+            print(f"    Upload: {upload_bytes/1024:.1f} KB ({encoding}{', delta' if is_delta else ''}, "
+                  f"x{raw_bytes/max(upload_bytes, 1):.1f} küçük)")
         
         return updated_parameters, num_examples, metrics
     
@@ -195,12 +269,13 @@ class DroneClient(fl.client.NumPyClient):
             return float('inf'), 0, {"accuracy": 0.0}
         
         # Server'dan gelen parametreleri yükle
-        self.set_parameters(parameters)
+        self.set_parameters(parameters, config)
         
         # Test
         import torch. nn as nn
         criterion = nn.CrossEntropyLoss()
-        test_loss, test_acc = test(self.model, self.test_loader, criterion, self.device)
+        test_loss, test_acc = test(self.model, self.test_loader, criterion, self.device,
+                                   feature_cache=self.feature_cache)
         
         num_examples = len(self.test_loader.dataset)
         
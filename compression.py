@@ -0,0 +1,176 @@
+# compression.py
+import io
+import numpy as np
+
+# Desteklenen güncelleme kodlamaları
+#   float32: ham ağırlıklar
+#   float16: yarı hassasiyet (2x küçük)
+#   int8:    tensor başına ölçekli int8 (~4x küçük; sadece delta için)
+#   topk:    farkın (delta) en büyük k elemanı + error feedback (sadece delta için)
+ENCODINGS = ("float32", "float16", "int8", "topk")
+
+DEFAULT_TOPK_RATIO = 0.01
+
+# float32'ye göre yaklaşık kablo boyutu oranı (upload süresi tahmini için);
+# topk: gönderilen her eleman int32 indeks + float16 değer = 6 byte
+WIRE_RATIO = {"float32": 1.0, "float16": 0.5, "int8": 0.25, "topk": DEFAULT_TOPK_RATIO * 1.5}
+
+_NPY_HEADER_BYTES = {}  # (dtype, shape, fortran) -> .npy başlık boyutu
+
+def _npy_header_bytes(array):
+    """np.save başlığının boyutu (sadece başlık yazılır, şekil başına bir kez)"""
+    key = (array.dtype.str, array.shape, np.isfortran(array))
+    if key not in _NPY_HEADER_BYTES:
+        buffer = io.BytesIO()
+        np.lib.format.write_array_header_1_0(buffer, np.lib.format.header_data_from_array_1_0(array))
+        _NPY_HEADER_BYTES[key] = buffer.tell()
+    return _NPY_HEADER_BYTES[key]
+
+def wire_bytes(arrays):
+    """
+    Flower'ın Parameters'a serileştirdiği toplam byte (kablodaki boyut):
+    tensor başına .npy başlığı + ham veri. Model serileştirilmez.
+    """
+    return sum(_npy_header_bytes(a) + a.nbytes for a in map(np.asarray, arrays))
+
+def _is_float(array):
+    return np.issubdtype(array.dtype, np.floating)
+
+class UpdateEncoder:
+    """
+    Client tarafı güncelleme kodlayıcı.
+
+    Kodlanmış liste tensor başına sabit sayıda dizi içerir (kayan noktalı olmayan
+    tensor'lar, örn. num_batches_tracked, her kodlamada ham tek dizi olarak gider):
+        float32 / float16: [değer]
+        int8:              [q (int8), ölçek (float32, [1])]
+        topk:              [indeksler (int32), değerler (float16)]
+    Girdi mutlak ağırlıklar ya da global modele göre fark (delta) olabilir; topk
+    ve int8 sadece delta için anlamlıdır (mutlak ağırlıkta float32/float16'ya düşer), gönderilmeyen kısım residual olarak saklanıp
+    sonraki round'a eklenir. Yeni residual'lar upload başarılı olana kadar
+    beklemede kalır: commit() kalıcı yapar, rollback() atar (upload kaybolursa
+    eski residual korunur, "gönderilmiş" sayılan top-k kütlesi kaybolmaz).
+    """
+    def __init__(self, encoding="float32", topk_ratio=DEFAULT_TOPK_RATIO):
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Bilinmeyen kodlama: {encoding}")
+        self.encoding = encoding
+        self.topk_ratio = topk_ratio
+        self.residuals = None
+        self.pending_residuals = None
+
+    def encode(self, arrays, is_delta=False, encoding=None):
+        """Dönüş: (kodlanmış dizi listesi, kullanılan kodlama)"""
+        encoding = encoding or self.encoding
+        if not arrays:
+            return [], encoding
+        if encoding == "topk" and not is_delta:
+            # Mutlak ağırlıklar seyreltilemez
+            encoding = "float32"
+        if encoding == "int8" and not is_delta:
+            # Mutlak ağırlıkta (BN running istatistikleri dahil) her round max|w|/254'e
+            # varan gürültü: delta yoksa float16'ya düş
+            encoding = "float16"
+
+        if encoding == "float32":
+            return list(arrays), encoding
+        if encoding == "float16":
+            return [a.astype(np.float16) if _is_float(a) else a for a in arrays], encoding
+        if encoding == "int8":
+            encoded = []
+            for a in arrays:
+                encoded.extend(_quantize_int8(a) if _is_float(a) else [a])
+            return encoded, encoding
+        return self._encode_topk(arrays), encoding
+
+    def commit(self):
+        """Upload başarılı: son encode()'un residual'larını kalıcı yap"""
+        if self.pending_residuals is not None:
+            self.residuals = self.pending_residuals
+            self.pending_residuals = None
+
+    def rollback(self):
+        """Upload kayboldu: son encode()'un residual'larını at"""
+        self.pending_residuals = None
+
+    def _encode_topk(self, arrays):
+        if self.residuals is None or len(self.residuals) != len(arrays):
+            self.residuals = [np.zeros(a.shape, dtype=np.float32) if _is_float(a) else None
+                              for a in arrays]
+
+        encoded = []
+        pending = [None] * len(arrays)
+        for i, a in enumerate(arrays):
+            if not _is_float(a):
+                encoded.append(a)
+                continue
+
+            delta = a.astype(np.float32).ravel() + self.residuals[i].ravel()
+            k = max(1, int(np.ceil(delta.size * self.topk_ratio)))
+            if k < delta.size:
+                idx = np.argpartition(np.abs(delta), -k)[-k:]
+            else:
+                idx = np.arange(delta.size)
+            idx = np.sort(idx).astype(np.int32)
+            values = delta[idx].astype(np.float16)
+
+            # Error feedback: gönderilemeyen (ve float16 yuvarlama) kısmı sakla
+            residual = delta.copy()
+            residual[idx] -= values.astype(np.float32)
+            pending[i] = residual.reshape(a.shape)
+
+            encoded.extend([idx, values])
+        self.pending_residuals = pending
+        return encoded
+
+def _quantize_int8(array):
+    scale = float(np.abs(array).max()) / 127.0
+    if scale == 0.0:
+        scale = 1.0
+    q = np.clip(np.rint(array / scale), -127, 127).astype(np.int8)
+    return [q, np.array([scale], dtype=np.float32)]
+
+def compute_delta(arrays, reference):
+    """Global modele göre fark: arrays - reference (dtype korunur)"""
+    return [np.asarray(a - r, dtype=r.dtype) for a, r in zip(arrays, reference)]
+
+def decode_update(arrays, encoding, reference):
+    """
+    Server tarafı: kodlanmış listeyi tam (dense) güncellemeye çevir.
+    Sonuç, client ne gönderdiyse odur (mutlak ağırlık ya da delta); topk her zaman delta.
+    reference: client'a gönderilen global parametreler (şekil/dtype bilgisi)
+    """
+    if encoding == "float32":
+        return list(arrays)
+    if encoding not in ENCODINGS:
+        raise ValueError(f"Bilinmeyen kodlama: {encoding}")
+    if not reference:
+        raise ValueError("Referans global parametreler yok")
+
+    decoded = []
+    pos = 0
+    for ref in reference:
+        if pos >= len(arrays):
+            raise ValueError("Kodlanmış tensor listesi eksik")
+        if not _is_float(ref):
+            decoded.append(arrays[pos])
+            pos += 1
+            continue
+
+        if encoding == "float16":
+            decoded.append(arrays[pos].astype(ref.dtype))
+            pos += 1
+        elif encoding == "int8":
+            q, scale = arrays[pos], arrays[pos + 1]
+            decoded.append((q.astype(np.float32) * scale[0]).astype(ref.dtype))
+            pos += 2
+        else:
+            idx, values = arrays[pos], arrays[pos + 1]
+            flat = np.zeros(ref.size, dtype=ref.dtype)
+            flat[idx] = values
+            decoded.append(flat.reshape(ref.shape))
+            pos += 2
+
+    if pos != len(arrays):
+        raise ValueError(f"Kodlanmış tensor sayısı uyumsuz ({pos} != {len(arrays)})")
+    return decoded
@@ -1,23 +1,77 @@
 # dataset.py
 import os
+import json
 import numpy as np
 import torch
 from torch.utils.data import Dataset, DataLoader
 from pathlib import Path
 
+# prepare_dataset.py'nin yazdığı paketlenmiş shard manifest'i
+MANIFEST_FILE = "manifest.json"
+
+# prepare_dataset.py --holdout çıktısı (server tarafı evaluation)
+HOLDOUT_DIR = "data/holdout"
+
 class DronePointCloudDataset(Dataset):
     """
     Drone için point cloud dataset
     Label 0: Güvenli iniş alanı
     Label 1: Tehlikeli iniş alanı
+    
+    data/drone{id}/manifest.json varsa paketlenmiş [N, P, 3] shard memory-map ile
+    okunur (örnek başına dosya açılmaz); yoksa eski safe_N.npy/unsafe_N.npy düzeni kullanılır.
     """
     def __init__(self, drone_id, train=True, train_split=0.8):
         self.drone_id = drone_id
         self.data_dir = f"data/drone{drone_id}"
         
-        # Dosyaları yükle
-        safe_files = sorted(Path(self.data_dir).glob("safe_*.npy"))
-        unsafe_files = sorted(Path(self.data_dir).glob("unsafe_*.npy"))
+        manifest_path = os.path.join(self.data_dir, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            self._init_packed(manifest_path, train, train_split)
+        else:
+            self._init_files(train, train_split)
+        
+        print(f" Drone {drone_id} {'Train' if train else 'Test'}:  "
+              f"{self.num_safe} güvenli + {self.num_unsafe} tehlikeli = {len(self)} toplam"
+              f"{' (shard)' if self.packed else ''}")
+    
+    def _init_packed(self, manifest_path, train, train_split):
+        """Paketlenmiş shard'ı memory-map ile aç"""
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        
+        self.packed = True
+        # mmap_mode='c': copy-on-write, dilimler diskteki veriye sıfır-kopya view
+        self.points = np.load(os.path.join(self.data_dir, manifest["points_file"]), mmap_mode='c')
+        all_labels = np.load(os.path.join(self.data_dir, manifest["labels_file"]))
+        
+        # Train/Test split (eski düzenle aynı: her sınıfın ilk %80'i train)
+        safe_idx = np.flatnonzero(all_labels == 0)
+        unsafe_idx = np.flatnonzero(all_labels == 1)
+        safe_split = int(len(safe_idx) * train_split)
+        unsafe_split = int(len(unsafe_idx) * train_split)
+        
+        if train:
+            safe_idx, unsafe_idx = safe_idx[:safe_split], unsafe_idx[:unsafe_split]
+        else:
+            safe_idx, unsafe_idx = safe_idx[safe_split:], unsafe_idx[unsafe_split:]
+        
+        self.indices = np.concatenate([safe_idx, unsafe_idx])
+        self.labels = all_labels[self.indices].tolist()
+        # Örnek kimliği: (veri dizini, shard satırı); loader sırası/bölümlemesinden bağımsız
+        self.sample_ids = [(self.data_dir, int(row)) for row in self.indices]
+        self.num_safe = len(safe_idx)
+        self.num_unsafe = len(unsafe_idx)
+    
+    def _init_files(self, train, train_split):
+        """Eski düzen: örnek başına bir .npy dosyası"""
+        self.packed = False
+        
+        # Dosyaları yükle (safe_2 < safe_10 olacak şekilde sayısal sırala)
+        def sample_index(path):
+            return int(path.stem.split("_")[-1])
+        safe_files = sorted(Path(self.data_dir).glob("safe_*.npy"), key=sample_index)
+        unsafe_files = sorted(Path(self.data_dir).glob("unsafe_*.npy"), key=sample_index)
         
         # Train/Test split
         safe_split = int(len(safe_files) * train_split)
@@ -33,31 +87,125 @@ class DronePointCloudDataset(Dataset):
         # Tüm dosyalar ve labellar
         self.files = list(self.safe_files) + list(self.unsafe_files)
         self.labels = [0] * len(self.safe_files) + [1] * len(self.unsafe_files)
-        
-        print(f" Drone {drone_id} {'Train' if train else 'Test'}:  "
-              f"{len(self. safe_files)} güvenli + {len(self.unsafe_files)} tehlikeli = {len(self)} toplam")
+        self.sample_ids = [str(f) for f in self.files]
+        self.num_safe = len(self.safe_files)
+        self.num_unsafe = len(self.unsafe_files)
     
     def __len__(self):
-        return len(self.files)
+        return len(self.labels)
     
     def __getitem__(self, idx):
         # Point cloud yükle
-        points = np.load(self.files[idx])
+        if self.packed:
+            points = self.points[self.indices[idx]]  # mmap view, kopya yok
+        else:
+            points = np.load(self.files[idx])
         label = self.labels[idx]
         
         # Tensor'a çevir
-        points = torch. from_numpy(points).float()
+        points = torch.from_numpy(points).float()
         label = torch.tensor(label, dtype=torch.long)
         
         return points, label
 
-def get_dataloaders(drone_id, batch_size=32, train_split=0.8):
+class ResidentPointCloudDataset(Dataset):
+    """
+    Tüm drone verisini client başlarken tek bir contiguous tensor'a yükler.
+    points: [N, P, 3] float32, labels: [N] long
+    """
+    def __init__(self, source):
+        self.drone_id = source.drone_id
+        self.sample_ids = source.sample_ids
+        
+        if source.packed:
+            # Fancy indexing mmap'ten tek seferde contiguous kopya üretir
+            points = np.ascontiguousarray(source.points[source.indices], dtype=np.float32)
+        else:
+            points = np.stack([np.load(f) for f in source.files]).astype(np.float32, copy=False)
+        
+        self.points = torch.from_numpy(points)
+        self.labels = torch.tensor(source.labels, dtype=torch.long)
+    
+    def __len__(self):
+        return self.labels.shape[0]
+    
+    def __getitem__(self, idx):
+        # idx int ya da index tensor'u olabilir (batch gather)
+        return self.points[idx], self.labels[idx]
+
+class ResidentBatchLoader:
+    """
+    ResidentPointCloudDataset için DataLoader yerine geçen batch iterator.
+    Her epoch bir permütasyon üretir ve batch'leri index_select ile toplar;
+    per-item collate yolu yoktur. train_epoch/test için DataLoader ile aynı arayüz.
+    """
+    def __init__(self, dataset, batch_size=32, shuffle=False, seed=None):
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.generator = torch.Generator()
+        if seed is not None:
+            self.generator.manual_seed(seed)
+        else:
+            self.generator.seed()
+    
+    def __len__(self):
+        return (len(self.dataset) + self.batch_size - 1) // self.batch_size
+    
+    def __iter__(self):
+        n = len(self.dataset)
+        points, labels = self.dataset.points, self.dataset.labels
+        
+        if not self.shuffle:
+            # Sıralı okuma: dilimler view, kopya yok
+            for start in range(0, n, self.batch_size):
+                yield points[start:start + self.batch_size], labels[start:start + self.batch_size]
+            return
+        
+        for idx in self.index_batches():
+            yield points.index_select(0, idx), labels.index_select(0, idx)
+    
+    def index_batches(self):
+        """Batch başına veri seti indeksleri (DataLoader.batch_sampler karşılığı)"""
+        n = len(self.dataset)
+        order = torch.randperm(n, generator=self.generator) if self.shuffle else torch.arange(n)
+        return order.split(self.batch_size)
+
+def load_holdout(data_dir=HOLDOUT_DIR):
+    """
+    Server held-out set'ini belleğe tek seferde yükle.
+    Dönüş: points [N, P, 3] float32, labels [N] long (contiguous tensor'lar)
+    """
+    manifest_path = os.path.join(data_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"{manifest_path} yok: önce 'python prepare_dataset.py --holdout' çalıştırın")
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    
+    points = np.load(os.path.join(data_dir, manifest["points_file"]))
+    labels = np.load(os.path.join(data_dir, manifest["labels_file"]))
+    return (torch.from_numpy(np.ascontiguousarray(points, dtype=np.float32)),
+            torch.from_numpy(labels.astype(np.int64)))
+
+def get_dataloaders(drone_id, batch_size=32, train_split=0.8, resident=False):
     """
     Drone için train ve test dataloader'ları oluştur
+    
+    resident=True: tüm veri bellekte tek tensor, batch'ler index-gather ile
+    (ResidentBatchLoader); False: klasik DataLoader
     """
     train_dataset = DronePointCloudDataset(drone_id, train=True, train_split=train_split)
     test_dataset = DronePointCloudDataset(drone_id, train=False, train_split=train_split)
     
+    if resident:
+        train_loader = ResidentBatchLoader(
+            ResidentPointCloudDataset(train_dataset), batch_size=batch_size, shuffle=True
+        )
+        test_loader = ResidentBatchLoader(
+            ResidentPointCloudDataset(test_dataset), batch_size=batch_size, shuffle=False
+        )
+        return train_loader, test_loader
+    
     train_loader = DataLoader(
         train_dataset,
         batch_size=batch_size,
@@ -76,7 +224,51 @@ def get_dataloaders(drone_id, batch_size=32, train_split=0.8):
     
     return train_loader, test_loader
 
+def benchmark_loaders(drone_id=1, batch_size=16, epochs=5):
+    """DataLoader ve resident mod için epoch sürelerini karşılaştır (CPU)"""
+    import time
+    import torch.nn as nn
+    import torch.optim as optim
+    from model import get_model
+    from train import train_epoch
+    
+    results = {}
+    for resident in [False, True]:
+        train_loader, _ = get_dataloaders(drone_id, batch_size=batch_size, resident=resident)
+        name = "resident" if resident else "dataloader"
+        
+        # Sadece veri yolu
+        start = time.perf_counter()
+        for _ in range(epochs):
+            for points, labels in train_loader:
+                pass
+        data_time = (time.perf_counter() - start) / epochs
+        
+        # Tam eğitim epoch'u
+        torch.manual_seed(0)
+        model = get_model()
+        criterion = nn.CrossEntropyLoss()
+        optimizer = optim.Adam(model.parameters(), lr=0.001)
+        start = time.perf_counter()
+        for _ in range(epochs):
+            train_epoch(model, train_loader, criterion, optimizer, 'cpu')
+        train_time = (time.perf_counter() - start) / epochs
+        
+        results[name] = (data_time, train_time)
+        print(f"   {name:10s}: data {data_time*1000:8.2f} ms/epoch | train {train_time*1000:8.1f} ms/epoch")
+    
+    base, fast = results["dataloader"], results["resident"]
+    print(f"   Hızlanma: data x{base[0]/max(fast[0], 1e-9):.1f}, train x{base[1]/max(fast[1], 1e-9):.2f}")
+    return results
+
 if __name__ == "__main__": 
+    import sys
+    
+    if "--benchmark" in sys.argv:
+        print(" Loader Benchmark (Drone 1, CPU)\n")
+        benchmark_loaders(drone_id=1)
+        sys.exit(0)
+    
     print(" Dataset Test\n")
     print("="*60)
     
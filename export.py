@@ -0,0 +1,248 @@
+# export.py
+import io
+import os
+import copy
+import json
+import warnings
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.ao.quantization as tq
+from model import get_model
+from inference import fold_bn, latency_stats, load_checkpoint
+
+QUANT_MODES = ("static", "dynamic")
+
+def _folded_linear(layer, bn):
+    """Conv1d(k=1)/Linear + BN -> tek nn.Linear (channel-last)"""
+    weight_t, bias = fold_bn(layer.weight, layer.bias, bn)
+    linear = nn.Linear(weight_t.shape[0], weight_t.shape[1])
+    with torch.no_grad():
+        linear.weight.copy_(weight_t.t())
+        linear.bias.copy_(bias)
+    return linear
+
+class ExportPointNet(nn.Module):
+    """
+    Export ve INT8 quantization için PointNetClassifier.
+
+    BN katlanmış, channel-last Linear zinciri: 1×1 conv'lar [B, N, C] üzerinde
+    nn.Linear, ReLU'lar ayrı modül (fuse_modules ile Linear+ReLU kaynaşır),
+    dropout yok. QuantStub/DeQuantStub float modelde no-op'tur.
+    Girdi prepare_dataset.normalize_point_cloud ile normalize edilmiş [B, N, 3].
+    """
+    FUSE = [["conv1", "relu1"], ["conv2", "relu2"], ["conv3", "relu3"], ["fc1", "relu4"], ["fc2", "relu5"]]
+
+    def __init__(self, model):
+        super().__init__()
+        model = model.eval()
+        backbone = model.backbone
+        self.quant = tq.QuantStub()
+        self.dequant = tq.DeQuantStub()
+
+        self.conv1 = _folded_linear(backbone.conv1, backbone.bn1)
+        self.conv2 = _folded_linear(backbone.conv2, backbone.bn2)
+        self.conv3 = _folded_linear(backbone.conv3, backbone.bn3)
+        self.fc1 = _folded_linear(model.fc1, model.bn1)
+        self.fc2 = _folded_linear(model.fc2, model.bn2)
+        self.fc3 = copy.deepcopy(model.fc3)
+        self.relu1, self.relu2, self.relu3, self.relu4, self.relu5 = (nn.ReLU() for _ in range(5))
+
+    def forward(self, x):
+        x = self.quant(x)
+        x = self.relu1(self.conv1(x))
+        x = self.relu2(self.conv2(x))
+        x = self.relu3(self.conv3(x))
+        x = torch.max(x, dim=1)[0]  # Global max pooling (quantized tensor'da amax yok)
+        x = self.relu4(self.fc1(x))
+        x = self.relu5(self.fc2(x))
+        return self.dequant(self.fc3(x))
+
+def quantize(export_model, mode="static", calibration=(), backend=None):
+    """
+    INT8 post-training quantization.
+    static: Linear+ReLU kaynaştırılır, aktivasyon aralıkları calibration
+    batch'lerinden (drone'un lokal verisi) ölçülür; tüm zincir INT8 çalışır.
+    dynamic: sadece ağırlıklar INT8, aktivasyon ölçeği çalışma anında (kalibrasyon yok).
+    backend: "x86"/"fbgemm" (x86 companion bilgisayar) ya da "qnnpack" (ARM).
+    """
+    if mode not in QUANT_MODES:
+        raise ValueError(f"Bilinmeyen quantization modu: {mode} (seçenekler: {QUANT_MODES})")
+    backend = backend or torch.backends.quantized.engine
+    torch.backends.quantized.engine = backend
+    model = copy.deepcopy(export_model).eval()
+
+    # torch.ao.quantization deprecation uyarıları (API bu sürümde çalışıyor)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        if mode == "dynamic":
+            return tq.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+        model.qconfig = tq.get_default_qconfig(backend)
+        model = tq.fuse_modules(model, ExportPointNet.FUSE)
+        prepared = tq.prepare(model)
+        with torch.no_grad():
+            for points in calibration:
+                prepared(points)
+        return tq.convert(prepared)
+
+def calibration_batches(loader, num_batches):
+    """Loader'dan ilk num_batches point cloud batch'i (etiketsiz)"""
+    batches = []
+    for points, _ in loader:
+        batches.append(points)
+        if len(batches) >= num_batches:
+            break
+    return batches
+
+def accuracy(model, batches):
+    """[(points, labels)] üzerinde doğruluk (%)"""
+    correct = total = 0
+    with torch.inference_mode():
+        for points, labels in batches:
+            correct += (model(points).argmax(dim=1) == labels).sum().item()
+            total += labels.numel()
+    return 100.0 * correct / max(total, 1)
+
+def state_size(model):
+    """Serileştirilmiş state_dict boyutu (byte)"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+def export_torchscript(model, example, path):
+    """Trace edilmiş TorchScript modülü (batch/nokta sayısı serbest)"""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        traced = torch.jit.trace(model, example)
+        traced = torch.jit.freeze(traced)
+    traced.save(path)
+    return traced
+
+def export_onnx(model, example, path, quantized_path=None):
+    """
+    Float modeli ONNX'e yaz (dinamik batch/nokta ekseni). onnx paketi gerekir;
+    onnxruntime varsa ONNX Runtime dynamic INT8 kopyası da üretilir.
+    Dönüş: yazılan dosyalar
+    """
+    try:
+        import onnx  # noqa: F401
+    except ImportError:
+        print("   ⚠️  ONNX export atlandı: 'pip install onnx' (INT8 ONNX için ayrıca onnxruntime)")
+        return []
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        torch.onnx.export(
+            model, (example,), path, dynamo=False,
+            input_names=["points"], output_names=["logits"],
+            dynamic_axes={"points": {0: "batch", 1: "num_points"}, "logits": {0: "batch"}},
+        )
+    written = [path]
+    if quantized_path:
+        try:
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            quantize_dynamic(path, quantized_path, weight_type=QuantType.QInt8)
+            written.append(quantized_path)
+        except ImportError:
+            print("   ⚠️  ONNX INT8 atlandı: 'pip install onnxruntime'")
+    return written
+
+def export_pipeline(model, drone_id=1, mode="static", num_calibration=8, output_dir="export",
+                    num_threads=1, backend=None, iters=100, holdout_dir=None):
+    """
+    Checkpoint -> BN katlanmış float + INT8 model -> TorchScript/ONNX artifact'ları
+    + doğruluk/gecikme/boyut raporu (output_dir/report.json).
+    Kalibrasyon drone'un lokal train verisiyle, doğruluk lokal test split'iyle
+    (ve varsa server held-out set'iyle) ölçülür.
+    """
+    from dataset import get_dataloaders, load_holdout
+
+    torch.set_num_threads(num_threads)
+    os.makedirs(output_dir, exist_ok=True)
+    model = model.eval()
+    float_model = ExportPointNet(model).eval()
+
+    train_loader, test_loader = get_dataloaders(drone_id, batch_size=32, resident=True)
+    calibration = calibration_batches(train_loader, num_calibration)
+    int8_model = quantize(float_model, mode, calibration, backend)
+
+    eval_sets = {f"drone{drone_id}_test": list(test_loader)}
+    try:
+        points, labels = load_holdout(holdout_dir) if holdout_dir else load_holdout()
+        eval_sets["holdout"] = list(zip(points.split(256), labels.split(256)))
+    except FileNotFoundError:
+        pass
+
+    example = torch.from_numpy(np.random.default_rng(0).uniform(-1, 1, (1, 1024, 3)).astype(np.float32))
+    artifacts = {
+        "torchscript_fp32": os.path.join(output_dir, "pointnet_fp32.pt"),
+        "torchscript_int8": os.path.join(output_dir, "pointnet_int8.pt"),
+    }
+    scripted_fp32 = export_torchscript(float_model, example, artifacts["torchscript_fp32"])
+    scripted_int8 = export_torchscript(int8_model, example, artifacts["torchscript_int8"])
+    onnx_files = export_onnx(float_model, example, os.path.join(output_dir, "pointnet_fp32.onnx"),
+                             os.path.join(output_dir, "pointnet_int8.onnx"))
+
+    variants = {"float (PyTorch)": model, "float BN-fold (TorchScript)": scripted_fp32,
+                f"int8 {mode} (TorchScript)": scripted_int8}
+    report = {"drone_id": drone_id, "mode": mode, "backend": torch.backends.quantized.engine,
+              "threads": num_threads, "calibration_batches": len(calibration), "variants": {}}
+    for name, variant in variants.items():
+        def run():
+            with torch.inference_mode():
+                variant(example)
+        stats = latency_stats(run, iters=iters, warmup=10)
+        entry = {"latency_ms": stats,
+                 "accuracy": {set_name: accuracy(variant, batches) for set_name, batches in eval_sets.items()}}
+        report["variants"][name] = entry
+
+    # Hızlanma her float varyantına karşı: int8'in asıl kazancı aynı yoldan (BN-fold
+    # TorchScript) ölçülür; katlama/trace yolunun eager'a göre kazancı ayrıca raporlanır
+    p50 = {name: entry["latency_ms"]["p50"] for name, entry in report["variants"].items()}
+    eager, folded, int8 = list(p50.values())
+    report["speedup"] = {"int8_vs_float_eager": eager / int8, "int8_vs_float_bnfold": folded / int8,
+                         "bnfold_vs_eager": eager / folded}
+    report["size_bytes"] = {"float": state_size(float_model), "int8": state_size(int8_model)}
+    report["artifacts"] = {**artifacts, **{os.path.basename(f): f for f in onnx_files}}
+    with open(os.path.join(output_dir, "report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n Export raporu (drone {drone_id}, {mode}, {report['backend']}, {num_threads} thread)")
+    for name, entry in report["variants"].items():
+        accs = " | ".join(f"{k} {v:.2f}%" for k, v in entry["accuracy"].items())
+        lat = entry["latency_ms"]
+        print(f"   {name:28s}: p50 {lat['p50']:6.2f} ms | p99 {lat['p99']:6.2f} ms | {accs}")
+    speedup, sizes = report["speedup"], report["size_bytes"]
+    print(f"   INT8 hızlanma: BN-fold TorchScript'e göre x{speedup['int8_vs_float_bnfold']:.2f} | "
+          f"eager float'a göre x{speedup['int8_vs_float_eager']:.2f}")
+    print(f"   BN-fold TorchScript / eager: x{speedup['bnfold_vs_eager']:.2f}")
+    if speedup["bnfold_vs_eager"] < 1:
+        print("   ⚠️  BN-fold/trace yolu eager modelden yavaş: float dağıtımda eager model tercih edilmeli")
+    if speedup["int8_vs_float_bnfold"] < 1:
+        print("   ⚠️  INT8 model aynı yoldaki float modelden yavaş")
+    print(f"   Boyut {sizes['float']/1e6:.2f} MB -> {sizes['int8']/1e6:.2f} MB (x{sizes['float'] / sizes['int8']:.1f})")
+    print(f"   Artifact'lar: {', '.join(report['artifacts'].values())}")
+    return report
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="PointNetClassifier INT8 quantization + TorchScript/ONNX export")
+    parser.add_argument("--checkpoint", default=None, help="server checkpoint'i (--checkpoint ile kaydedilen)")
+    parser.add_argument("--drone", type=int, default=1, help="kalibrasyon/doğruluk için lokal veri")
+    parser.add_argument("--mode", choices=QUANT_MODES, default="static")
+    parser.add_argument("--calibration-batches", type=int, default=8)
+    parser.add_argument("--backend", default=None, help="x86 / fbgemm / qnnpack (ARM)")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--out", default="export")
+    args = parser.parse_args()
+
+    if args.checkpoint:
+        model = load_checkpoint(args.checkpoint)
+    else:
+        print(" ⚠️  Checkpoint verilmedi: rastgele ağırlıklı model")
+        torch.manual_seed(0)
+        model = get_model()
+    export_pipeline(model, drone_id=args.drone, mode=args.mode, num_calibration=args.calibration_batches,
+                    output_dir=args.out, num_threads=args.threads, backend=args.backend)
@@ -0,0 +1,128 @@
+# feature_cache.py
+import hashlib
+from collections import OrderedDict
+import torch
+
+def backbone_hash(backbone):
+    """
+    Backbone'un eval çıktısını belirleyen her şeyin özeti: conv ağırlıkları ve
+    BN ağırlıkları + running istatistikleri (num_batches_tracked hariç).
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for name, tensor in backbone.state_dict().items():
+        if name.endswith("num_batches_tracked"):
+            continue
+        digest.update(name.encode("utf-8"))
+        digest.update(tensor.detach().cpu().contiguous().numpy())  # Buffer protokolü, kopya yok
+    return digest.hexdigest()
+
+def index_batches(loader):
+    """Loader'ın batch başına veri seti indeksleri (ResidentBatchLoader ya da DataLoader)"""
+    if hasattr(loader, "index_batches"):
+        return loader.index_batches()
+    return (torch.as_tensor(idx) for idx in loader.batch_sampler)
+
+def load_samples(dataset, idx):
+    """Veri setinden indekslerdeki (points, labels): resident ise tek gather, değilse örnek örnek"""
+    if isinstance(getattr(dataset, "points", None), torch.Tensor):
+        return dataset.points[idx], dataset.labels[idx]
+    points, labels = zip(*(dataset[int(i)] for i in idx))
+    return torch.stack(points), torch.stack(labels)
+
+def extract_features(backbone, points):
+    """Global feature'lar (eval modunda backbone): [B, P, 3] -> [B, 1024]"""
+    was_training = backbone.training
+    backbone.eval()
+    # no_grad (inference_mode değil): feature'lar head eğitiminde autograd'a girer
+    with torch.no_grad():
+        features = backbone(points)
+    backbone.train(was_training)
+    return features
+
+class FeatureCache:
+    """
+    PointNetBackbone global feature cache'i (bellek içi, örnek başına LRU).
+
+    Anahtar: (örnek kimliği, backbone hash'i). Örnek kimliği veri setinin
+    sample_ids'i (shard satırı / dosya yolu; yoksa veri setindeki indeks), bu
+    yüzden loader yeniden kurulsa, karıştırılsa ya da alt küme/örtüşen örnekler
+    istense de kayıtlar bulunur. Backbone ağırlıkları/BN istatistikleri
+    değişince hash değişir ve feature'lar bir kez yeniden hesaplanır. Donmuş
+    backbone'da (tekrarlanan evaluation, head-only fine-tuning) conv yığını hiç çalışmaz.
+    """
+    def __init__(self, max_entries=8192):
+        self.max_entries = max_entries  # Örnek sayısı (örnek başına 4 KB)
+        self.entries = OrderedDict()  # (örnek kimliği, hash) -> (feature [1024], label)
+        self.hits = 0
+        self.misses = 0
+
+    def batches(self, model, loader, device="cpu"):
+        """
+        Loader'ın batch'leri için (features [B, 1024], labels [B]): her batch
+        örnek kimlikleriyle cache'ten toplanır, ıskalar tek backbone çağrısıyla doldurulur.
+        """
+        digest = backbone_hash(model.backbone)
+        dataset = loader.dataset
+        sample_ids = getattr(dataset, "sample_ids", None)
+        for idx in index_batches(loader):
+            keys = [(sample_ids[i] if sample_ids is not None else i, digest) for i in idx.tolist()]
+            yield self.gather(model.backbone, dataset, idx, keys, device)
+
+    def gather(self, backbone, dataset, idx, keys, device="cpu"):
+        """keys[j] = idx[j] örneğinin anahtarı -> (features, labels)"""
+        entries = [self.entries.get(key) for key in keys]
+        missing = [j for j, entry in enumerate(entries) if entry is None]
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            points, labels = load_samples(dataset, idx[missing])
+            features = extract_features(backbone, points.to(device))
+            for j, feature, label in zip(missing, features, labels.to(device)):
+                entries[j] = self.entries[keys[j]] = (feature, label)
+        for key in keys:
+            self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return torch.stack([e[0] for e in entries]), torch.stack([e[1] for e in entries])
+
+    def invalidate(self):
+        """Tüm kayıtları sil"""
+        self.entries.clear()
+
+if __name__ == "__main__":
+    import time
+    import torch.nn as nn
+    from model import get_model
+    from dataset import get_dataloaders
+    from train import test, train_head
+
+    torch.set_num_threads(1)
+    torch.manual_seed(0)
+    model = get_model()
+    criterion = nn.CrossEntropyLoss()
+    train_loader, test_loader = get_dataloaders(drone_id=1, batch_size=16, resident=True)
+    cache = FeatureCache()
+
+    print("\n Tekrarlanan evaluation (aynı backbone)")
+    test(model, test_loader, criterion, "cpu", feature_cache=cache)  # Isınma + feature çıkarımı (ıska)
+    for name, kwargs in (("Tam model", {}), ("Feature cache", {"feature_cache": cache})):
+        start = time.perf_counter()
+        for _ in range(5):
+            loss, acc = test(model, test_loader, criterion, "cpu", **kwargs)
+        print(f"   {name:13s}: {(time.perf_counter() - start)*1000/5:7.2f} ms/eval | loss {loss:.4f} acc {acc:.2f}%")
+    print(f"   Cache: {cache.hits} isabet / {cache.misses} ıska (örnek)")
+
+    print("\n Head-only fine-tuning")
+    train_head(model, train_loader, test_loader, epochs=1, feature_cache=cache)  # Isınma (optimizer ilk kullanım)
+    start = time.perf_counter()
+    history, best_acc = train_head(model, train_loader, test_loader, epochs=5, feature_cache=cache)
+    print(f"   5 epoch {(time.perf_counter() - start)*1000:.1f} ms | en iyi test acc {best_acc:.2f}% | "
+          f"cache {cache.hits} isabet / {cache.misses} ıska")
+
+    # Backbone değişince kayıt geçersiz olur
+    with torch.no_grad():
+        model.backbone.conv1.weight.add_(0.01)
+    misses = cache.misses
+    test(model, test_loader, criterion, "cpu", feature_cache=cache)
+    print(f"   Backbone değişti -> yeniden hesaplandı: {cache.misses - misses} ıska")
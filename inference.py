@@ -0,0 +1,204 @@
+# inference.py
+import os
+import time
+import numpy as np
+import torch
+from model import get_model, set_ndarrays
+
+LABELS = ("safe", "unsafe")  # 0: güvenli iniş alanı, 1: tehlikeli
+
+def load_checkpoint(path, model=None):
+    """
+    Server checkpoint'ini (PriorityFedAvg.save_checkpoint) modele yükle.
+    FedBN checkpoint'lerinde BN parametreleri yoktur; model varsayılan BN'le kalır.
+    """
+    checkpoint = torch.load(path, map_location="cpu")
+    model = model if model is not None else get_model()
+    keys = checkpoint["param_keys"]
+    set_ndarrays(model, keys, [checkpoint["state_dict"][k].numpy() for k in keys])
+    if checkpoint.get("fedbn"):
+        print(" ⚠️  FedBN checkpoint: BN katmanları global modelde yok (varsayılan istatistikler)")
+    print(f" Checkpoint yüklendi: {path} (round {checkpoint.get('server_round', '?')})")
+    return model
+
+def fold_bn(weight, bias, bn):
+    """
+    BatchNorm'u önceki conv/linear'a katla (eval modu):
+        W' = W · γ/√(var+ε),  b' = (b - μ) · γ/√(var+ε) + β
+    Dönüş: (W'ᵀ [in, out], b' [out]) - channel-last addmm için
+    """
+    with torch.no_grad():
+        scale = bn.weight.double() / torch.sqrt(bn.running_var.double() + bn.eps)
+        folded_weight = weight.double().reshape(weight.shape[0], -1) * scale[:, None]
+        folded_bias = (bias.double() - bn.running_mean.double()) * scale + bn.bias.double()
+    return folded_weight.t().contiguous().float(), folded_bias.float()
+
+class InferenceEngine:
+    """
+    Uçuş sırasında iniş alanı sınıflandırması için PointNetClassifier servisi.
+
+    - BN bir kez conv/linear ağırlıklarına katlanır, dropout yok (sadece eval)
+    - 1×1 conv'lar channel-last addmm olarak çalışır: [B·N, C] üzerinde transpoze yok
+    - Aktivasyonlar (batch, nokta) şekli başına bir kez ayrılan buffer'lara
+      out= ile yazılır; kararlı durumda forward bellek ayırmaz
+    - Son conv'un ReLU'su max-pool'dan sonra uygulanır (ReLU monoton:
+      max(relu(x)) = relu(max(x))), B·N·1024 yerine B·1024 eleman
+    - Sabit torch thread sayısı, torch.inference_mode
+    """
+    def __init__(self, model, num_threads=None, max_batch=1, num_points=1024, normalize=True):
+        torch.set_num_threads(num_threads or os.cpu_count() or 1)
+        self.num_threads = torch.get_num_threads()
+        self.normalize = normalize
+
+        model = model.eval()
+        backbone = model.backbone
+        self.backbone = [
+            fold_bn(backbone.conv1.weight, backbone.conv1.bias, backbone.bn1),
+            fold_bn(backbone.conv2.weight, backbone.conv2.bias, backbone.bn2),
+            fold_bn(backbone.conv3.weight, backbone.conv3.bias, backbone.bn3),
+        ]
+        with torch.no_grad():
+            self.head = [
+                fold_bn(model.fc1.weight, model.fc1.bias, model.bn1),
+                fold_bn(model.fc2.weight, model.fc2.bias, model.bn2),
+                (model.fc3.weight.t().contiguous().detach(), model.fc3.bias.detach().clone()),
+            ]
+
+        self._buffers = {}
+        self._buffers_for(max_batch, num_points)  # Varsayılan şekil önceden ayrılır
+
+    def _buffers_for(self, batch, num_points):
+        """(batch, nokta) şekli için aktivasyon buffer'ları (ilk kullanımda bir kez)"""
+        key = (batch, num_points)
+        if key not in self._buffers:
+            rows = batch * num_points
+            widths = [w.shape[1] for w, _ in self.backbone]
+            self._buffers[key] = {
+                "input": torch.empty(batch, num_points, 3),
+                "abs": torch.empty(batch, num_points, 3),
+                "scale": torch.empty(batch, 1, 1),
+                "center": torch.empty(batch, 1, 3),
+                "conv": [torch.empty(rows, width) for width in widths],
+                "feature": torch.empty(batch, widths[-1]),
+                "fc": [torch.empty(batch, w.shape[1]) for w, _ in self.head],
+                "margin": torch.empty(batch),
+            }
+        return self._buffers[key]
+
+    def _normalize(self, buffers):
+        """Merkeze al ve [-1, 1]'e ölçekle (prepare_dataset.normalize_point_cloud ile aynı)"""
+        points = buffers["input"]
+        torch.mean(points, dim=1, keepdim=True, out=buffers["center"])
+        points.sub_(buffers["center"])
+        torch.abs(points, out=buffers["abs"])
+        torch.amax(buffers["abs"], dim=(1, 2), keepdim=True, out=buffers["scale"])
+        points.div_(buffers["scale"].clamp_min_(1e-12))
+
+    def _forward(self, buffers):
+        """Katlanmış ağ: logits buffers["fc"][-1]'e yazılır"""
+        batch, num_points, _ = buffers["input"].shape
+        x = buffers["input"].view(batch * num_points, 3)
+        for i, ((weight, bias), out) in enumerate(zip(self.backbone, buffers["conv"])):
+            torch.addmm(bias, x, weight, out=out)
+            if i < len(self.backbone) - 1:
+                out.relu_()
+            x = out
+        torch.amax(x.view(batch, num_points, -1), dim=1, out=buffers["feature"])
+        x = buffers["feature"].relu_()
+
+        for i, ((weight, bias), out) in enumerate(zip(self.head, buffers["fc"])):
+            torch.addmm(bias, x, weight, out=out)
+            if i < len(self.head) - 1:
+                out.relu_()
+            x = out
+        return x
+
+    def logits(self, points):
+        """points: [N, 3] ya da [B, N, 3] (NumPy/tensor) -> [B, 2] logits (buffer view)"""
+        points = torch.as_tensor(points)
+        if points.dim() == 2:
+            points = points.unsqueeze(0)
+        buffers = self._buffers_for(points.shape[0], points.shape[1])
+        with torch.inference_mode():
+            buffers["input"].copy_(points)
+            if self.normalize:
+                self._normalize(buffers)
+            return self._forward(buffers)
+
+    def safe_probability(self, points):
+        """points: [N, 3] ya da [B, N, 3] -> [B] güvenli iniş olasılığı (buffer view)"""
+        logits = self.logits(points)
+        margin = self._buffers_for(logits.shape[0], np.shape(points)[-2])["margin"]
+        with torch.inference_mode():
+            # 2 sınıf: softmax(l)[0] = sigmoid(l0 - l1)
+            torch.sub(logits[:, 0], logits[:, 1], out=margin)
+            margin.sigmoid_()
+        return margin
+
+    def classify(self, points):
+        """
+        İniş kararı. points: tek bulut [N, 3] ya da batch [B, N, 3].
+        Dönüş: ("safe"/"unsafe", güvenli olasılığı) ya da batch için bunların listesi
+        """
+        single = np.ndim(points) == 2
+        probs = self.safe_probability(points).tolist()
+        decisions = [(LABELS[0] if p >= 0.5 else LABELS[1], p) for p in probs]
+        return decisions[0] if single else decisions
+
+def latency_stats(fn, iters=300, warmup=20):
+    """fn() çağrı gecikmesi (ms): p50 / p99 / max"""
+    for _ in range(warmup):
+        fn()
+    timings = np.empty(iters)
+    for i in range(iters):
+        start = time.perf_counter()
+        fn()
+        timings[i] = (time.perf_counter() - start) * 1000
+    return {"p50": float(np.percentile(timings, 50)), "p99": float(np.percentile(timings, 99)),
+            "max": float(timings.max())}
+
+def benchmark(model, batch=1, num_points=1024, iters=300, num_threads=None):
+    """Katlanmış motor vs eval() PyTorch modeli: gecikme ve çıktı farkı"""
+    engine = InferenceEngine(model, num_threads=num_threads, max_batch=batch, num_points=num_points)
+    points = np.random.default_rng(0).uniform(-3, 3, (batch, num_points, 3)).astype(np.float32)
+
+    def reference():
+        with torch.inference_mode():
+            x = torch.from_numpy(points)
+            x = x - x.mean(dim=1, keepdim=True)
+            x = x / x.abs().amax(dim=(1, 2), keepdim=True)
+            return model(x)
+
+    diff = float((engine.logits(points) - reference()).abs().max())
+    print(f" Batch {batch} × {num_points} nokta, {engine.num_threads} thread | max logit farkı {diff:.2e}")
+    for name, fn in (("PyTorch eval", reference), ("InferenceEngine", lambda: engine.classify(points))):
+        stats = latency_stats(fn, iters)
+        print(f"   {name:16s}: p50 {stats['p50']:6.2f} ms | p99 {stats['p99']:6.2f} ms | max {stats['max']:6.2f} ms")
+    return engine
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Onboard iniş alanı sınıflandırma motoru")
+    parser.add_argument("--checkpoint", default=None, help="server checkpoint'i (--checkpoint ile kaydedilen)")
+    parser.add_argument("--batch", type=int, default=1)
+    parser.add_argument("--points", type=int, default=1024)
+    parser.add_argument("--threads", type=int, default=None, help="sabit torch thread sayısı")
+    parser.add_argument("--iters", type=int, default=300)
+    args = parser.parse_args()
+
+    if args.checkpoint:
+        model = load_checkpoint(args.checkpoint)
+    else:
+        print(" ⚠️  Checkpoint verilmedi: rastgele ağırlıklı model")
+        torch.manual_seed(0)
+        model = get_model()
+        model.train()
+        with torch.no_grad():  # BN istatistikleri anlamlı olsun diye birkaç batch
+            for _ in range(3):
+                model(torch.randn(16, args.points, 3))
+    model.eval()
+
+    engine = benchmark(model, args.batch, args.points, args.iters, args.threads)
+    label, safe_prob = engine.classify(np.random.default_rng(1).standard_normal((args.points, 3)))
+    print(f" classify(): {label} (güvenli olasılığı {safe_prob:.3f})")
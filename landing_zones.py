@@ -0,0 +1,186 @@
+# landing_zones.py
+import time
+import numpy as np
+import torch
+from model import get_model
+from prepare_dataset import normalize_point_cloud
+from inference import InferenceEngine, LABELS, load_checkpoint
+
+# 3×3 komşu hücre ofsetleri: hücre boyu >= yarıçap olduğunda daire bu hücrelerin içinde kalır
+NEIGHBOUR_OFFSETS = np.array([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)], dtype=np.int64)
+
+class SceneIndex:
+    """
+    Büyük sahne point cloud'u için XY ızgara indeksi.
+    Noktalar hücre numarasına göre bir kez sıralanır; her hücre sıralı dizide
+    bitişik bir aralık (starts[c]:starts[c+1]) olur.
+    """
+    def __init__(self, scene, cell_size):
+        scene = np.asarray(scene, dtype=np.float32)
+        self.cell_size = float(cell_size)
+        self.origin = scene[:, :2].min(axis=0)
+        cells = np.floor((scene[:, :2] - self.origin) / self.cell_size).astype(np.int64)
+        self.shape = cells.max(axis=0) + 1
+        cell_ids = cells[:, 0] * self.shape[1] + cells[:, 1]
+        order = np.argsort(cell_ids, kind="stable")
+        self.points = scene[order]
+        self.starts = np.searchsorted(cell_ids[order], np.arange(self.shape[0] * self.shape[1] + 1))
+
+    def crop(self, centers, radius, num_points=1024, rng=None, oversample=4):
+        """
+        Tüm aday bölgelerden (XY'de merkez + yarıçap, dikeyde sınırsız silindir)
+        aynı anda num_points nokta örnekle: aday döngüsü yok.
+        Aday başına 3×3 komşu hücredeki noktalardan oversample × num_points
+        rastgele konum çekilir, dairenin içinde kalanların ilk num_points'i alınır
+        (az ise içeridekiler tekrarlanır).
+        Dönüş: ([K, num_points, 3] noktalar, [K] bölgedeki tahmini nokta sayısı)
+        """
+        rng = rng if rng is not None else np.random.default_rng()
+        centers = np.asarray(centers, dtype=np.float32)[:, :2]
+        radius = np.broadcast_to(np.asarray(radius, dtype=np.float32), (len(centers),))
+        if radius.max() > self.cell_size:
+            raise ValueError(f"Yarıçap ({radius.max()}) ızgara hücresinden ({self.cell_size}) büyük")
+        num_candidates, draws = len(centers), oversample * num_points
+
+        # Aday başına 9 hücrenin [başlangıç, uzunluk] aralıkları: [K, 9]
+        neighbours = np.floor((centers - self.origin) / self.cell_size).astype(np.int64)[:, None, :] + NEIGHBOUR_OFFSETS
+        in_grid = ((neighbours >= 0) & (neighbours < self.shape)).all(axis=2)
+        cell_ids = np.where(in_grid, neighbours[..., 0] * self.shape[1] + neighbours[..., 1], 0)
+        starts = self.starts[cell_ids]
+        lengths = np.where(in_grid, self.starts[cell_ids + 1] - starts, 0)
+        ends = np.cumsum(lengths, axis=1)
+        total = ends[:, -1]
+
+        # Birleşik aralıkta rastgele konum -> hangi hücre -> sahne indeksi
+        position = (rng.random((num_candidates, draws)) * total[:, None]).astype(np.int64)
+        cell = (position[:, :, None] >= ends[:, None, :]).sum(axis=2).clip(max=len(NEIGHBOUR_OFFSETS) - 1)
+        offset = np.take_along_axis(starts - (ends - lengths), cell, axis=1)
+        samples = self.points[np.minimum(position + offset, len(self.points) - 1)]  # [K, draws, 3]
+
+        inside = ((samples[..., :2] - centers[:, None, :]) ** 2).sum(axis=2) <= (radius ** 2)[:, None]
+        inside &= (total > 0)[:, None]
+        counts = inside.sum(axis=1)
+        # Daire içindekiler öne (stable): ilk num_points, az ise mod ile tekrar
+        ranked = np.argsort(~inside, axis=1, kind="stable")
+        pick = np.arange(num_points)[None, :] % np.maximum(counts, 1)[:, None]
+        index = np.take_along_axis(ranked, pick, axis=1)
+        estimated = np.rint(counts * total / draws).astype(np.int64)  # İsabet oranı × aday hücrelerdeki nokta
+        return np.take_along_axis(samples, index[..., None], axis=1), estimated
+
+class LandingZoneScorer:
+    """
+    Acil durumda çok sayıda aday iniş alanını sıralama.
+
+    Sahne bir kez ızgara indeksine alınır; tüm adaylar vektörel olarak kırpılıp
+    num_points'e örneklenir, tek NumPy çağrısıyla normalize edilir ve BN-katlanmış
+    InferenceEngine ile batch halinde (batch_size'lık parçalar: conv3 aktivasyonu
+    aday başına 4 MB) skorlanır.
+    Bölgesinde tahminen min_points'ten az nokta olan aday skorlanmaz (olasılık nan, sonda).
+    """
+    def __init__(self, model, num_points=1024, batch_size=32, num_threads=None, min_points=64, seed=0):
+        self.num_points = num_points
+        self.batch_size = batch_size
+        self.min_points = min_points
+        self.engine = InferenceEngine(model, num_threads=num_threads, max_batch=batch_size,
+                                      num_points=num_points, normalize=False)
+        self.rng = np.random.default_rng(seed)
+        self.timings = {}
+
+    def score(self, scene, centers, radius, index=None):
+        """Aday başına güvenli iniş olasılığı [K] (yetersiz noktalı adaylar nan)"""
+        start = time.perf_counter()
+        index = index if index is not None else SceneIndex(scene, float(np.max(radius)))
+        patches, counts = index.crop(centers, radius, self.num_points, self.rng)
+        patches = normalize_point_cloud(patches).astype(np.float32, copy=False)
+        cropped = time.perf_counter()
+
+        probs = np.empty(len(patches), dtype=np.float32)
+        for i in range(0, len(patches), self.batch_size):
+            batch_probs = self.engine.safe_probability(patches[i:i + self.batch_size])
+            probs[i:i + len(batch_probs)] = batch_probs.numpy()  # Kopya: buffer sonraki batch'te ezilir
+        probs[counts < self.min_points] = np.nan
+        self.timings = {"crop_s": cropped - start, "forward_s": time.perf_counter() - cropped,
+                        "candidates": len(patches)}
+        return probs
+
+    def rank(self, scene, centers, radius, index=None):
+        """
+        Adayları güvenli iniş olasılığına göre sırala.
+        Dönüş: [(aday indeksi, "safe"/"unsafe", güvenli olasılığı)], en güvenli başta
+        """
+        probs = self.score(scene, centers, radius, index)
+        order = np.argsort(np.where(np.isnan(probs), np.inf, -probs), kind="stable")
+        return [(int(i), LABELS[0] if probs[i] >= 0.5 else LABELS[1], float(probs[i])) for i in order]
+
+    @property
+    def throughput(self):
+        """Son score/rank çağrısında aday/s"""
+        elapsed = self.timings["crop_s"] + self.timings["forward_s"]
+        return self.timings["candidates"] / elapsed
+
+def synthetic_scene(num_points=200000, size=100.0, num_obstacles=60, seed=0):
+    """Oyuncak sahne: hafif eğimli zemin + rastgele kutu engeller (bina/ağaç)"""
+    rng = np.random.default_rng(seed)
+    xy = rng.uniform(0, size, (num_points, 2))
+    z = 0.01 * xy[:, 0] + rng.normal(0, 0.03, num_points)
+    for cx, cy, half, height in zip(rng.uniform(0, size, num_obstacles), rng.uniform(0, size, num_obstacles),
+                                    rng.uniform(1, 5, num_obstacles), rng.uniform(1, 15, num_obstacles)):
+        inside = (np.abs(xy[:, 0] - cx) < half) & (np.abs(xy[:, 1] - cy) < half)
+        z[inside] += rng.uniform(0, height, inside.sum())
+    return np.column_stack([xy, z]).astype(np.float32)
+
+def naive_rank(engine, scene, centers, radius, num_points=1024, seed=0):
+    """Karşılaştırma: aday başına maske + örnekleme + tek bulut classify"""
+    rng = np.random.default_rng(seed)
+    results = []
+    for i, center in enumerate(centers):
+        patch = scene[((scene[:, :2] - center[:2]) ** 2).sum(axis=1) <= radius ** 2]
+        patch = patch[rng.choice(len(patch), num_points, replace=len(patch) < num_points)]
+        label, prob = engine.classify(normalize_point_cloud(patch).astype(np.float32))
+        results.append((i, label, prob))
+    return sorted(results, key=lambda r: -r[2])
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Çoklu aday iniş alanı batch skorlama")
+    parser.add_argument("--checkpoint", default=None, help="server checkpoint'i (--checkpoint ile kaydedilen)")
+    parser.add_argument("--candidates", type=int, default=256)
+    parser.add_argument("--radius", type=float, default=4.0, help="aday iniş alanı yarıçapı (m)")
+    parser.add_argument("--scene-points", type=int, default=200000)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.checkpoint:
+        model = load_checkpoint(args.checkpoint)
+    else:
+        print(" ⚠️  Checkpoint verilmedi: rastgele ağırlıklı model")
+        torch.manual_seed(0)
+        model = get_model()
+    model.eval()
+
+    scene = synthetic_scene(args.scene_points)
+    centers = np.random.default_rng(1).uniform(args.radius, 100 - args.radius, (args.candidates, 2))
+    scorer = LandingZoneScorer(model, batch_size=args.batch, num_threads=args.threads)
+
+    start = time.perf_counter()
+    index = SceneIndex(scene, args.radius)
+    print(f" Sahne: {len(scene):,} nokta, ızgara {index.shape[0]}×{index.shape[1]} "
+          f"({(time.perf_counter() - start)*1000:.1f} ms) | {args.candidates} aday, r={args.radius} m")
+
+    scorer.rank(scene, centers[:args.batch], args.radius, index)  # Isınma (buffer'lar ayrılır)
+    ranked = scorer.rank(scene, centers, args.radius, index)
+    t = scorer.timings
+    print(f"   Batch      : kırpma {t['crop_s']*1000:7.1f} ms | forward {t['forward_s']*1000:7.1f} ms | "
+          f"{scorer.throughput:6.1f} aday/s")
+
+    subset = min(args.candidates, 32)
+    start = time.perf_counter()
+    naive_rank(scorer.engine, scene, centers[:subset], args.radius)
+    naive_rate = subset / (time.perf_counter() - start)
+    print(f"   Aday döngüsü: {naive_rate:6.1f} aday/s ({subset} aday) | hızlanma x{scorer.throughput / naive_rate:.1f}")
+
+    print("   En iyi 5 aday:")
+    for i, label, prob in ranked[:5]:
+        print(f"     #{i:3d} ({centers[i, 0]:5.1f}, {centers[i, 1]:5.1f}): {label} (güvenli olasılığı {prob:.3f})")
@@ -1,4 +1,5 @@
 # model.py
+import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
@@ -56,8 +57,10 @@ class PointNetClassifier(nn.Module):
     def forward(self, x):
         # Extract global features
         x = self.backbone(x)
-        
-        # Classification
+        return self.head(x)
+    
+    def head(self, x):
+        """Sınıflandırma MLP'si: [B, 1024] global feature -> [B, num_classes] logits"""
         x = F.relu(self.bn1(self.fc1(x)))
         x = self.dropout(x)
         x = F.relu(self.bn2(self.fc2(x)))
@@ -74,12 +77,55 @@ def count_parameters(model):
     """Count trainable parameters"""
     return sum(p.numel() for p in model.parameters() if p.requires_grad)
 
+def parameter_keys(model, fedbn=False):
+    """
+    Federated exchange'e giren state_dict anahtarları (sıralı).
+    fedbn=True: BatchNorm ağırlıkları, running istatistikleri ve
+    num_batches_tracked lokal kalır; sadece conv/linear ağırlıkları döner.
+    """
+    keys = list(model.state_dict().keys())
+    if not fedbn:
+        return keys
+    
+    bn_prefixes = tuple(
+        name + "." for name, module in model.named_modules()
+        if isinstance(module, nn.modules.batchnorm._BatchNorm)
+    )
+    return [k for k in keys if not k.startswith(bn_prefixes)]
+
+def get_ndarrays(model, keys=None):
+    """İsimle seçilen state_dict girdilerini NumPy listesi olarak döndür"""
+    state_dict = model.state_dict()
+    keys = keys if keys is not None else list(state_dict.keys())
+    return [state_dict[k].cpu().numpy() for k in keys]
+
+def set_ndarrays(model, keys, arrays):
+    """
+    NumPy listesini isimle modele yükle (listede olmayan anahtarlar dokunulmaz).
+    Anahtar bilinmiyorsa ya da sayı/şekil uyuşmuyorsa ValueError.
+    """
+    if len(keys) != len(arrays):
+        raise ValueError(f"Anahtar/tensor sayısı uyumsuz ({len(keys)} != {len(arrays)})")
+    
+    state_dict = model.state_dict()
+    unknown = [k for k in keys if k not in state_dict]
+    if unknown:
+        raise ValueError(f"Bilinmeyen parametre anahtarları: {unknown[:3]}")
+    
+    for k, v in zip(keys, arrays):
+        if tuple(state_dict[k].shape) != tuple(v.shape):
+            raise ValueError(f"{k}: şekil uyumsuz {tuple(v.shape)} != {tuple(state_dict[k].shape)}")
+    
+    # from_numpy: ara kopya yok, load_state_dict doğrudan parametrelere kopyalar
+    model.load_state_dict({k: torch.from_numpy(np.asarray(v)) for k, v in zip(keys, arrays)}, strict=False)
+
 if __name__ == "__main__": 
     # Test the model
     model = get_model()
     print(" Model Mimarisi:")
     print(model)
     print(f"\n Toplam Parametreler: {count_parameters(model):,}")
+    print(f" Exchange anahtarları: {len(parameter_keys(model))} (FedBN: {len(parameter_keys(model, fedbn=True))})")
     
     # Test forward pass
     dummy_input = torch.randn(4, 1024, 3)  # Batch=4, Points=1024, XYZ=3
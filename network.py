@@ -0,0 +1,295 @@
+# network.py
+import os
+import time
+import random
+import numpy as np
+
+# Drone network profilleri
+DRONE_PROFILES = {
+    1: {
+        "name": "Sehir Merkezi",
+        "priority": "LOW",
+        "packet_loss": 0.05,  # 5%
+        "latency_range": (0.1, 0.5),  # saniye
+        "disconnect_prob": 0.01,  # 1%
+        "bandwidth_mbps": 20.0,  # Uplink bant genişliği (Mbit/s)
+        "encoding": "float32"  # Güncelleme kodlaması (compression.py)
+    },
+    2: {
+        "name": "Sanayi Bolgesi",
+        "priority": "MEDIUM",
+        "packet_loss": 0.15,  # 15%
+        "latency_range": (0.3, 1.0),
+        "disconnect_prob": 0.05,
+        "bandwidth_mbps": 8.0,
+        "encoding": "float16"
+    },
+    3: {
+        "name": "Orman (KRITIK)",
+        "priority": "HIGH",
+        "packet_loss": 0.40,  # 40% - Çok kötü!
+        "latency_range":  (1.0, 3.0),
+        "disconnect_prob": 0.15,  # 15%
+        "bandwidth_mbps": 1.5,  # Zayıf hücresel link
+        "encoding": "topk"  # En kötü link: sadece en büyük farklar
+    },
+    4: {
+        "name": "Daglik Alan",
+        "priority": "HIGH",
+        "packet_loss":  0.35,  # 35%
+        "latency_range":  (0.8, 2.5),
+        "disconnect_prob":  0.12,
+        "bandwidth_mbps": 2.5,
+        "encoding": "int8"
+    },
+    5: {
+        "name": "Karma/Test",
+        "priority": "LOW",
+        "packet_loss": 0.08,  # 8%
+        "latency_range": (0.2, 0.7),
+        "disconnect_prob":  0.02,
+        "bandwidth_mbps": 12.0,
+        "encoding": "float32"
+    }
+}
+
+RETRY_BACKOFF_S = 1.0  # Paket kaybı sonrası retry bekleme süresi
+
+def get_drone_profile(drone_id):
+    """Drone profili; 5'ten büyük id'ler (simülasyon) profilleri döngüsel kullanır"""
+    return DRONE_PROFILES[(drone_id - 1) % len(DRONE_PROFILES) + 1]
+
+class RealClock:
+    """Gerçek zaman: bekleme time.sleep ile (gRPC client'ları için)"""
+    virtual = False
+
+    def now(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+class VirtualClock:
+    """
+    Ayrık olay sanal saati: sleep() bloklamaz, sadece simüle zamanı ilerletir.
+    Ağ gecikmesi / reconnect / retry beklemeleri anında biter; süreleri
+    simüle round süresine eklenir.
+    """
+    virtual = True
+
+    def __init__(self, start=0.0):
+        self.time = start
+
+    def now(self):
+        return self.time
+
+    def sleep(self, seconds):
+        self.time += seconds
+
+def rssi_to_packet_loss(rssi_dbm):
+    """RSSI'dan kaba kayıp oranı tahmini (~-85 dBm'de %50, lojistik)"""
+    loss = 1.0 / (1.0 + np.exp((np.asarray(rssi_dbm, dtype=np.float64) + 85.0) / 3.0))
+    return np.clip(loss, 0.0, 0.95)
+
+class LinkTrace:
+    """
+    Kaydedilmiş link izini (CSV/Parquet) tekrar oynatır.
+
+    Sütunlar: time_s (zorunlu), throughput_mbps, latency_s, packet_loss,
+    rssi_dbm (opsiyonel). Her değer bir sonraki örneğe kadar sabit kabul
+    edilir (step); iz bitince başa sarar. packet_loss yoksa rssi_dbm'den
+    tahmin edilir. Olmayan sütunlar için drone profili kullanılır.
+    """
+    COLUMNS = ("throughput_mbps", "latency_s", "packet_loss", "rssi_dbm")
+
+    def __init__(self, time_s, **columns):
+        self.times = np.asarray(time_s, dtype=np.float64)
+        if self.times.ndim != 1 or len(self.times) == 0:
+            raise ValueError("İz boş ya da time_s tek boyutlu değil")
+        if np.any(np.diff(self.times) <= 0):
+            raise ValueError("time_s kesin artan olmalı")
+
+        self.columns = {}
+        for name, values in columns.items():
+            if name not in self.COLUMNS:
+                continue
+            values = np.asarray(values, dtype=np.float64)
+            if values.shape != self.times.shape:
+                raise ValueError(f"{name} uzunluğu time_s ile aynı olmalı")
+            self.columns[name] = values
+        if "packet_loss" not in self.columns and "rssi_dbm" in self.columns:
+            self.columns["packet_loss"] = rssi_to_packet_loss(self.columns["rssi_dbm"])
+        if "throughput_mbps" in self.columns and not np.any(self.columns["throughput_mbps"] > 0):
+            raise ValueError("İzde hiç pozitif throughput yok")
+
+        # Son örnek, ortalama örnekleme aralığı kadar sürer
+        step = float(np.mean(np.diff(self.times))) if len(self.times) > 1 else 1.0
+        self.duration = self.times[-1] - self.times[0] + step
+
+    @classmethod
+    def load(cls, path):
+        """CSV (başlıklı) ya da Parquet (pandas gerekir) dosyasından yükle"""
+        if path.endswith(".parquet"):
+            try:
+                import pandas as pd
+            except ImportError:
+                raise ImportError("Parquet izleri için pandas + pyarrow gerekli: pip install pandas pyarrow")
+            frame = pd.read_parquet(path)
+            data = {name: frame[name].to_numpy() for name in frame.columns}
+        else:
+            table = np.genfromtxt(path, delimiter=",", names=True, dtype=np.float64)
+            data = {name: np.atleast_1d(table[name]) for name in table.dtype.names}
+
+        if "time_s" not in data:
+            raise ValueError(f"{path}: time_s sütunu yok")
+        return cls(data.pop("time_s"), **data)
+
+    def _locate(self, t):
+        """t (iz başından saniye) -> (örnek indeksi, o örneğin bitişine kalan süre)"""
+        local = self.times[0] + (t % self.duration)
+        idx = int(np.searchsorted(self.times, local, side="right")) - 1
+        end = self.times[idx + 1] if idx + 1 < len(self.times) else self.times[0] + self.duration
+        return idx, end - local
+
+    def value(self, column, t):
+        """t anındaki değer (sütun yoksa None)"""
+        if column not in self.columns:
+            return None
+        idx, _ = self._locate(t)
+        return float(self.columns[column][idx])
+
+    def transfer_time(self, num_bytes, t):
+        """t anında başlayan num_bytes'lık aktarımın süresi (değişen throughput üzerinden)"""
+        throughput = self.columns["throughput_mbps"]
+        remaining = num_bytes * 8.0
+        elapsed = 0.0
+        while remaining > 0:
+            idx, segment = self._locate(t + elapsed)
+            rate = throughput[idx] * 1e6
+            if rate > 0:
+                if remaining <= rate * segment:
+                    return elapsed + remaining / rate
+                remaining -= rate * segment
+            elapsed += segment  # Kesinti (rate = 0): segment boyunca bekle
+        return elapsed
+
+class NetworkSimulator:
+    """Network koşullarını simüle et"""
+
+    def __init__(self, drone_id, clock=None, trace=None):
+        self.profile = get_drone_profile(drone_id)
+        self.drone_id = drone_id
+        self.clock = clock or RealClock()
+        self.trace = trace  # Opsiyonel LinkTrace (profilin yerine kayıtlı link)
+        self.start = self.clock.now()
+        self.net_time = 0.0  # Toplam ağ bekleme süresi (saniye)
+
+    def wait(self, seconds):
+        """Ağ beklemesi: saat türüne göre uyu ya da sanal zamanı ilerlet"""
+        self.net_time += seconds
+        self.clock.sleep(seconds)
+
+    def elapse(self, seconds):
+        """Ağ dışı (hesaplama) süre: sanal saatte zamanı ilerlet, gerçek saatte zaten geçti"""
+        if self.clock.virtual:
+            self.clock.sleep(seconds)
+
+    def _trace_value(self, column):
+        if self.trace is None:
+            return None
+        return self.trace.value(column, self.clock.now() - self.start)
+
+    def latency(self):
+        """Tek yön gecikme (iz varsa izden, yoksa profil aralığından)"""
+        latency = self._trace_value("latency_s")
+        if latency is None:
+            min_lat, max_lat = self.profile["latency_range"]
+            latency = random.uniform(min_lat, max_lat)
+        return latency
+
+    def packet_loss(self):
+        loss = self._trace_value("packet_loss")
+        return self.profile["packet_loss"] if loss is None else loss
+
+    def transfer_time(self, num_bytes):
+        """num_bytes'ın serileştirme süresi (bant genişliği / izdeki throughput)"""
+        if self.trace is not None and "throughput_mbps" in self.trace.columns:
+            return self.trace.transfer_time(num_bytes, self.clock.now() - self.start)
+        return num_bytes * 8.0 / (self.profile["bandwidth_mbps"] * 1e6)
+
+    def expected_transfer_time(self, num_bytes):
+        """Deadline payı için üst tahmin: en kötü gecikme + profil bant genişliği"""
+        return self.profile["latency_range"][1] + num_bytes * 8.0 / (self.profile["bandwidth_mbps"] * 1e6)
+
+    def simulate_latency(self):
+        """Rastgele gecikme ekle"""
+        latency = self.latency()
+        print(f"    Network latency: {latency:.2f}s")
+        self.wait(latency)
+
+    def transfer(self, num_bytes):
+        """num_bytes'ı gönder: gecikme + boyut / bant genişliği kadar bekle"""
+        latency = self.latency()
+        duration = latency + self.transfer_time(num_bytes)
+        print(f"    Transfer: {num_bytes/1024:.1f} KB in {duration:.2f}s (latency {latency:.2f}s)")
+        self.wait(duration)
+        return duration
+
+    def check_packet_loss(self):
+        """Paket kaybı kontrolü"""
+        loss = self.packet_loss()
+        if random.random() < loss:
+            print(f"   ⚠️  Paket kaybı!  ({loss*100:.0f}% şansı)")
+            return True
+        return False
+
+    def retry_backoff(self):
+        """Paket kaybı sonrası yeniden göndermeden önce bekle"""
+        self.wait(RETRY_BACKOFF_S)
+
+    def check_disconnection(self):
+        """Bağlantı kesintisi kontrolü"""
+        if random.random() < self.profile["disconnect_prob"]:
+            print(f"    Bağlantı kesildi!  Yeniden bağlanılıyor...")
+            self.wait(random.uniform(2, 5))  # Reconnect süresi
+            return True
+        return False
+
+    def get_priority_weight(self):
+        """Öncelik ağırlığı"""
+        priority_weights = {"HIGH": 2.0, "MEDIUM": 1.5, "LOW": 1.0}
+        return priority_weights[self.profile["priority"]]
+
+def load_drone_trace(pattern, drone_id):
+    """'traces/drone{drone_id}.csv' gibi bir kalıptan drone'un izini yükle (yoksa None)"""
+    if not pattern:
+        return None
+    path = pattern.format(drone_id=drone_id)
+    return LinkTrace.load(path) if os.path.exists(path) else None
+
+def _simulate_rounds(network, num_rounds, upload_bytes):
+    """fit akışındaki ağ olaylarını (kesinti, upload, retry) tekrarla"""
+    for _ in range(num_rounds):
+        network.check_disconnection()
+        network.transfer(upload_bytes)
+        retries = 0
+        while network.check_packet_loss() and retries < 3:
+            network.retry_backoff()
+            network.transfer(upload_bytes)
+            retries += 1
+
+if __name__ == "__main__":
+    import io
+    import contextlib
+
+    # Sanal saat ile 100 round'luk ağ beklemesi bloklamadan ölçülür;
+    # upload boyutu (float32 ~3.2 MB, topk ~60 KB) süreyi bant genişliğiyle belirler
+    for upload_bytes in (3_200_000, 60_000):
+        print(f" Upload {upload_bytes/1024:.0f} KB:")
+        for drone_id in DRONE_PROFILES:
+            network = NetworkSimulator(drone_id, clock=VirtualClock())
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                _simulate_rounds(network, 100, upload_bytes)
+            real = time.perf_counter() - start
+            print(f"   Drone {drone_id}: simüle ağ süresi {network.net_time:.1f}s, gerçek {real*1000:.1f} ms")
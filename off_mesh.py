@@ -0,0 +1,171 @@
+# off_mesh.py
+import numpy as np
+
+def read_off(path):
+    """
+    ModelNet .off dosyasını toplu NumPy parse ile oku (satır satır Python yok)
+
+    Dönüş: vertices [V, 3] float64, faces [F, 3] int64 (çokgenler fan ile üçgenlenir)
+    Bozuk/desteklenmeyen dosyada ValueError fırlatır (çağıran trimesh'e düşebilir).
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if b"#" in data:
+        # Yorum satırlarını at (ModelNet'te nadir)
+        data = b"\n".join(line.split(b"#", 1)[0] for line in data.splitlines())
+
+    data = data.lstrip()
+    if not data.startswith(b"OFF"):
+        raise ValueError("OFF başlığı yok")
+
+    # ModelNet'te bazı dosyalarda sayılar başlıkla aynı satırda: "OFF490 518 0"
+    header = data[3:].split(None, 3)
+    if len(header) < 3:
+        raise ValueError("OFF sayıları eksik")
+    num_vertices, num_faces = int(header[0]), int(header[1])
+    body = header[3] if len(header) > 3 else b""
+
+    values = np.fromstring(body.decode("ascii"), sep=" ")
+    vertex_end = num_vertices * 3
+    if values.size < vertex_end:
+        raise ValueError("vertex verisi eksik")
+
+    vertices = values[:vertex_end].reshape(num_vertices, 3)
+    face_values = values[vertex_end:]
+
+    # Hızlı yol: tüm yüzler üçgen ("3 a b c")
+    if face_values.size == num_faces * 4:
+        rows = face_values.reshape(num_faces, 4)
+        if np.all(rows[:, 0] == 3):
+            faces = rows[:, 1:].astype(np.int64)
+            _check_faces(faces, num_vertices)
+            return vertices, faces
+
+    faces = _triangulate_polygons(face_values, num_faces)
+    _check_faces(faces, num_vertices)
+    return vertices, faces
+
+def _triangulate_polygons(face_values, num_faces):
+    """Karışık çokgenli yüz listesini fan üçgenlemesi ile [F', 3]'e çevir"""
+    triangles = []
+    pos = 0
+    for _ in range(num_faces):
+        if pos >= face_values.size:
+            raise ValueError("yüz verisi eksik")
+        n = int(face_values[pos])
+        if n < 3 or pos + 1 + n > face_values.size:
+            raise ValueError("geçersiz yüz")
+        idx = face_values[pos + 1:pos + 1 + n].astype(np.int64)
+        fan = np.empty((n - 2, 3), dtype=np.int64)
+        fan[:, 0] = idx[0]
+        fan[:, 1] = idx[1:-1]
+        fan[:, 2] = idx[2:]
+        triangles.append(fan)
+        pos += 1 + n
+
+    if pos != face_values.size:
+        # Yüz satırlarında renk vb. ek alanlar var
+        raise ValueError("beklenmeyen yüz alanları")
+    if not triangles:
+        raise ValueError("yüz yok")
+    return np.concatenate(triangles)
+
+def _check_faces(faces, num_vertices):
+    if faces.size == 0:
+        raise ValueError("yüz yok")
+    if faces.min() < 0 or faces.max() >= num_vertices:
+        raise ValueError("yüz indeksi aralık dışında")
+
+def sample_surface_batch(meshes, num_points, seeds):
+    """
+    Alan ağırlıklı yüzey örnekleme, birden fazla mesh için tek çağrıda.
+
+    meshes: [(vertices, faces), ...], seeds: mesh başına seed
+    Dönüş: [M, num_points, 3] float64
+
+    Tüm mesh'lerin üçgenleri tek dizide birleştirilir; üçgen seçimi global kümülatif
+    alan üzerinde tek searchsorted, barycentric örnekleme tek vektörel işlemdir.
+    Alanı sıfır olan mesh için ValueError.
+    """
+    triangles = [vertices[faces] for vertices, faces in meshes]  # [F, 3, 3]
+    counts = np.array([len(t) for t in triangles])
+    tri = np.concatenate(triangles)
+
+    origins = tri[:, 0]
+    edges = tri[:, 1:] - origins[:, None, :]  # [F, 2, 3]
+    areas = 0.5 * np.linalg.norm(np.cross(edges[:, 0], edges[:, 1]), axis=1)
+
+    cum_areas = np.cumsum(areas)
+    ends = np.cumsum(counts) - 1
+    mesh_totals = np.diff(np.concatenate([[0.0], cum_areas[ends]]))
+    if np.any(mesh_totals <= 0):
+        raise ValueError("yüzey alanı sıfır")
+    mesh_bases = cum_areas[ends] - mesh_totals
+
+    # Mesh başına bağımsız RNG (sonuç batch içindeki sıraya bağlı değil)
+    num_meshes = len(meshes)
+    uniforms = np.empty((num_meshes, num_points))
+    barycentric = np.empty((num_meshes, num_points, 2))
+    for i, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        uniforms[i] = rng.random(num_points)
+        barycentric[i] = rng.random((num_points, 2))
+
+    targets = mesh_bases[:, None] + uniforms * mesh_totals[:, None]
+    face_idx = np.searchsorted(cum_areas, targets.ravel(), side="right")
+    # Kayan nokta kenar durumlarında mesh sınırı dışına taşmasın
+    first = np.concatenate([[0], ends[:-1] + 1])
+    face_idx = np.clip(face_idx, np.repeat(first, num_points), np.repeat(ends, num_points))
+
+    ab = barycentric.reshape(-1, 2)
+    outside = ab.sum(axis=1) > 1.0
+    ab[outside] = 1.0 - ab[outside]
+
+    points = origins[face_idx] + np.einsum("nk,nkd->nd", ab, edges[face_idx])
+    return points.reshape(num_meshes, num_points, 3)
+
+def benchmark(mesh_paths, num_points=1024, batch_size=16):
+    """trimesh.load + sample_surface ile read_off + sample_surface_batch karşılaştırması"""
+    import time
+    import trimesh
+
+    start = time.perf_counter()
+    for path in mesh_paths:
+        mesh = trimesh.load(path)
+        if isinstance(mesh, trimesh.Scene):
+            mesh = mesh.dump(concatenate=True)
+        trimesh.sample.sample_surface(mesh, num_points, seed=0)
+    trimesh_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parse_time = 0.0
+    for i in range(0, len(mesh_paths), batch_size):
+        chunk = mesh_paths[i:i + batch_size]
+        t0 = time.perf_counter()
+        meshes = [read_off(path) for path in chunk]
+        parse_time += time.perf_counter() - t0
+        sample_surface_batch(meshes, num_points, seeds=range(len(chunk)))
+    fast_time = time.perf_counter() - start
+
+    n = len(mesh_paths)
+    print(f"   trimesh : {n / trimesh_time:8.1f} mesh/s ({trimesh_time:.2f}s)")
+    print(f"   numpy   : {n / fast_time:8.1f} mesh/s ({fast_time:.2f}s, parse {parse_time:.2f}s)")
+    print(f"   Hızlanma: x{trimesh_time / fast_time:.1f}")
+    return n / trimesh_time, n / fast_time
+
+if __name__ == "__main__":
+    import sys
+    from pathlib import Path
+
+    root = sys.argv[1] if len(sys.argv) > 1 else "data/ModelNet10"
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    paths = sorted(str(p) for p in Path(root).glob("*/train/*.off"))[:limit]
+    if not paths:
+        print(f" {root} altında .off dosyası bulunamadı")
+        sys.exit(1)
+
+    print(f" OFF okuma + örnekleme benchmark ({len(paths)} mesh, 1024 nokta)")
+    print("="*60)
+    benchmark(paths)
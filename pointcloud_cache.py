@@ -0,0 +1,146 @@
+# pointcloud_cache.py
+import os
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+# Örnekleme algoritması değişirse eski kayıtlar geçersiz olsun
+CACHE_VERSION = 2
+
+DEFAULT_CACHE_DIR = "data/.pointcloud_cache"
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GB
+
+class PointCloudCache:
+    """
+    Örneklenmiş point cloud'lar için içerik adresli disk cache'i.
+
+    Anahtar: (mesh yolu, mtime, num_points, seed) -> sha1. Aynı mesh'i seçen
+    drone'lar ve tekrarlanan build'ler trimesh'e gitmeden cache'ten okur.
+    Boyut sınırı aşılınca en uzun süredir kullanılmayan kayıtlar silinir (LRU;
+    her okuma dosyanın mtime'ını günceller).
+
+    LRU sırası ve toplam boyut bellekte tutulur (self.index): dizin bir kez
+    (index=True ile açılışta, yoksa ilk evict/report'ta) taranır, sonra
+    put/hit'lerle güncellenir. İşçi
+    süreçlerin dokunduğu kayıtlar self.touched'da birikir ve ana süreçte
+    record(..., touched) ile indekse işlenir.
+
+    Birden fazla süreç aynı dizini güvenle paylaşabilir (yazımlar atomik);
+    evict() sadece ana süreçten çağrılmalı.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, index=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.index = None       # anahtar -> boyut, en eski kullanılan başta (ilk taramada kurulur)
+        self.total_bytes = 0
+        self.touched = []       # (anahtar, boyut): bu süreçte okunan/yazılan kayıtlar
+        os.makedirs(cache_dir, exist_ok=True)
+        if index:
+            self._load_index()
+
+    @staticmethod
+    def key(mesh_path, num_points, seed):
+        """İçerik adresi (mesh değişirse mtime ile anahtar da değişir)"""
+        mesh_path = os.path.abspath(mesh_path)
+        mtime = os.stat(mesh_path).st_mtime_ns
+        raw = f"{CACHE_VERSION}|{mesh_path}|{mtime}|{num_points}|{seed}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".npy")
+
+    def get(self, key):
+        """Kayıt varsa point cloud'u döndür (ve LRU zamanını güncelle), yoksa None"""
+        path = self._path(key)
+        try:
+            points = np.load(path)
+        except (FileNotFoundError, ValueError, OSError):
+            self.misses += 1
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # Başka süreç evict etmiş olabilir
+        self.hits += 1
+        self._touch(key, self.index[key] if self.index and key in self.index else _file_size(path))
+        return points
+
+    def put(self, key, points):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, points)
+        os.replace(tmp_path, path)
+        self._touch(key, _file_size(path))
+
+    def _touch(self, key, size):
+        """Kaydı en yeni kullanılan yap (indeks kuruluysa boyutu da güncelle)"""
+        self.touched.append((key, size))
+        if self.index is not None:
+            self._index_add(key, size)
+
+    def _index_add(self, key, size):
+        self.total_bytes += size - self.index.pop(key, 0)
+        self.index[key] = size
+
+    def _load_index(self):
+        """Dizini bir kez tara: kayıtlar mtime sırasıyla (en eski başta)"""
+        if self.index is not None:
+            return self.index
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".npy") or name.endswith(".tmp.npy"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime_ns, name[:-len(".npy")], st.st_size))
+        self.index = OrderedDict((key, size) for _, key, size in sorted(entries))
+        self.total_bytes = sum(self.index.values())
+        return self.index
+
+    def size_bytes(self):
+        self._load_index()
+        return self.total_bytes
+
+    def evict(self):
+        """Toplam boyut max_bytes altına inene kadar en eski kayıtları sil (dizin taranmaz)"""
+        index = self._load_index()
+        removed = 0
+        while index and self.total_bytes > self.max_bytes:
+            key, size = index.popitem(last=False)
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            self.total_bytes -= size
+            removed += 1
+        return removed
+
+    def record(self, hits=0, misses=0, touched=()):
+        """İşçi süreçlerden gelen istatistikleri ve dokunulan kayıtları (LRU sırasıyla) topla"""
+        self.hits += hits
+        self.misses += misses
+        if self.index is not None:
+            for key, size in touched:
+                self._index_add(key, size)
+
+    def report(self):
+        total = self.hits + self.misses
+        hit_rate = 100. * self.hits / total if total else 0.0
+        index = self._load_index()
+        size_mb = self.total_bytes / (1024 * 1024)
+        print(f" Point cloud cache: {self.hits} hit, {self.misses} miss "
+              f"({hit_rate:.1f}% hit) | {len(index)} kayıt, {size_mb:.1f} MB "
+              f"/ {self.max_bytes / (1024 * 1024):.0f} MB")
+
+def _file_size(path):
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return 0
@@ -0,0 +1,122 @@
+# pool_trainer.py
+import os
+import time
+import multiprocessing
+import concurrent.futures
+import torch
+from shared_arena import SharedArena
+
+# İşçi süreç durumu (her işçide bir kez oluşturulur)
+_worker_model = None
+_worker_loaders = {}
+
+def _init_worker(num_threads):
+    """İşçi başına sabit intra-op thread sayısı (çekirdekleri aşırı paylaştırma)"""
+    torch.set_num_threads(num_threads)
+
+def _loaders(data_id, resident):
+    """Drone verisi işçide bir kez yüklenir, sonraki round'larda yeniden kullanılır"""
+    from dataset import get_dataloaders
+
+    key = (data_id, resident)
+    if key not in _worker_loaders:
+        _worker_loaders[key] = get_dataloaders(drone_id=data_id, batch_size=16, resident=resident)
+    return _worker_loaders[key]
+
+def _train_job(spec):
+    """
+    İşçide tek drone eğitimi: state_dict paylaşılan bellekten okunur, eğitilen
+    ağırlıklar aynı bloğa geri yazılır. Pipe üzerinden sadece history döner.
+    """
+    global _worker_model
+    from model import get_model
+    from train import train_model
+
+    if _worker_model is None:
+        _worker_model = get_model()
+    model = _worker_model
+
+    arena = SharedArena.attach(spec["shm_name"], spec["layout"])
+    try:
+        views = arena.views()
+        model.load_state_dict({k: torch.from_numpy(v) for k, v in views.items()})
+        train_loader, test_loader = _loaders(spec["data_id"], spec["resident"])
+
+        compute_start = time.perf_counter()
+        history, best_acc = train_model(
+            model, train_loader, test_loader,
+            epochs=spec["epochs"], lr=spec["lr"], device="cpu", deadline=spec["deadline"]
+        )
+        compute_time = time.perf_counter() - compute_start
+
+        with torch.no_grad():
+            for k, t in model.state_dict().items():
+                views[k][...] = t.numpy()
+        del views
+    finally:
+        arena.close()
+    return history, best_acc, compute_time
+
+class ProcessPoolTrainer:
+    """
+    Seçilen drone'ların train_model çağrılarını bir süreç havuzunda paralel yürütür.
+
+    Her işçi torch.set_num_threads(cpu / workers) ile sabitlenir. Client
+    modelinin state_dict'i (FedBN'de lokal BN dahil) drone başına bir
+    SharedArena bloğuna yazılır; işçi eğitip aynı bloğa geri yazar, ağırlıklar
+    pipe'tan pickle edilmez. VectorizedTrainer ile aynı arayüz: train(jobs).
+    """
+    def __init__(self, workers=None, threads_per_worker=None):
+        cpus = os.cpu_count() or 1
+        self.workers = workers or cpus
+        self.threads_per_worker = threads_per_worker or max(1, cpus // self.workers)
+        # spawn: fork + OpenMP thread havuzu kilitlenebilir
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.threads_per_worker,),
+        )
+        self.arenas = {}  # job label -> SharedArena (round'lar arasında yeniden kullanılır)
+
+    def _arena(self, label, state):
+        arena = self.arenas.get(label)
+        if arena is not None and arena.matches(state):
+            arena.write(state)
+            return arena
+        if arena is not None:
+            arena.close()
+        arena = self.arenas[label] = SharedArena.create(state)
+        return arena
+
+    def train(self, jobs):
+        """jobs: begin_fit işleri (data_id dahil) -> [(history, best_acc, compute_time)]"""
+        futures = []
+        for job in jobs:
+            state = {k: t.detach().cpu().numpy() for k, t in job["model"].state_dict().items()}
+            arena = self._arena(job["label"], state)
+            spec = {
+                "shm_name": arena.name,
+                "layout": arena.layout,
+                "data_id": job["data_id"],
+                "resident": job.get("resident", True),
+                "epochs": job["epochs"],
+                "lr": job["lr"],
+                "deadline": job["deadline"],
+            }
+            futures.append(self.executor.submit(_train_job, spec))
+
+        outcomes = []
+        for job, future in zip(jobs, futures):
+            outcome = future.result()
+            # Eğitilen ağırlıkları paylaşılan bloktan client modeline yükle
+            views = self.arenas[job["label"]].views()
+            job["model"].load_state_dict({k: torch.from_numpy(v) for k, v in views.items()})
+            outcomes.append(outcome)
+        return outcomes
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        for arena in self.arenas.values():
+            arena.close()
+        self.arenas = {}
@@ -1,39 +1,425 @@
 # prepare_dataset.py
 import os
+import json
+import zlib
+import argparse
 import numpy as np
 import trimesh
 from pathlib import Path
 from tqdm import tqdm
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from off_mesh import read_off, sample_surface_batch
+from pointcloud_cache import PointCloudCache, CACHE_VERSION, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
 
 # Kategori mapping:  Güvenli vs Tehlikeli
 SAFE_CATEGORIES = ['bathtub', 'bed', 'desk', 'table']
 UNSAFE_CATEGORIES = ['chair', 'dresser', 'monitor', 'night_stand', 'sofa', 'toilet']
 
-def sample_point_cloud(mesh_path, num_points=1024):
+# Paketlenmiş shard dosyaları (drone başına tek dosya)
+SHARD_POINTS_FILE = "points.npy"
+SHARD_LABELS_FILE = "labels.npy"
+SHARD_MANIFEST_FILE = "manifest.json"
+SHARD_VERSION = 1
+
+# Örnek -> kaynak mesh eşlemesi (resume için)
+PLAN_FILE = "plan.json"
+
+MODELNET_PATH = "data/ModelNet10"
+
+# Server tarafı held-out set (ModelNet10 'test' split'i; drone'lar sadece 'train' kullanır)
+HOLDOUT_DIR = "data/holdout"
+
+# Drone ortamları: (güvenli oranı, ortam adı). 5'ten büyük drone id'leri bu
+# listeyi döngüsel olarak kullanır (yüzlerce drone için).
+DRONE_ENVIRONMENTS = {
+    1: (0.8, "Sehir Merkezi - Acik Alanlar"),   # parklar, açık alanlar
+    2: (0.6, "Sanayi Bolgesi - Duz Yuzeyler"),  # düz çatılar
+    3: (0.2, "Orman - Cok Engel"),              # ağaçlar, engeller
+    4: (0.3, "Daglik Alan - Engebeli"),         # kayalar, engebeli
+    5: (0.5, "Karma - Dengeli"),                # her ortamdan
+}
+
+def normalize_point_cloud(points):
+    """Merkeze al ve [-1, 1] aralığına ölçekle ([P, 3] ya da [B, P, 3])"""
+    points = points - points.mean(axis=-2, keepdims=True)
+    scale = np.abs(points).max(axis=(-2, -1), keepdims=True)
+    return points / scale
+
+def _trimesh_sample(mesh_path, num_points, seed):
+    """Yavaş yol: trimesh ile yükle ve örnekle (bozuk OFF dosyaları için)"""
+    mesh = trimesh. load(mesh_path)
+    
+    # Eğer birden fazla mesh varsa birleştir
+    if isinstance(mesh, trimesh.Scene):
+        mesh = mesh.dump(concatenate=True)
+    
+    points, _ = trimesh.sample.sample_surface(mesh, num_points, seed=seed)
+    return np.asarray(points)
+
+def sample_point_clouds(mesh_paths, num_points=1024, seeds=None, cache=None):
     """
-    Mesh dosyasından point cloud örnekle
+    Birden fazla mesh'ten point cloud örnekle (tek çağrıda)
+    
+    OFF dosyaları off_mesh.read_off ile okunur ve hepsi birlikte
+    sample_surface_batch ile örneklenir; okunamayanlar trimesh'e düşer.
+    Dönüş: mesh başına [num_points, 3] float32 ya da hata durumunda None
     """
-    try:
-        mesh = trimesh. load(mesh_path)
-        
-        # Eğer birden fazla mesh varsa birleştir
-        if isinstance(mesh, trimesh.Scene):
-            mesh = mesh.dump(concatenate=True)
-        
-        # Point cloud örnekle
-        points, _ = trimesh.sample.sample_surface(mesh, num_points)
-        
+    if seeds is None:
+        seeds = [None] * len(mesh_paths)
+    results = [None] * len(mesh_paths)
+    
+    # Önce cache
+    keys = [None] * len(mesh_paths)
+    pending = []
+    for i, (mesh_path, seed) in enumerate(zip(mesh_paths, seeds)):
+        if cache is not None and seed is not None:
+            keys[i] = cache.key(mesh_path, num_points, seed)
+            results[i] = cache.get(keys[i])
+        if results[i] is None:
+            pending.append(i)
+    
+    # Hızlı yol: toplu OFF okuma + toplu örnekleme
+    parsed, fallback = [], []
+    for i in pending:
+        try:
+            parsed.append((i, read_off(mesh_paths[i])))
+        except (ValueError, OSError):
+            fallback.append(i)
+    
+    raw = {}
+    if parsed:
+        try:
+            batch = sample_surface_batch([mesh for _, mesh in parsed], num_points,
+                                         [seeds[i] for i, _ in parsed])
+            raw.update({i: points for (i, _), points in zip(parsed, batch)})
+        except ValueError:
+            # Batch içinde dejenere mesh var: hepsini tek tek dene
+            for i, mesh in parsed:
+                try:
+                    raw[i] = sample_surface_batch([mesh], num_points, [seeds[i]])[0]
+                except ValueError:
+                    fallback.append(i)
+    
+    for i in fallback:
+        try:
+            raw[i] = _trimesh_sample(mesh_paths[i], num_points, seeds[i])
+        except Exception as e: 
+            print(f" Hata ({mesh_paths[i]}): {e}")
+    
+    for i, points in raw.items():
         # Normalize et ([-1, 1] aralığına)
-        points = points - points.mean(axis=0)
-        points = points / np.abs(points).max()
-        
-        return points. astype(np.float32)
+        points = normalize_point_cloud(points).astype(np.float32)
+        if not np.all(np.isfinite(points)):
+            print(f" Hata ({mesh_paths[i]}): geçersiz nokta değerleri")
+            continue
+        if keys[i] is not None:
+            cache.put(keys[i], points)
+        results[i] = points
     
-    except Exception as e: 
-        print(f" Hata ({mesh_path}): {e}")
+    return results
+
+def sample_point_cloud(mesh_path, num_points=1024, seed=None, cache=None):
+    """
+    Mesh dosyasından point cloud örnekle (seed verilirse deterministik)
+    
+    cache (PointCloudCache) verilirse ve seed sabitse sonuç önce cache'te aranır.
+    """
+    return sample_point_clouds([mesh_path], num_points, [seed], cache)[0]
+
+def mesh_seed(base_seed, mesh_path):
+    """
+    Mesh başına deterministik seed: (base_seed, ModelNet içindeki göreli yol).
+    Drone'dan ve işçi sırasından bağımsız olduğu için paralel çalışma aynı sonucu verir.
+    """
+    rel = "/".join(Path(mesh_path).parts[-3:])  # kategori/split/dosya.off
+    entropy = [int(base_seed), zlib.crc32(rel.encode("utf-8"))]
+    return int(np.random.SeedSequence(entropy).generate_state(1)[0])
+
+def _sample_index(path):
+    """safe_12.npy -> 12 (sayısal sıralama için)"""
+    return int(Path(path).stem.split("_")[-1])
+
+def list_sample_files(data_dir, prefix):
+    """Eski (dosya başına örnek) düzendeki dosyaları sayısal sırayla listele"""
+    return sorted(Path(data_dir).glob(f"{prefix}_*.npy"), key=_sample_index)
+
+def write_drone_shard(output_dir, safe_points, unsafe_points):
+    """
+    Drone verisini tek bir [N, P, 3] float32 shard + label dizisi + manifest olarak yaz.
+    Sıra: önce güvenli (label 0), sonra tehlikeli (label 1) örnekler.
+    """
+    clouds = list(safe_points) + list(unsafe_points)
+    if not clouds:
         return None
 
-def prepare_drone_dataset(drone_id, safe_ratio=0.5, samples_per_drone=200):
+    points = np.stack(clouds).astype(np.float32, copy=False)
+    labels = np.array([0] * len(safe_points) + [1] * len(unsafe_points), dtype=np.int64)
+
+    # Önce veriyi yaz, manifest en son (yarım kalan yazım shard olarak görülmesin)
+    points_path = os.path.join(output_dir, SHARD_POINTS_FILE)
+    labels_path = os.path.join(output_dir, SHARD_LABELS_FILE)
+    np.save(points_path + ".tmp.npy", points)
+    np.save(labels_path + ".tmp.npy", labels)
+    os.replace(points_path + ".tmp.npy", points_path)
+    os.replace(labels_path + ".tmp.npy", labels_path)
+
+    manifest = {
+        "version": SHARD_VERSION,
+        "num_samples": int(points.shape[0]),
+        "num_points": int(points.shape[1]),
+        "num_safe": len(safe_points),
+        "num_unsafe": len(unsafe_points),
+        "dtype": "float32",
+        "points_file": SHARD_POINTS_FILE,
+        "labels_file": SHARD_LABELS_FILE,
+    }
+    manifest_path = os.path.join(output_dir, SHARD_MANIFEST_FILE)
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    return manifest
+
+def pack_drone_dataset(data_dir, num_safe=None, num_unsafe=None, plan=None, num_points=1024):
+    """
+    Mevcut safe_N.npy / unsafe_N.npy dosyalarından shard oluştur (yeniden örneklemeden).
+    plan verilirse sadece kaydedilmiş kaynağı slot'un mesh'iyle eşleşen dosyalar alınır;
+    boş kalan (yedeği bitmiş) slot'ların eski çalıştırmalardan kalan dosyaları silinir.
+    Plan yoksa num_safe/num_unsafe ile sadece N < num olan dosyalar alınır (eski fazlalıklar hariç).
+    """
+    def planned_files(prefix):
+        entry = plan[prefix]
+        sources = entry.get("sources", {})
+        files = []
+        for slot, mesh_path in enumerate(entry["slots"]):
+            path = os.path.join(data_dir, f"{prefix}_{slot}.npy")
+            if mesh_path is None:
+                if os.path.exists(path):
+                    os.remove(path)
+            elif sources.get(str(slot)) == _slot_source(plan, mesh_path, num_points) and os.path.exists(path):
+                files.append(path)
+        return files
+    
+    def load(prefix, limit):
+        if plan is not None:
+            files = planned_files(prefix)
+        else:
+            files = list_sample_files(data_dir, prefix)
+            if limit is not None:
+                files = [f for f in files if _sample_index(f) < limit]
+        return [np.load(f) for f in files]
+    
+    safe_points = load("safe", num_safe)
+    unsafe_points = load("unsafe", num_unsafe)
+    return write_drone_shard(data_dir, safe_points, unsafe_points)
+
+def drone_environment(drone_id):
+    """Drone için (güvenli oranı, ortam adı)"""
+    return DRONE_ENVIRONMENTS[(drone_id - 1) % len(DRONE_ENVIRONMENTS) + 1]
+
+def _select_candidates(categories, num_samples, rng, modelnet_path):
+    """
+    Kategori sırasıyla aday mesh listesi (orijinal seçim mantığı: kategori başına
+    num/len(kategori) + 10 dosya). İlk num_samples aday birincil, kalanlar yedek.
+    """
+    candidates = []
+    for category in categories:
+        train_dir = os.path.join(modelnet_path, category, "train")
+        off_files = sorted(Path(train_dir).glob("*.off"))
+        if not off_files:
+            continue
+        
+        samples_from_cat = min(len(off_files), num_samples // len(categories) + 10)
+        selected = rng.choice(len(off_files), samples_from_cat, replace=False)
+        candidates.extend(str(off_files[i]) for i in selected)
+    return candidates
+
+def plan_drone_dataset(drone_id, samples_per_drone=200, seed=0, safe_ratio=None,
+                       modelnet_path=MODELNET_PATH):
+    """
+    Drone için örnek planı: her label için slot -> mesh eşlemesi.
+    Aynı seed ile her zaman aynı plan; daha önce kaydedilmiş plan varsa o kullanılır
+    (yarıda kalan üretim aynı kaynaklarla devam eder).
+    """
+    output_dir = f"data/drone{drone_id}"
+    plan_path = os.path.join(output_dir, PLAN_FILE)
+    
+    default_ratio, env_name = drone_environment(drone_id)
+    ratio = default_ratio if safe_ratio is None else safe_ratio
+    num_safe = int(samples_per_drone * ratio)
+    num_unsafe = samples_per_drone - num_safe
+    
+    if os.path.exists(plan_path):
+        with open(plan_path) as f:
+            plan = json.load(f)
+        if (plan.get("seed") == seed and plan["safe"]["num"] == num_safe
+                and plan["unsafe"]["num"] == num_unsafe):
+            return plan
+    
+    rng = np.random.default_rng([seed, drone_id])
+    plan = {"drone_id": drone_id, "seed": seed, "env_name": env_name}
+    for prefix, categories, num in [("safe", SAFE_CATEGORIES, num_safe),
+                                    ("unsafe", UNSAFE_CATEGORIES, num_unsafe)]:
+        candidates = _select_candidates(categories, num, rng, modelnet_path)
+        plan[prefix] = {
+            "num": num,
+            "slots": candidates[:num],
+            "spares": candidates[num:],
+            "failed": [],
+        }
+    return plan
+
+def save_plan(plan):
+    output_dir = f"data/drone{plan['drone_id']}"
+    os.makedirs(output_dir, exist_ok=True)
+    plan_path = os.path.join(output_dir, PLAN_FILE)
+    with open(plan_path + ".tmp", "w") as f:
+        json.dump(plan, f, indent=1)
+    os.replace(plan_path + ".tmp", plan_path)
+
+def _sample_chunk_to_files(chunk, num_points, cache_dir=None):
+    """
+    İşçi süreç: bir grup mesh'i tek çağrıda örnekle ve doğrudan diske yaz
+    (points pipe'tan dönmez). chunk: [(mesh_path, output_path, seed), ...]
+    Dönüş: (örnek başına başarılı mı, cache hit, cache miss, dokunulan cache kayıtları)
+    """
+    cache = PointCloudCache(cache_dir) if cache_dir else None
+    clouds = sample_point_clouds([c[0] for c in chunk], num_points=num_points,
+                                 seeds=[c[2] for c in chunk], cache=cache)
+    
+    ok = []
+    for (_, output_path, _), points in zip(chunk, clouds):
+        if points is not None:
+            np.save(output_path + ".tmp.npy", points)
+            os.replace(output_path + ".tmp.npy", output_path)
+        ok.append(points is not None)
+    
+    hits, misses, touched = (cache.hits, cache.misses, cache.touched) if cache else (0, 0, [])
+    return ok, hits, misses, touched
+
+def _slot_source(plan, mesh_path, num_points):
+    """
+    Slot çıktısını üreten girdiler. plan[prefix]["sources"]'a yazılır; resume
+    dosyayı sadece kayıt mevcut planla eşleşirse kullanır (farklı seed/örnek
+    sayısıyla yeniden üretilmiş plan ya da eski örnekleyicinin dosyaları karışmaz).
+    """
+    return {"mesh": mesh_path, "seed": mesh_seed(plan["seed"], mesh_path),
+            "num_points": num_points, "sampler": CACHE_VERSION}
+
+def _pending_tasks(plan, resume, num_points=1024):
+    """Mevcut planla eşleşen çıktısı henüz olmayan (drone, label, slot) işleri"""
+    output_dir = f"data/drone{plan['drone_id']}"
+    tasks = []
+    for prefix in ["safe", "unsafe"]:
+        sources = plan[prefix].get("sources", {})
+        for slot, mesh_path in enumerate(plan[prefix]["slots"]):
+            if mesh_path is None:
+                continue
+            output_path = os.path.join(output_dir, f"{prefix}_{slot}.npy")
+            if (resume and os.path.exists(output_path)
+                    and sources.get(str(slot)) == _slot_source(plan, mesh_path, num_points)):
+                continue
+            tasks.append((plan["drone_id"], prefix, slot, mesh_path, output_path))
+    return tasks
+
+def _reassign_failed(plan, prefix, slot):
+    """Başarısız slot'a sıradaki yedek mesh'i ata (yedek yoksa slot boş kalır)"""
+    entry = plan[prefix]
+    entry["failed"].append(entry["slots"][slot])
+    entry.get("sources", {}).pop(str(slot), None)
+    entry["slots"][slot] = entry["spares"].pop(0) if entry["spares"] else None
+
+def prepare_datasets(drone_ids, samples_per_drone=200, seed=0, workers=None,
+                     resume=True, num_points=1024, safe_ratio=None,
+                     cache_dir=DEFAULT_CACHE_DIR, cache_max_bytes=DEFAULT_MAX_BYTES,
+                     chunk_size=16):
+    """
+    Birden fazla drone için dataset'i process pool ile üret.
+    
+    - Mesh örnekleme tüm çekirdeklere dağıtılır (tüm drone'lar tek havuzda)
+    - Her örnek mesh başına seed ile deterministik (işçi sayısından bağımsız)
+    - resume=True: çıktısı mevcut planla (mesh, seed, nokta sayısı) eşleşen örnekler atlanır
+    - cache_dir: aynı mesh'i seçen drone'lar / tekrar build'ler cache'ten okur (None: kapalı); boyut
+      sınırı (LRU) her işçi dalgasından sonra uygulanır
+    - İşçiler chunk_size mesh'i tek toplu örnekleme çağrısında işler
+    - Sonunda her drone için paketlenmiş shard planın kaynaklarından yazılır
+    """
+    workers = workers or os.cpu_count() or 1
+    # Dizin bir kez taranır; LRU indeksi sonra işçilerin dokunduğu kayıtlarla güncellenir
+    cache = PointCloudCache(cache_dir, max_bytes=cache_max_bytes, index=True) if cache_dir else None
+    
+    plans = {}
+    for drone_id in drone_ids:
+        plan = plan_drone_dataset(drone_id, samples_per_drone, seed=seed, safe_ratio=safe_ratio)
+        save_plan(plan)
+        plans[drone_id] = plan
+        
+        pending = len(_pending_tasks(plan, resume, num_points))
+        print(f"\n Drone {drone_id} ({plan['env_name']}):")
+        print(f"   Güvenli: {plan['safe']['num']} örnek")
+        print(f"   Tehlikeli: {plan['unsafe']['num']} örnek")
+        print(f"   Üretilecek: {pending} (mevcut: {plan['safe']['num'] + plan['unsafe']['num'] - pending})")
+    
+    tasks = [t for plan in plans.values() for t in _pending_tasks(plan, resume, num_points)]
+    evicted = 0
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Başarısız mesh'ler yedekle yeniden denenir (yedekler bitene kadar)
+        while tasks:
+            futures = {}
+            for start in range(0, len(tasks), chunk_size):
+                group = tasks[start:start + chunk_size]
+                chunk = [(mesh_path, output_path, mesh_seed(seed, mesh_path))
+                         for _, _, _, mesh_path, output_path in group]
+                future = executor.submit(_sample_chunk_to_files, chunk, num_points, cache_dir)
+                futures[future] = group
+            
+            failed = []
+            with tqdm(total=len(tasks), desc=f"  {len(plans)} drone, {workers} işçi", leave=False) as pbar:
+                for done, future in enumerate(as_completed(futures), 1):
+                    ok, hits, misses, touched = future.result()
+                    if cache is not None:
+                        cache.record(hits, misses, touched)
+                        # Her işçi dalgasından sonra LRU: build sırasında da boyut sınırı korunur
+                        if misses and done % workers == 0:
+                            evicted += cache.evict()
+                    for (drone_id, prefix, slot, mesh_path, _), success in zip(futures[future], ok):
+                        if success:
+                            sources = plans[drone_id][prefix].setdefault("sources", {})
+                            sources[str(slot)] = _slot_source(plans[drone_id], mesh_path, num_points)
+                        else:
+                            failed.append((drone_id, prefix, slot))
+                    pbar.update(len(ok))
+            
+            # Yedekler slot sırasıyla dağıtılır (as_completed sırası zamanlamaya bağlı)
+            touched = set()
+            for drone_id, prefix, slot in sorted(failed):
+                _reassign_failed(plans[drone_id], prefix, slot)
+                touched.add(drone_id)
+            for plan in plans.values():
+                save_plan(plan)  # Başarılı slot'ların kaynakları da kaydedilir
+            
+            tasks = [t for drone_id in touched for t in _pending_tasks(plans[drone_id], True, num_points)]
+    
+    # Paketlenmiş shard (dataset bunu memory-map ile okur)
+    for drone_id, plan in plans.items():
+        output_dir = f"data/drone{drone_id}"
+        manifest = pack_drone_dataset(output_dir, plan=plan, num_points=num_points)
+        safe = manifest["num_safe"] if manifest else 0
+        unsafe = manifest["num_unsafe"] if manifest else 0
+        print(f" Drone {drone_id}:  {safe} güvenli + {unsafe} tehlikeli = {safe + unsafe} toplam")
+    
+    # Build raporu: cache istatistikleri + boyut sınırı (LRU)
+    if cache is not None:
+        removed = evicted + cache.evict()
+        cache.report()
+        if removed:
+            print(f"   LRU: {removed} eski kayıt silindi")
+    
+    return plans
+
+def prepare_drone_dataset(drone_id, safe_ratio=None, samples_per_drone=200, seed=0,
+                          workers=None, resume=True, cache_dir=DEFAULT_CACHE_DIR):
     """
     Her drone için özelleştirilmiş dataset hazırla
     
@@ -43,114 +429,86 @@ def prepare_drone_dataset(drone_id, safe_ratio=0.5, samples_per_drone=200):
     Drone 4: Dağlık alan (30% güvenli - kayalar, engebeli)
     Drone 5: Karma/Test (50% güvenli - her ortamdan)
     """
-    
-    output_dir = f"data/drone{drone_id}"
+    return prepare_datasets([drone_id], samples_per_drone=samples_per_drone, seed=seed,
+                            workers=workers, resume=resume, safe_ratio=safe_ratio,
+                            cache_dir=cache_dir)
+
+def prepare_holdout(output_dir=HOLDOUT_DIR, num_points=1024, seed=0, max_per_category=None,
+                    modelnet_path=MODELNET_PATH, cache_dir=DEFAULT_CACHE_DIR, chunk_size=64):
+    """
+    ModelNet10 'test' split'inden server held-out set'i (tek shard, drone shard formatı).
+    Drone dataset'leri 'train' split'inden örneklendiği için sızıntı yok.
+    """
     os.makedirs(output_dir, exist_ok=True)
+    cache = PointCloudCache(cache_dir) if cache_dir else None
     
-    modelnet_path = "data/ModelNet10"
-    
-    # Drone'a özel dağılım
-    if drone_id == 1:
-        # Şehir merkezi:  %80 güvenli
-        num_safe = int(samples_per_drone * 0.8)
-        num_unsafe = samples_per_drone - num_safe
-        env_name = "Sehir Merkezi - Acik Alanlar"
-    elif drone_id == 2:
-        # Sanayi:  %60 güvenli
-        num_safe = int(samples_per_drone * 0.6)
-        num_unsafe = samples_per_drone - num_safe
-        env_name = "Sanayi Bolgesi - Duz Yuzeyler"
-    elif drone_id == 3:
-        # Orman: %20 güvenli
-        num_safe = int(samples_per_drone * 0.2)
-        num_unsafe = samples_per_drone - num_safe
-        env_name = "Orman - Cok Engel"
-    elif drone_id == 4:
-        # Dağlık:  %30 güvenli
-        num_safe = int(samples_per_drone * 0.3)
-        num_unsafe = samples_per_drone - num_safe
-        env_name = "Daglik Alan - Engebeli"
-    else:
-        # Karma:  %50-%50
-        num_safe = samples_per_drone // 2
-        num_unsafe = samples_per_drone - num_safe
-        env_name = "Karma - Dengeli"
-    
-    print(f"\n Drone {drone_id} ({env_name}):")
-    print(f"   Güvenli: {num_safe} örnek")
-    print(f"   Tehlikeli: {num_unsafe} örnek")
-    
-    # Güvenli alanlar
-    safe_count = 0
-    for category in SAFE_CATEGORIES: 
-        train_dir = os.path.join(modelnet_path, category, "train")
-        off_files = list(Path(train_dir).glob("*.off"))
-        
-        samples_from_cat = min(len(off_files), num_safe // len(SAFE_CATEGORIES) + 10)
-        selected_files = np.random.choice(off_files, samples_from_cat, replace=False)
-        
-        for off_file in tqdm(selected_files, desc=f"  {category} (safe)", leave=False):
-            if safe_count >= num_safe: 
-                break
-            
-            points = sample_point_cloud(str(off_file))
-            if points is not None:
-                np.save(f"{output_dir}/safe_{safe_count}.npy", points)
-                safe_count += 1
-        
-        if safe_count >= num_safe: 
-            break
-    
-    # Tehlikeli alanlar
-    unsafe_count = 0
-    for category in UNSAFE_CATEGORIES:
-        train_dir = os.path.join(modelnet_path, category, "train")
-        off_files = list(Path(train_dir).glob("*.off"))
+    clouds = {}
+    for prefix, categories in [("safe", SAFE_CATEGORIES), ("unsafe", UNSAFE_CATEGORIES)]:
+        mesh_paths = []
+        for category in categories:
+            off_files = sorted(Path(modelnet_path, category, "test").glob("*.off"))
+            mesh_paths.extend(str(f) for f in off_files[:max_per_category])
         
-        samples_from_cat = min(len(off_files), num_unsafe // len(UNSAFE_CATEGORIES) + 10)
-        selected_files = np.random.choice(off_files, samples_from_cat, replace=False)
-        
-        for off_file in tqdm(selected_files, desc=f"  {category} (unsafe)", leave=False):
-            if unsafe_count >= num_unsafe:
-                break
-            
-            points = sample_point_cloud(str(off_file))
-            if points is not None:
-                np.save(f"{output_dir}/unsafe_{unsafe_count}. npy", points)
-                unsafe_count += 1
-        
-        if unsafe_count >= num_unsafe:
-            break
+        clouds[prefix] = []
+        for start in tqdm(range(0, len(mesh_paths), chunk_size), desc=f"   Held-out {prefix}"):
+            chunk = mesh_paths[start:start + chunk_size]
+            points = sample_point_clouds(chunk, num_points, [mesh_seed(seed, p) for p in chunk], cache)
+            clouds[prefix].extend(p for p in points if p is not None)
     
-    print(f" Drone {drone_id}:  {safe_count} güvenli + {unsafe_count} tehlikeli = {safe_count + unsafe_count} toplam")
+    manifest = write_drone_shard(output_dir, clouds["safe"], clouds["unsafe"])
+    if manifest:
+        print(f"   Held-out: {manifest['num_safe']} güvenli + {manifest['num_unsafe']} tehlikeli -> {output_dir}")
+    return manifest
 
 def main():
-    print(" ModelNet10'dan 5 Drone Dataset'i Hazırlanıyor...")
+    parser = argparse.ArgumentParser(description="ModelNet10'dan drone dataset'leri üret")
+    parser.add_argument("--drones", type=int, default=5, help="drone sayısı (1..N)")
+    parser.add_argument("--samples", type=int, default=200, help="drone başına örnek")
+    parser.add_argument("--workers", type=int, default=None, help="işçi süreç sayısı (varsayılan: CPU sayısı)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-resume", action="store_true", help="mevcut örnekleri yeniden üret")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="point cloud cache dizini")
+    parser.add_argument("--cache-size-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="cache boyut sınırı (LRU)")
+    parser.add_argument("--no-cache", action="store_true", help="cache'i kapat")
+    parser.add_argument("--holdout", action="store_true",
+                        help="sadece server held-out set'ini üret (ModelNet10 test split)")
+    args = parser.parse_args()
+    
+    if args.holdout:
+        print(" ModelNet10 test split'inden held-out set hazırlanıyor...")
+        prepare_holdout(seed=args.seed, cache_dir=None if args.no_cache else args.cache_dir)
+        return
+    
+    drone_ids = list(range(1, args.drones + 1))
+    
+    print(f" ModelNet10'dan {len(drone_ids)} Drone Dataset'i Hazırlanıyor...")
     print("="*60)
     
-    # 5 drone için veri hazırla
-    for drone_id in [1, 2, 3, 4, 5]:
-        prepare_drone_dataset(drone_id, samples_per_drone=200)
+    prepare_datasets(drone_ids, samples_per_drone=args.samples, seed=args.seed,
+                     workers=args.workers, resume=not args.no_resume,
+                     cache_dir=None if args.no_cache else args.cache_dir,
+                     cache_max_bytes=args.cache_size_mb * 1024 * 1024)
     
     print("\n" + "="*60)
     print(" Tüm drone dataset'leri hazır!")
     print("\n Dizin yapısı:")
     print("data/")
-    print("  ├── drone1/ (Şehir - 80% güvenli)")
-    print("  ├── drone2/ (Sanayi - 60% güvenli)")
-    print("  ├── drone3/ (Orman - 20% güvenli)")
-    print("  ├── drone4/ (Dağlık - 30% güvenli)")
-    print("  └── drone5/ (Karma - 50% güvenli)")
+    for drone_id in drone_ids:
+        ratio, env_name = drone_environment(drone_id)
+        branch = "└──" if drone_id == drone_ids[-1] else "├──"
+        print(f"  {branch} drone{drone_id}/ ({env_name} - {ratio*100:.0f}% güvenli)")
     
     # Özet istatistikler
     print("\n Dataset Özeti:")
-    for drone_id in [1, 2, 3, 4, 5]:
+    for drone_id in drone_ids:
         drone_dir = f"data/drone{drone_id}"
         if os.path.exists(drone_dir):
             files = os.listdir(drone_dir)
             safe = len([f for f in files if f.startswith('safe')])
             unsafe = len([f for f in files if f.startswith('unsafe')])
-            print(f"  Drone {drone_id}: {safe} güvenli, {unsafe} tehlikeli")
+            packed = "shard" if SHARD_MANIFEST_FILE in files else "shard yok"
+            print(f"  Drone {drone_id}: {safe} güvenli, {unsafe} tehlikeli ({packed})")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,246 @@
+# robust.py
+import math
+import numpy as np
+from aggregation import StreamingAggregator
+
+ROBUST_METHODS = ("median", "trimmed_mean", "krum")
+CHUNK = 1 << 14  # Sütun parçası: [CHUNK, K] transpoze blok cache'te kalır
+
+def _column_blocks(updates, chunk):
+    """[K, P] matrisini [c, K] bitişik bloklara böl (sıralama son eksende hızlı)"""
+    for start in range(0, updates.shape[1], chunk):
+        yield start, np.ascontiguousarray(updates[:, start:start + chunk].T)
+
+def _positive_rows(updates, weights):
+    """
+    Sıfır ağırlıklı satırları at (atlanan client'lar): kırpma/komşu sayımında
+    yer tutmasınlar. Dönüş: (updates, weights, orijinal satır indeksleri).
+    Toplam ağırlık sıfırsa ValueError.
+    """
+    positive = np.flatnonzero(weights > 0)
+    if len(positive) == 0:
+        raise ValueError("Pozitif ağırlıklı güncelleme yok")
+    if len(positive) == len(weights):
+        return updates, weights, positive
+    return updates[positive], weights[positive], positive
+
+def weighted_median(updates, weights, chunk=CHUNK):
+    """
+    Koordinat bazlı ağırlıklı medyan.
+    updates: [K, P] client delta'ları, weights: [K] -> [P]
+    """
+    out = np.empty(updates.shape[1], dtype=updates.dtype)
+    half = weights.sum() / 2
+    for start, block in _column_blocks(updates, chunk):
+        order = np.argsort(block, axis=1)
+        cumulative = np.cumsum(weights[order], axis=1)
+        # Kümülatif ağırlık monoton: yarıyı ilk geçen sıra = yarının altında kalan değer sayısı
+        index = np.minimum((cumulative < half).sum(axis=1, keepdims=True), block.shape[1] - 1)
+        out[start:start + len(block)] = np.take_along_axis(
+            block, np.take_along_axis(order, index, axis=1), axis=1)[:, 0]
+    return out
+
+def trimmed_mean(updates, weights, trim_ratio=0.1, chunk=CHUNK):
+    """
+    Koordinat bazlı ağırlıklı kırpılmış ortalama: her koordinatta en küçük ve
+    en büyük max(1, ⌈trim_ratio·K⌉) değer atılır (az client'ta kırpma sıfıra
+    yuvarlanıp düz ortalamaya dönüşmesin), kalanlar priority ağırlığıyla ortalanır.
+    trim_ratio=0 düz ağırlıklı ortalama; K < 3 ise kırpılacak değer yok: ValueError.
+    Sıfır ağırlıklı satırlar K'ya sayılmaz.
+    """
+    updates, weights, _ = _positive_rows(updates, weights)
+    num_clients = updates.shape[0]
+    if trim_ratio <= 0:
+        return (weights @ updates / weights.sum()).astype(updates.dtype)
+    if num_clients < 3:
+        raise ValueError(f"Kırpılmış ortalama için en az 3 client gerekli ({num_clients} var)")
+    trim = max(1, math.ceil(trim_ratio * num_clients - 1e-9))  # 1e-9: 0.3·10 = 3.0000000000000004
+    if num_clients - 2 * trim <= 0:
+        raise ValueError(f"trim_ratio={trim_ratio} ile {num_clients} client'tan değer kalmıyor")
+
+    out = np.empty(updates.shape[1], dtype=updates.dtype)
+    for start, block in _column_blocks(updates, chunk):
+        order = np.argsort(block, axis=1)[:, trim:num_clients - trim]
+        kept_weights = weights[order]
+        kept = np.take_along_axis(block, order, axis=1)
+        out[start:start + len(block)] = (kept * kept_weights).sum(axis=1) / kept_weights.sum(axis=1)
+    return out
+
+def krum_select(updates, num_byzantine=1, multi=True):
+    """
+    (Multi-)Krum seçimi: her client'ın skoru en yakın K - f - 2 komşusuna
+    kare uzaklıkları toplamı. Uzaklıklar Gram matrisinden tek matmul ile.
+    multi=True: en düşük skorlu K - f client, aksi halde tek client.
+    """
+    num_clients = updates.shape[0]
+    neighbours = num_clients - num_byzantine - 2
+    if neighbours < 1:
+        raise ValueError(f"Krum için en az f + 3 = {num_byzantine + 3} client gerekli ({num_clients} var)")
+
+    gram = (updates @ updates.T).astype(np.float64)
+    norms = np.diag(gram)
+    distances = np.maximum(norms[:, None] + norms[None, :] - 2 * gram, 0)
+    np.fill_diagonal(distances, np.inf)
+    scores = np.partition(distances, neighbours - 1, axis=1)[:, :neighbours].sum(axis=1)
+    keep = num_clients - num_byzantine if multi else 1
+    return np.argsort(scores, kind="stable")[:keep]
+
+def krum(updates, weights, num_byzantine=1, multi=True):
+    """
+    Krum'un seçtiği client'ların priority ağırlıklı ortalaması -> ([P], seçilen indeksler).
+    Sıfır ağırlıklı satırlar skorlanmaz ve seçilmez.
+    """
+    positive_updates, _, positive = _positive_rows(updates, weights)
+    selected = positive[krum_select(positive_updates, num_byzantine, multi)]
+    mask = np.zeros_like(weights)
+    mask[selected] = weights[selected]
+    # Maskeli ağırlıklarla tek vektör-matris çarpımı: seçilen satırlar kopyalanmaz
+    return (mask @ updates / mask.sum()).astype(updates.dtype), selected
+
+class RobustAggregator(StreamingAggregator):
+    """
+    Byzantine-robust aggregation (median / trimmed_mean / krum).
+
+    StreamingAggregator ile aynı arayüz (reset/add/result): her güncelleme
+    önceden ayrılmış [K, P] float32 matrisinin bir satırına doğrudan delta
+    olarak çözülür (katman view'ları satırın içine bakar, ara kopya yok).
+    result() birleştirmeyi tüm client'lar üzerinde sütun blokları halinde
+    vektörel yapar (NumPy sıralama/matmul); priority × network quality ×
+    num_examples ağırlıkları korunur.
+    Krum'da dışlanan satırlar self.rejected'da (add sırasıyla) tutulur.
+    """
+    def __init__(self, method="median", trim_ratio=0.1, num_byzantine=1, dtype=np.float32):
+        if method not in ROBUST_METHODS:
+            raise ValueError(f"Bilinmeyen robust yöntem: {method} (seçenekler: {ROBUST_METHODS})")
+        super().__init__(dtype)
+        self.method = method
+        self.trim_ratio = trim_ratio
+        self.num_byzantine = num_byzantine
+        self.stack = None
+        self.weights = []
+        self.rejected = []
+
+    def reset(self, reference):
+        """Yeni aggregation: satır matrisi şekil değişmedikçe yeniden kullanılır"""
+        self.shapes = [ref.shape for ref in reference]
+        self.sizes = [int(np.prod(shape)) for shape in self.shapes]
+        num_params = sum(self.sizes)
+        if self.stack is None or self.stack.shape[1] != num_params:
+            self.stack = np.empty((8, num_params), dtype=self.dtype)
+        self.weights = []
+        self.rejected = []
+        self.total_weight = 0.0
+        self.count = 0
+
+    def _row_views(self, row):
+        """Satırı katman şekillerinde view'lara böl"""
+        views, offset = [], 0
+        for shape, size in zip(self.shapes, self.sizes):
+            views.append(self.stack[row, offset:offset + size].reshape(shape))
+            offset += size
+        return views
+
+    def add(self, tensors, encoding, is_delta, reference, weight, norm_weight=None):
+        """
+        Güncellemeyi sıradaki satıra çöz. norm_weight kullanılmaz: robust
+        birleştirme ağırlıkları kendi içinde normalize eder.
+        """
+        if self.count == len(self.stack):
+            grown = np.empty((2 * len(self.stack), self.stack.shape[1]), dtype=self.dtype)
+            grown[:self.count] = self.stack[:self.count]
+            self.stack = grown
+        self.scratch = self._row_views(self.count)
+        self._decode(tensors, encoding, is_delta, reference)  # Hata: satır sonraki add'de ezilir
+        self.weights.append(float(weight))
+        self.total_weight += weight
+        self.count += 1
+
+    def combine(self):
+        """Satırları seçilen yöntemle tek delta vektörüne indir -> [P]"""
+        updates = self.stack[:self.count]
+        weights = np.asarray(self.weights, dtype=np.float64)
+        if self.method == "krum":
+            try:
+                combined, selected = krum(updates, weights, self.num_byzantine)
+                chosen = set(selected.tolist())
+                self.rejected = [i for i in range(self.count) if i not in chosen]
+                return combined
+            except ValueError as e:
+                print(f"   ⚠️  {e}, ağırlıklı medyan kullanılıyor")
+                return weighted_median(updates, weights)
+        if self.method == "trimmed_mean":
+            try:
+                return trimmed_mean(updates, weights, self.trim_ratio)
+            except ValueError as e:
+                print(f"   ⚠️  {e}, ağırlıklı ortalama kullanılıyor")
+                return (weights @ updates / weights.sum()).astype(updates.dtype)
+        return weighted_median(updates, weights)
+
+    def result(self, reference, scale=1.0, total_weight=None):
+        """Yeni global model: reference + scale * robust_delta. Ağırlık sıfırsa None."""
+        if self.count == 0 or not any(w > 0 for w in self.weights):
+            return None
+
+        delta = self.combine()
+        new_global, offset = [], 0
+        for ref, size in zip(reference, self.sizes):
+            updated = ref + scale * delta[offset:offset + size].reshape(ref.shape).astype(np.float64)
+            if not np.issubdtype(ref.dtype, np.floating):
+                updated = np.rint(updated)
+            new_global.append(updated.astype(ref.dtype))
+            offset += size
+        return new_global
+
+def benchmark(client_counts=(5, 10, 20, 40), num_params=None):
+    """Client sayısına göre aggregation süresi (model boyutunda rastgele delta'lar)"""
+    import time
+    from model import get_model, count_parameters
+
+    num_params = num_params or count_parameters(get_model())
+    print(f" Parametre sayısı: {num_params:,}")
+    print(f" {'K':>4s} | {'fedavg':>9s} | {'median':>9s} | {'trimmed':>9s} | {'krum':>9s} | {'np.median':>9s}")
+
+    rng = np.random.default_rng(0)
+    for num_clients in client_counts:
+        updates = rng.standard_normal((num_clients, num_params), dtype=np.float32)
+        weights = rng.uniform(1, 3, num_clients)
+        timings = []
+        for fn in (
+            lambda: weights @ updates / weights.sum(),
+            lambda: weighted_median(updates, weights),
+            lambda: trimmed_mean(updates, weights, 0.1),
+            lambda: krum(updates, weights, num_byzantine=1),
+            lambda: np.median(updates, axis=0),  # Ağırlıksız NumPy referansı
+        ):
+            start = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f" {num_clients:4d} | " + " | ".join(f"{t:7.1f}ms" for t in timings))
+
+def poisoning_demo(num_honest=10, num_byzantine=2, num_params=10000):
+    """Dürüst delta'lar + büyük zehirli güncellemeler: ortalamadan sapma"""
+    rng = np.random.default_rng(1)
+    honest = rng.normal(0.01, 0.01, (num_honest, num_params)).astype(np.float32)
+    poisoned = rng.normal(-5.0, 1.0, (num_byzantine, num_params)).astype(np.float32)
+    updates = np.concatenate([honest, poisoned])
+    weights = np.ones(len(updates))
+    target = honest.mean(axis=0)
+
+    results = {
+        "fedavg": weights @ updates / weights.sum(),
+        "median": weighted_median(updates, weights),
+        "trimmed_mean": trimmed_mean(updates, weights, 0.2),
+        "krum": krum(updates, weights, num_byzantine)[0],
+    }
+    print(f" Zehirleme: {num_honest} dürüst + {num_byzantine} Byzantine client")
+    for name, combined in results.items():
+        error = float(np.abs(combined - target).mean())
+        print(f"   {name:13s}: dürüst ortalamadan ort. sapma {error:.4f}")
+
+if __name__ == "__main__":
+    import sys
+
+    counts = tuple(int(k) for k in sys.argv[1:]) or (5, 10, 20, 40)
+    poisoning_demo()
+    print()
+    benchmark(counts)
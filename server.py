@@ -1,9 +1,33 @@
 # server.py
 import flwr as fl
 from typing import List, Tuple, Optional, Dict
-from flwr.common import Metrics, Parameters, NDArrays
+from flwr.common import Metrics, Parameters, NDArrays, FitRes
+from flwr.common import parameters_to_ndarrays, ndarrays_to_parameters
 from flwr.server.client_proxy import ClientProxy
+import os
+import time
 import numpy as np
+import torch
+import torch.nn.functional as F
+from aggregation import StreamingAggregator
+from robust import RobustAggregator, ROBUST_METHODS
+from server_opt import make_server_optimizer, SERVER_OPTIMIZERS
+from model import get_model, parameter_keys, get_ndarrays, set_ndarrays
+from dataset import load_holdout, HOLDOUT_DIR
+
+PRIORITY_WEIGHTS = {"HIGH": 2.0, "MEDIUM": 1.5, "LOW": 1.0}
+AGGREGATIONS = ("fedavg",) + ROBUST_METHODS
+
+def priority_weight(metrics: Metrics, num_examples: int) -> float:
+    """Priority × network quality × num_examples birleşik ağırlığı"""
+    # Priority weight
+    priority = metrics.get("priority", "LOW")
+    weight = PRIORITY_WEIGHTS.get(priority, 1.0)
+    
+    # Network quality weight
+    network_quality = metrics.get("network_quality", 1.0)
+    
+    return weight * network_quality * num_examples
 
 def priority_weighted_average(metrics: List[Tuple[int, Metrics]]) -> Metrics:
     """
@@ -13,16 +37,8 @@ def priority_weighted_average(metrics: List[Tuple[int, Metrics]]) -> Metrics:
     weighted_acc = 0.0
     
     for num_examples, m in metrics: 
-        # Priority weight
-        priority_weights = {"HIGH": 2.0, "MEDIUM": 1.5, "LOW": 1.0}
-        priority = m.get("priority", "LOW")
-        priority_weight = priority_weights. get(priority, 1.0)
-        
-        # Network quality weight
-        network_quality = m.get("network_quality", 1.0)
-        
         # Combined weight
-        combined_weight = priority_weight * network_quality * num_examples
+        combined_weight = priority_weight(m, num_examples)
         
         weighted_acc += m["accuracy"] * combined_weight
         total_examples += combined_weight
@@ -36,11 +52,184 @@ def fit_config(server_round: int) -> Dict:
         "local_epochs": 7,
     }
 
+def deadline_fit_config(round_deadline_s: float):
+    """
+    Round başına wall-clock bütçesi gönderen config fonksiyonu.
+    Client'lar bu süre dolunca (epoch ortasında bile) eğitimi kesip
+    yapılan adım sayısını raporlar.
+    """
+    def config_fn(server_round: int) -> Dict:
+        config = fit_config(server_round)
+        config["round_deadline_s"] = round_deadline_s
+        return config
+    return config_fn
+
+def get_evaluate_fn(fedbn=False, data_dir=HOLDOUT_DIR, batch_size=256, device="cpu"):
+    """
+    Server tarafı centralized evaluation (strategy evaluate_fn'i).
+    
+    Held-out set (ModelNet10 test split) bir kez belleğe yüklenir; global model
+    her round büyük batch'lerle torch.inference_mode altında değerlendirilir.
+    Client'a gidilmediği için kopma/packet loss metriği bozmaz.
+    fedbn=True: global modelde BN parametreleri yok; BN katmanları held-out
+    batch istatistiklerini kullanır (running istatistikler değişmez).
+    """
+    points, labels = load_holdout(data_dir)
+    model = get_model().to(device)
+    keys = parameter_keys(model, fedbn=fedbn)
+    model.eval()
+    if fedbn:
+        for module in model.modules():
+            if isinstance(module, torch.nn.modules.batchnorm._BatchNorm):
+                module.train()
+                module.momentum = 0.0  # Batch istatistiği kullan, running'i güncelleme
+    
+    # Eşit boyutlu batch'ler: train-mode BN tek örnekli son batch'te hata verir
+    num_batches = max(1, -(-len(labels) // batch_size))
+    batches = list(zip(torch.tensor_split(points, num_batches), torch.tensor_split(labels, num_batches)))
+    print(f"🎯 Server held-out set: {len(labels)} örnek ({num_batches} batch)")
+    
+    def evaluate(server_round, parameters, config):
+        start = time.perf_counter()
+        set_ndarrays(model, keys, parameters)
+        
+        loss_sum, correct = 0.0, 0
+        with torch.inference_mode():
+            for x, y in batches:
+                x, y = x.to(device), y.to(device)
+                logits = model(x)
+                loss_sum += F.cross_entropy(logits, y, reduction="sum").item()
+                correct += (logits.argmax(dim=1) == y).sum().item()
+        
+        loss = loss_sum / len(labels)
+        accuracy = 100.0 * correct / len(labels)
+        print(f"   🎯 Server held-out: {accuracy:.2f}% (loss {loss:.4f}, {time.perf_counter() - start:.2f}s)")
+        return loss, {"accuracy": accuracy}
+    
+    return evaluate
+
 class PriorityFedAvg(fl.server.strategy.FedAvg):
     """
     Priority-aware FedAvg strategy
+    
+    Client'lar güncellemeyi sıkıştırılmış (metrics["encoding"]) ve/veya global
+    modele göre fark olarak (metrics["delta"]) gönderebilir. Server bu round'da
+    gönderdiği global parametreleri saklar; her güncelleme geldiği gibi
+    StreamingAggregator'a delta olarak çözülüp priority × network quality ×
+    num_examples ağırlığıyla toplanır (bellek O(model), client sayısından bağımsız)
+    ve saklanan global modele uygulanır.
+    
+    Parametre şeması isimle belirlenir: fit/evaluate config'e "param_keys"
+    eklenir, client'lar tensor'ları bu anahtar sırasıyla yükler/gönderir.
+    fedbn=True: BatchNorm ağırlık ve istatistikleri lokal kalır (FedBN),
+    sadece conv/linear ağırlıkları exchange edilir.
+    aggregation: "fedavg" (streaming ağırlıklı ortalama) ya da Byzantine-robust
+    "median" / "trimmed_mean" (trim_ratio) / "krum" (num_byzantine).
+    server_optimizer: "fedavgm" / "fedadam" / "fedyogi" (ya da ServerOptimizer):
+    aggregation sonucu delta pseudo-gradient olarak kullanılır, durum round'lar
+    arasında saklanır.
+    checkpoint_path: her aggregation sonrası global model buraya yazılır
+    (inference.load_checkpoint ile onboard motoruna yüklenir).
     """
     
+    def __init__(self, *args, fedbn=False, accumulator_dtype=np.float64, aggregation="fedavg",
+                 trim_ratio=0.1, num_byzantine=1, server_optimizer=None, server_opt_lr=None, checkpoint_path=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.global_ndarrays = None
+        self.fedbn = fedbn
+        self.checkpoint_path = checkpoint_path
+        
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Bilinmeyen aggregation: {aggregation} (seçenekler: {AGGREGATIONS})")
+        self.aggregation = aggregation
+        if aggregation == "fedavg":
+            self.aggregator = StreamingAggregator(accumulator_dtype)
+        else:
+            self.aggregator = RobustAggregator(aggregation, trim_ratio=trim_ratio, num_byzantine=num_byzantine)
+        
+        model = get_model()
+        self.param_keys = parameter_keys(model, fedbn=fedbn)
+        
+        if isinstance(server_optimizer, str) or server_optimizer is None:
+            server_optimizer = make_server_optimizer(server_optimizer, server_opt_lr)
+        self.server_optimizer = server_optimizer
+        # Server optimizer sadece trainable parametrelere; BN buffer'ları düz ortalama
+        trainable = {name for name, _ in model.named_parameters()}
+        self.trainable_mask = [k in trainable for k in self.param_keys]
+        if fedbn and self.initial_parameters is None:
+            # Client'tan tam state_dict istenmesin: başlangıç modeli server'da
+            self.initial_parameters = ndarrays_to_parameters(get_ndarrays(model, self.param_keys))
+        
+        self.on_fit_config_fn = self._with_param_keys(self.on_fit_config_fn)
+        self.on_evaluate_config_fn = self._with_param_keys(self.on_evaluate_config_fn)
+    
+    def _with_param_keys(self, config_fn):
+        """Config fonksiyonunu parametre şemasını ekleyecek şekilde sar"""
+        keys = ",".join(self.param_keys)
+        
+        def wrapped(server_round):
+            config = dict(config_fn(server_round)) if config_fn else {}
+            config["param_keys"] = keys
+            return config
+        return wrapped
+    
+    def configure_fit(self, server_round, parameters, client_manager):
+        """Gönderilen global parametreleri sakla (decode ve delta için referans)"""
+        self.global_ndarrays = parameters_to_ndarrays(parameters)
+        return super().configure_fit(server_round, parameters, client_manager)
+    
+    def work_weight(self, fit_res: FitRes) -> float:
+        """
+        Örnek sayısı × yapılan iş oranı: deadline yüzünden planlanan adımların
+        sadece bir kısmını yapan client'ın güncellemesi o oranda ağırlık alır
+        """
+        work_fraction = fit_res.metrics.get("work_fraction", 1.0)
+        return fit_res.num_examples * min(max(work_fraction, 0.0), 1.0)
+    
+    def update_weight(self, fit_res: FitRes) -> float:
+        """Aggregation ağırlığı: priority × network quality × num_examples × iş oranı"""
+        return priority_weight(fit_res.metrics, self.work_weight(fit_res))
+    
+    def accumulate(
+        self,
+        fit_res: FitRes,
+        weight: float,
+        reference: Optional[NDArrays] = None,
+        norm_weight: Optional[float] = None,
+    ):
+        """
+        Güncellemeyi aggregator buffer'larına doğrudan ekle (client başına
+        delta listesi tutulmaz). Hatalı güncelleme ValueError verir, toplam değişmez.
+        """
+        reference = reference if reference is not None else self.global_ndarrays
+        self.aggregator.add(
+            fit_res.parameters.tensors,
+            fit_res.metrics.get("encoding", "float32"),
+            fit_res.metrics.get("delta", False),
+            reference,
+            weight,
+            norm_weight=norm_weight,
+        )
+    
+    def server_step(self, averaged: NDArrays) -> NDArrays:
+        """Aggregation sonucunu (varsa) server optimizer'dan geçir"""
+        if self.server_optimizer is None:
+            return averaged
+        return self.server_optimizer.step(self.global_ndarrays, averaged, self.trainable_mask)
+    
+    def save_checkpoint(self, server_round: int):
+        """Global modeli atomik olarak checkpoint_path'e yaz (yarım dosya okunmasın)"""
+        if not self.checkpoint_path or self.global_ndarrays is None:
+            return
+        checkpoint = {
+            "server_round": server_round,
+            "param_keys": self.param_keys,
+            "fedbn": self.fedbn,
+            "state_dict": {k: torch.from_numpy(np.asarray(a)) for k, a in zip(self.param_keys, self.global_ndarrays)},
+        }
+        torch.save(checkpoint, self.checkpoint_path + ".tmp")
+        os.replace(self.checkpoint_path + ".tmp", self.checkpoint_path)
+    
     def aggregate_fit(
         self,
         server_round: int,
@@ -53,8 +242,14 @@ class PriorityFedAvg(fl.server.strategy.FedAvg):
         print(f"   ✅ Success: {len(results)} drones")
         print(f"   ❌ Failures: {len(failures)} drones")
         
+        if not self.accept_failures and failures:
+            return None, {}
+        
         # Başarılı sonuçları analiz et ve boş olanları filtrele
         valid_results = []
+        self.aggregator.reset(self.global_ndarrays)
+        upload_bytes = 0
+        raw_bytes = 0
         for client_proxy, fit_res in results:  
             metrics = fit_res.metrics
             drone_id = metrics. get("drone_id", "? ")
@@ -64,12 +259,27 @@ class PriorityFedAvg(fl.server.strategy.FedAvg):
             
             # Parametrelerin boş olup olmadığını kontrol et
             if fit_res.parameters and len(fit_res.parameters. tensors) > 0:
+                # Atlanan / sıfır ağırlıklı güncelleme aggregator'a girmez: robust
+                # yöntemlerde satır olarak sayılır (ortalama paydası 0 -> NaN)
+                weight = self.update_weight(fit_res)
+                if skipped or weight <= 0:
+                    print(f"   ⚠️  Drone {drone_id}:  SKIPPED "
+                          f"({'connection issue' if skipped else 'sıfır ağırlık'})")
+                    continue
+                try:
+                    self.accumulate(fit_res, weight)
+                except ValueError as e:
+                    print(f"   ❌ Drone {drone_id}: Decode hatası ({e}), aggregation dışı")
+                    continue
                 valid_results.append((client_proxy, fit_res))
                 
-                if skipped:
-                    print(f"   ⚠️  Drone {drone_id}:  SKIPPED (connection issue)")
-                else:
-                    print(f"   🚁 Drone {drone_id} ({priority}): {test_acc:.2f}%")
+                sent = metrics.get("upload_bytes", 0)
+                upload_bytes += sent
+                raw_bytes += metrics.get("raw_bytes", sent)
+                work = metrics.get("work_fraction", 1.0)
+                print(f"   🚁 Drone {drone_id} ({priority}): {test_acc:.2f}% "
+                      f"| {metrics.get('encoding', 'float32')} {sent/1024:.1f} KB"
+                      f"{f' | iş {work*100:.0f}%' if work < 1.0 else ''}")
             else:
                 print(f"   ❌ Drone {drone_id}: Empty parameters (skipped in aggregation)")
         
@@ -78,10 +288,36 @@ class PriorityFedAvg(fl.server.strategy.FedAvg):
             print("   ⚠️  No valid results to aggregate!")
             return None, {}
         
-        # Parent class aggregation - sadece valid results ile
-        return super().aggregate_fit(server_round, valid_results, failures)
+        if upload_bytes:
+            print(f"   📦 Upload: {upload_bytes/1024:.1f} KB (ham: {raw_bytes/1024:.1f} KB, "
+                  f"x{raw_bytes/upload_bytes:.1f})")
+        
+        # Delta aggregation - sadece valid results ile (priority × kalite × num_examples × iş oranı)
+        new_global = self.aggregator.result(self.global_ndarrays)
+        if new_global is None:
+            print("   ⚠️  Toplam ağırlık sıfır, global model değişmedi")
+            return None, {}
+        new_global = self.server_step(new_global)
+        self.global_ndarrays = new_global
+        self.save_checkpoint(server_round)
+        
+        if self.aggregation != "fedavg":
+            rejected = [valid_results[i][1].metrics.get("drone_id", "?") for i in self.aggregator.rejected]
+            print(f"   🛡️  Robust aggregation: {self.aggregation}"
+                  f"{f' | dışlanan drone: {rejected}' if rejected else ''}")
+        if self.server_optimizer is not None:
+            print(f"   🧭 Server optimizer: {self.server_optimizer.name} (lr={self.server_optimizer.lr}, "
+                  f"adım {self.server_optimizer.rounds})")
+        
+        metrics_aggregated = {}
+        if self.fit_metrics_aggregation_fn:
+            fit_metrics = [(res.num_examples, res.metrics) for _, res in valid_results]
+            metrics_aggregated = self.fit_metrics_aggregation_fn(fit_metrics)
+        
+        return ndarrays_to_parameters(new_global), metrics_aggregated
 
-def main():
+def main(fedbn=False, round_deadline_s=None, aggregation="fedavg", server_optimizer=None, server_opt_lr=None,
+         central_eval=False, checkpoint_path=None):
     """Flower Server - Priority-aware FL"""
     print("🌸 Flower Federated Learning Server (Network-Aware)")
     print("="*60)
@@ -107,17 +343,30 @@ def main():
         min_evaluate_clients=3,
         min_available_clients=5,  # 5 drone başta hazır olsun
         evaluate_metrics_aggregation_fn=priority_weighted_average,
-        on_fit_config_fn=fit_config,
+        on_fit_config_fn=deadline_fit_config(round_deadline_s) if round_deadline_s else fit_config,
+        fedbn=fedbn,  # BN katmanları lokal (--fedbn)
+        aggregation=aggregation,  # --aggregation median|trimmed_mean|krum
+        server_optimizer=server_optimizer,  # --server-opt fedavgm|fedadam|fedyogi
+        server_opt_lr=server_opt_lr,
+        evaluate_fn=get_evaluate_fn(fedbn=fedbn) if central_eval else None,  # --central-eval
+        checkpoint_path=checkpoint_path,  # --checkpoint global.pt (inference.py)
     )
+    if fedbn:
+        print(f"🧩 FedBN: {len(strategy.param_keys)} tensor exchange (BN lokal)")
     
     # Server'ı başlat
     print("\n🚀 Server başlatılıyor...")
     print("📡 Adres: 127.0.0.1:8080")
     print("⏳ 5 drone'un bağlanması bekleniyor.. .\n")
     
+    # Deadline modunda round, bütçe + pay kadar sürer; geç kalan client failure sayılır
+    round_timeout = round_deadline_s * 1.5 + 10 if round_deadline_s else None
+    if round_deadline_s:
+        print(f"⏰ Round deadline: {round_deadline_s:.0f}s (timeout {round_timeout:.0f}s)")
+    
     fl.server.start_server(
         server_address="127.0.0.1:8080",
-        config=fl.server.ServerConfig(num_rounds=6),
+        config=fl.server.ServerConfig(num_rounds=6, round_timeout=round_timeout),
         strategy=strategy,
     )
     
@@ -126,4 +375,21 @@ def main():
     print("="*60)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Priority-aware FL server")
+    parser.add_argument("--fedbn", action="store_true", help="BatchNorm katmanları lokal kalsın")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="round başına wall-clock bütçesi (saniye)")
+    parser.add_argument("--aggregation", choices=AGGREGATIONS, default="fedavg",
+                        help="Byzantine-robust birleştirme (median, trimmed_mean, krum)")
+    parser.add_argument("--server-opt", choices=list(SERVER_OPTIMIZERS), default=None,
+                        help="server tarafı optimizer (round'lar arası durumlu)")
+    parser.add_argument("--server-lr", type=float, default=None, help="server optimizer öğrenme oranı")
+    parser.add_argument("--central-eval", action="store_true",
+                        help="global modeli server'da held-out set ile değerlendir")
+    parser.add_argument("--checkpoint", default=None, help="global model checkpoint yolu (örn. global.pt)")
+    args = parser.parse_args()
+    main(fedbn=args.fedbn, round_deadline_s=args.deadline, aggregation=args.aggregation,
+         server_optimizer=args.server_opt, server_opt_lr=args.server_lr, central_eval=args.central_eval,
+         checkpoint_path=args.checkpoint)
\ No newline at end of file
@@ -0,0 +1,154 @@
+# server_opt.py
+import numpy as np
+
+class ServerOptimizer:
+    """
+    Server tarafı optimizer (Reddi et al., "Adaptive Federated Optimization").
+
+    Aggregation'ın ürettiği priority-ağırlıklı ortalama delta Δ = ortalama - global,
+    pseudo-gradient (-Δ) olarak kullanılır; momentum/moment buffer'ları
+    round'lar arasında saklanır. Sadece trainable tensor'lar optimize edilir:
+    BN running istatistikleri ve num_batches_tracked düz ortalamayı alır
+    (adaptif adım running_var'ı negatife itebilir).
+    Taban sınıf: global += lr * Δ (lr=1 düz FedAvg).
+    """
+    name = "fedavg"
+
+    def __init__(self, lr=1.0):
+        self.lr = lr
+        self.shapes = None
+        self.scratch = None
+        self.rounds = 0
+
+    def _allocate(self, reference):
+        """Tensor başına durum buffer'ları (alt sınıflar)"""
+
+    def reset(self, reference):
+        """Durumu sıfırla (model şekli değiştiğinde otomatik)"""
+        self.shapes = [ref.shape for ref in reference]
+        self.scratch = [np.empty(ref.shape, dtype=np.float32) for ref in reference]
+        self._allocate(reference)
+        self.rounds = 0
+
+    def step(self, reference, averaged, trainable=None):
+        """
+        reference: round başındaki global model, averaged: aggregation sonucu.
+        trainable: tensor başına optimize edilsin mi (varsayılan: float olanlar).
+        Yeni global modeli döndürür.
+        """
+        if self.shapes != [ref.shape for ref in reference]:
+            self.reset(reference)
+        if trainable is None:
+            trainable = [np.issubdtype(ref.dtype, np.floating) for ref in reference]
+        self.rounds += 1
+
+        new_global = []
+        for i, (ref, avg, train) in enumerate(zip(reference, averaged, trainable)):
+            if not train:
+                new_global.append(avg)
+                continue
+            delta = self.scratch[i]
+            np.subtract(avg, ref, out=delta, casting="unsafe")
+            new_global.append((ref + self._update(i, delta)).astype(ref.dtype, copy=False))
+        return new_global
+
+    def _update(self, i, delta):
+        """Δ'dan parametre adımı; delta buffer'ı yerinde kullanılabilir"""
+        delta *= self.lr
+        return delta
+
+class FedAvgM(ServerOptimizer):
+    """Server momentum: m = β·m + Δ, global += lr·m"""
+    name = "fedavgm"
+
+    def __init__(self, lr=1.0, momentum=0.9):
+        super().__init__(lr)
+        self.momentum = momentum
+
+    def _allocate(self, reference):
+        self.m = [np.zeros(ref.shape, dtype=np.float32) for ref in reference]
+
+    def _update(self, i, delta):
+        m = self.m[i]
+        m *= self.momentum
+        m += delta
+        np.multiply(m, self.lr, out=delta)
+        return delta
+
+class FedAdam(ServerOptimizer):
+    """
+    m = β1·m + (1-β1)·Δ, v = β2·v + (1-β2)·Δ², global += lr·m / (√v + τ)
+    τ adaptasyon derecesini sınırlar (küçük τ = daha adaptif).
+    """
+    name = "fedadam"
+
+    def __init__(self, lr=0.01, beta1=0.9, beta2=0.99, tau=1e-3):
+        super().__init__(lr)
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.tau = tau
+
+    def _allocate(self, reference):
+        self.m = [np.zeros(ref.shape, dtype=np.float32) for ref in reference]
+        self.v = [np.zeros(ref.shape, dtype=np.float32) for ref in reference]
+
+    def _second_moment(self, v, delta_sq):
+        v *= self.beta2
+        v += (1 - self.beta2) * delta_sq
+
+    def _update(self, i, delta):
+        m, v = self.m[i], self.v[i]
+        m *= self.beta1
+        m += (1 - self.beta1) * delta
+        np.square(delta, out=delta)
+        self._second_moment(v, delta)
+        np.sqrt(v, out=delta)
+        delta += self.tau
+        np.divide(m, delta, out=delta)
+        delta *= self.lr
+        return delta
+
+class FedYogi(FedAdam):
+    """FedAdam ile aynı, ikinci moment Yogi kuralıyla: v -= (1-β2)·Δ²·sign(v - Δ²)"""
+    name = "fedyogi"
+
+    def _second_moment(self, v, delta_sq):
+        v -= (1 - self.beta2) * delta_sq * np.sign(v - delta_sq)
+
+SERVER_OPTIMIZERS = {cls.name: cls for cls in (FedAvgM, FedAdam, FedYogi)}
+
+def make_server_optimizer(name, lr=None):
+    """İsimden server optimizer (None/"none" -> None); lr verilmezse sınıf varsayılanı"""
+    if name in (None, "none"):
+        return None
+    if name not in SERVER_OPTIMIZERS:
+        raise ValueError(f"Bilinmeyen server optimizer: {name} (seçenekler: {list(SERVER_OPTIMIZERS)})")
+    return SERVER_OPTIMIZERS[name]() if lr is None else SERVER_OPTIMIZERS[name](lr=lr)
+
+def simulate(optimizer, rounds=40, num_clients=5, loss_rate=0.3, dim=1000, seed=0):
+    """
+    Oyuncak FL: client'lar hedefe doğru gürültülü, kısa lokal adım atar;
+    her round bazı güncellemeler paket kaybıyla düşer. Round başına hedefe uzaklık.
+    """
+    rng = np.random.default_rng(seed)
+    target = rng.standard_normal(dim).astype(np.float32)
+    scales = rng.uniform(0.2, 5.0, dim).astype(np.float32)  # Kötü koşullu (ill-conditioned) eksenler
+    x = np.zeros(dim, dtype=np.float32)
+    distances = []
+    for _ in range(rounds):
+        deltas = [0.02 * scales * (target - x) + rng.normal(0, 0.01, dim).astype(np.float32)
+                  for _ in range(num_clients) if rng.random() > loss_rate]
+        if deltas:
+            averaged = x + np.mean(deltas, axis=0)
+            x = averaged if optimizer is None else optimizer.step([x], [averaged])[0]
+        distances.append(float(np.linalg.norm(x - target) / np.linalg.norm(target)))
+    return distances
+
+if __name__ == "__main__":
+    print(" Server optimizer karşılaştırması (oyuncak FL, %30 paket kaybı)")
+    for name in ("none", "fedavgm", "fedadam", "fedyogi"):
+        lr = {"fedadam": 0.05, "fedyogi": 0.05}.get(name)
+        distances = simulate(make_server_optimizer(name, lr))
+        reached = next((r + 1 for r, d in enumerate(distances) if d < 0.25), None)
+        print(f"   {name:8s}: round 10 uzaklık {distances[9]:.3f} | round 40 {distances[-1]:.3f} | "
+              f"%25 altı: {f'{reached}. round' if reached else '-'}")
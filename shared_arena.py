@@ -0,0 +1,147 @@
+# shared_arena.py
+import numpy as np
+from multiprocessing import shared_memory
+
+ALIGNMENT = 64  # Her dizi cache line sınırında başlar
+
+def arena_layout(arrays):
+    """
+    {isim: ndarray} -> ([(isim, dtype, şekil, offset)], toplam byte).
+    Layout küçük ve picklable'dır; süreçler arasında blok adıyla birlikte gönderilir.
+    """
+    layout = []
+    offset = 0
+    for name, array in arrays.items():
+        array = np.asarray(array)
+        layout.append((name, array.dtype.str, tuple(array.shape), offset))
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    return layout, max(offset, 1)
+
+class SharedArena:
+    """
+    Tek bir SharedMemory bloğunda isimli NumPy dizileri.
+
+    Aynı makinedeki süreçler (server, simüle client'lar, eğitim işçileri)
+    parametreleri pickle/protobuf kopyası olmadan paylaşır: bir taraf create()
+    ile bloğu açıp yazar, diğeri (blok adı, layout) ile attach() edip
+    views() üzerinden doğrudan okur/yazar. Bloğu oluşturan süreç unlink() eder.
+    """
+    def __init__(self, shm, layout, owner):
+        self.shm = shm
+        self.layout = layout
+        self.owner = owner
+        self._views = None
+
+    @classmethod
+    def create(cls, arrays):
+        """Yeni blok aç ve dizileri içine kopyala"""
+        layout, size = arena_layout(arrays)
+        arena = cls(shared_memory.SharedMemory(create=True, size=size), layout, owner=True)
+        arena.write(arrays)
+        return arena
+
+    @classmethod
+    def attach(cls, name, layout):
+        """Başka sürecin açtığı bloğa bağlan"""
+        return cls(shared_memory.SharedMemory(name=name), layout, owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def matches(self, arrays):
+        """Dizi isim/şekil/dtype'ları bu layout ile aynı mı (blok yeniden kullanılabilir mi)"""
+        return arena_layout(arrays)[0] == self.layout
+
+    def views(self):
+        """{isim: ndarray} - paylaşılan bellek üzerinde view (kopya yok)"""
+        if self._views is None:
+            self._views = {
+                name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=self.shm.buf, offset=offset)
+                for name, dtype, shape, offset in self.layout
+            }
+        return self._views
+
+    def write(self, arrays):
+        views = self.views()
+        for name, array in arrays.items():
+            np.copyto(views[name], array, casting="no")
+
+    def close(self):
+        self._views = None  # View'lar buffer'ı tutarken close edilemez
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # Dışarıda hâlâ view var; eşleme süreç bitince kalkar
+        if self.owner:
+            self.shm.unlink()
+
+class ParameterArena:
+    """
+    Aynı makinedeki server -> client parametre aktarımı (zero-copy).
+
+    Global model tek bir SharedMemory bloğunda, versiyonlu slot'larda durur
+    (ring: yeni versiyon yazılırken önceki slot okunmaya devam edebilir).
+    fit/evaluate mesajları parametre taşımaz; config'te sadece blok adı,
+    slot'taki tensor offset'leri ve versiyon bulunur. Client tensor şekil/dtype
+    bilgisini kendi state_dict'inden (param_keys ile) alır.
+    """
+    def __init__(self, arrays, slots=2):
+        self.slots = slots
+        self.num_arrays = len(arrays)
+        named = {}
+        for slot in range(slots):
+            named[f"{slot}/version"] = np.full(1, -1, dtype=np.int64)
+            for i, array in enumerate(arrays):
+                named[f"{slot}/{i}"] = array
+        self.arena = SharedArena.create(named)
+        self.offsets = {name: offset for name, _, _, offset in self.arena.layout}
+        self.version = -1
+
+    def matches(self, arrays):
+        views = self.arena.views()
+        return len(arrays) == self.num_arrays and all(
+            views[f"0/{i}"].shape == a.shape and views[f"0/{i}"].dtype == a.dtype
+            for i, a in enumerate(arrays)
+        )
+
+    def publish(self, arrays):
+        """Yeni versiyonu sıradaki slot'a yaz; client'lara gidecek config'i döndür"""
+        self.version += 1
+        slot = self.version % self.slots
+        views = self.arena.views()
+        views[f"{slot}/version"][0] = -1  # Yazım sırasında geçersiz
+        for i, array in enumerate(arrays):
+            np.copyto(views[f"{slot}/{i}"], array)
+        views[f"{slot}/version"][0] = self.version
+
+        return {
+            "shm_name": self.arena.name,
+            "shm_version": self.version,
+            "shm_version_offset": self.offsets[f"{slot}/version"],
+            "shm_offsets": ",".join(str(self.offsets[f"{slot}/{i}"]) for i in range(self.num_arrays)),
+        }
+
+    def close(self):
+        self.arena.close()
+
+def shared_parameter_views(config, templates, handles):
+    """
+    Client tarafı: config'teki offset'lerden paylaşılan global parametrelere view'lar.
+    templates: [(şekil, dtype)] (param_keys sırasıyla), handles: {blok adı: SharedMemory} cache'i.
+    Slot başka bir versiyonla ezildiyse ValueError.
+    """
+    name = config["shm_name"]
+    shm = handles.get(name)
+    if shm is None:
+        shm = handles[name] = shared_memory.SharedMemory(name=name)
+
+    version = np.ndarray((1,), dtype=np.int64, buffer=shm.buf, offset=int(config["shm_version_offset"]))
+    if int(version[0]) != int(config["shm_version"]):
+        raise ValueError(f"Paylaşılan parametreler eski: v{int(version[0])} != v{config['shm_version']}")
+
+    offsets = [int(o) for o in config["shm_offsets"].split(",")]
+    if len(offsets) != len(templates):
+        raise ValueError(f"Offset/tensor sayısı uyumsuz ({len(offsets)} != {len(templates)})")
+    return [np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+            for (shape, dtype), offset in zip(templates, offsets)]
@@ -0,0 +1,356 @@
+# simulation.py
+import os
+import time
+import concurrent.futures
+import torch
+import flwr as fl
+from pathlib import Path
+from flwr.common import (Code, FitRes, GetParametersIns, Parameters, Status,
+                         ndarrays_to_parameters, parameters_to_ndarrays)
+from flwr.server.client_proxy import ClientProxy
+from flwr.server.history import History
+from client import DroneClient, get_drone_profile
+from network import load_drone_trace
+from vectorized import VectorizedTrainer
+from pool_trainer import ProcessPoolTrainer
+from shared_arena import ParameterArena
+from server import PriorityFedAvg, priority_weighted_average, fit_config, deadline_fit_config, get_evaluate_fn, AGGREGATIONS
+from server_opt import SERVER_OPTIMIZERS
+
+class InProcessClientProxy(ClientProxy):
+    """
+    Aynı süreçteki bir DroneClient için ClientProxy (gRPC yok).
+    Client ilk kullanımda oluşturulur ve round'lar arasında durumunu korur
+    (error feedback residual'ları, FedBN lokal BN katmanları vb.).
+    """
+    def __init__(self, cid, client_fn):
+        super().__init__(cid)
+        self.client_fn = client_fn
+        self._numpy_client = None
+        self._client = None
+
+    @property
+    def numpy_client(self):
+        """Alttaki DroneClient (trainer yolu begin_fit/finish_fit'i doğrudan çağırır)"""
+        if self._numpy_client is None:
+            self._numpy_client = self.client_fn(self.cid)
+        return self._numpy_client
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self.numpy_client.to_client()
+        return self._client
+
+    def get_properties(self, ins, timeout, group_id):
+        return self.client.get_properties(ins)
+
+    def get_parameters(self, ins, timeout, group_id):
+        return self.client.get_parameters(ins)
+
+    def fit(self, ins, timeout, group_id):
+        return self.client.fit(ins)
+
+    def evaluate(self, ins, timeout, group_id):
+        return self.client.evaluate(ins)
+
+    def reconnect(self, ins, timeout, group_id):
+        return fl.common.DisconnectRes(reason="")
+
+class SimulationEngine:
+    """
+    Tek süreçte PriorityFedAvg + N DroneClient.
+
+    server.py + 5 x client.py (gRPC) kurulumunun yerine geçer: client'lar
+    InProcessClientProxy ile aynı süreçte, bir thread havuzunda çalışır;
+    ağ koşulları her client'ın NetworkSimulator'ı ile simüle edilir.
+    Client'lar sanal saat kullanıyorsa round'un simüle süresi (en yavaş
+    drone'un ağ + hesaplama süresi) gerçek süreden ayrı raporlanır.
+    Round döngüsü Flower Server.fit ile aynı sırayı izler
+    (configure_fit -> fit -> aggregate_fit -> evaluate).
+
+    trainer: verilirse round'un tüm lokal eğitimleri client thread'leri yerine
+    ona devredilir (ağ simülasyonu client'larda kalır):
+        VectorizedTrainer:  tek batched forward/backward
+        ProcessPoolTrainer: süreç havuzu, ağırlıklar paylaşılan bellekte
+
+    shared_memory=True: global model client'lara protobuf yerine ParameterArena
+    ile gider; fit/evaluate mesajları sadece offset + versiyon taşır.
+    """
+    def __init__(self, strategy, client_fn, num_clients, workers=None, trainer=None,
+                 shared_memory=False):
+        self.strategy = strategy
+        self.trainer = trainer
+        self.shared_memory = shared_memory
+        self.arena = None
+        self._published = None  # (yayınlanan Parameters, shm config)
+        self.workers = workers or min(num_clients, os.cpu_count() or 1)
+        self.client_manager = fl.server.SimpleClientManager()
+        for cid in range(1, num_clients + 1):
+            self.client_manager.register(InProcessClientProxy(str(cid), client_fn))
+
+        # Thread başına intra-op thread sayısını sınırla (çekirdekleri aşırı paylaştırma)
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // self.workers))
+
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+        self.parameters = None
+        self.sim_time = 0.0  # Toplam simüle süre (saniye)
+
+    def _run_all(self, instructions, method):
+        """Talimatları havuzda çalıştır; (results, failures) döndür"""
+        futures = {
+            self.executor.submit(getattr(proxy, method), ins, None, None): proxy
+            for proxy, ins in instructions
+        }
+        results, failures = [], []
+        for future in concurrent.futures.as_completed(futures):
+            proxy = futures[future]
+            try:
+                res = future.result()
+            except Exception as e:
+                failures.append(e)
+                continue
+            if res.status.code == Code.OK:
+                results.append((proxy, res))
+            else:
+                failures.append((proxy, res))
+        return results, failures
+
+    def _share(self, instructions):
+        """Talimatlardaki parametreleri paylaşılan belleğe yayınla, mesajları boşalt"""
+        if not instructions:
+            return instructions
+        if self._published is None or self._published[0] is not self.parameters:
+            # Round başına bir kez deserialize + kopya (client başına değil)
+            arrays = parameters_to_ndarrays(self.parameters)
+            if self.arena is None or not self.arena.matches(arrays):
+                if self.arena is not None:
+                    self.arena.close()
+                self.arena = ParameterArena(arrays)
+            self._published = (self.parameters, self.arena.publish(arrays))
+
+        shm_config = self._published[1]
+        empty = Parameters(tensors=[], tensor_type="numpy.ndarray")
+        return [(proxy, type(ins)(parameters=empty, config={**ins.config, **shm_config}))
+                for proxy, ins in instructions]
+
+    def _fit_with_trainer(self, instructions):
+        """fit: begin_fit (havuzda) -> tek trainer.train çağrısı -> finish_fit (havuzda)"""
+        def begin(proxy, ins):
+            return proxy.numpy_client.begin_fit(parameters_to_ndarrays(ins.parameters), ins.config)
+
+        started, failures = [], []
+        for (proxy, ins), future in [(item, self.executor.submit(begin, *item)) for item in instructions]:
+            try:
+                started.append((proxy, ins, future.result()))
+            except Exception as e:
+                failures.append(e)
+
+        jobs = [job for _, _, job in started if "result" not in job]
+        outcomes = iter(self.trainer.train(jobs) if jobs else [])
+
+        def finish(proxy, ins, job, outcome):
+            if outcome is None:
+                ndarrays, num_examples, metrics = job["result"]
+            else:
+                history, _, compute_time = outcome
+                ndarrays, num_examples, metrics = proxy.numpy_client.finish_fit(
+                    ins.config, job, history, compute_time)
+            return FitRes(status=Status(code=Code.OK, message="Success"),
+                          parameters=ndarrays_to_parameters(ndarrays),
+                          num_examples=num_examples, metrics=metrics)
+
+        futures = {}
+        for proxy, ins, job in started:
+            outcome = None if "result" in job else next(outcomes)
+            futures[self.executor.submit(finish, proxy, ins, job, outcome)] = proxy
+
+        results = []
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                results.append((futures[future], future.result()))
+            except Exception as e:
+                failures.append(e)
+        return results, failures
+
+    @staticmethod
+    def simulated_round_time(results):
+        """Senkron round: en yavaş drone'un (ağ + hesaplama) süresi"""
+        return max((res.metrics.get("sim_time_s", 0.0) for _, res in results), default=0.0)
+
+    def _initial_parameters(self):
+        parameters = self.strategy.initialize_parameters(client_manager=self.client_manager)
+        if parameters is not None:
+            return parameters
+        # Strategy vermediyse bir client'tan al (packet loss'a karşı tekrar dene)
+        proxy = self.client_manager.sample(1)[0]
+        while True:
+            res = proxy.get_parameters(GetParametersIns(config={}), None, None)
+            if res.parameters.tensors:
+                return res.parameters
+
+    def run(self, num_rounds):
+        history = History()
+        self.parameters = self._initial_parameters()
+        start_time = time.perf_counter()
+
+        for server_round in range(1, num_rounds + 1):
+            round_start = time.perf_counter()
+            print(f"\n{'='*60}\n🔁 Round {server_round}/{num_rounds}")
+
+            # Fit
+            instructions = self.strategy.configure_fit(server_round, self.parameters, self.client_manager)
+            if self.shared_memory:
+                instructions = self._share(instructions)
+            if self.trainer is not None:
+                results, failures = self._fit_with_trainer(instructions)
+            else:
+                results, failures = self._run_all(instructions, "fit")
+            round_sim_time = self.simulated_round_time(results)
+            round_net_time = max((res.metrics.get("net_time_s", 0.0) for _, res in results), default=0.0)
+            self.sim_time += round_sim_time
+            parameters, fit_metrics = self.strategy.aggregate_fit(server_round, results, failures)
+            if parameters is not None:
+                self.parameters = parameters
+            history.add_metrics_distributed_fit(server_round=server_round, metrics=fit_metrics)
+
+            # Centralized evaluation (strategy evaluate_fn verdiyse)
+            res_cen = self.strategy.evaluate(server_round, parameters=self.parameters)
+            if res_cen is not None:
+                history.add_loss_centralized(server_round=server_round, loss=res_cen[0])
+                history.add_metrics_centralized(server_round=server_round, metrics=res_cen[1])
+
+            # Federated evaluation
+            instructions = self.strategy.configure_evaluate(server_round, self.parameters, self.client_manager)
+            if self.shared_memory:
+                instructions = self._share(instructions)
+            if instructions:
+                results, failures = self._run_all(instructions, "evaluate")
+                loss, metrics = self.strategy.aggregate_evaluate(server_round, results, failures)
+                if loss is not None:
+                    history.add_loss_distributed(server_round=server_round, loss=loss)
+                    history.add_metrics_distributed(server_round=server_round, metrics=metrics)
+                    print(f"📊 Round {server_round}: loss {loss:.4f} | {metrics}")
+
+            print(f"⏱️  Round {server_round}: simüle {round_sim_time:.1f}s "
+                  f"(en uzun ağ beklemesi {round_net_time:.1f}s) | gerçek {time.perf_counter() - round_start:.1f}s")
+
+        elapsed = time.perf_counter() - start_time
+        self.executor.shutdown(wait=True)
+        if hasattr(self.trainer, "close"):
+            self.trainer.close()
+        if self.arena is not None:
+            self.arena.close()
+        return history, elapsed
+
+def available_data_ids(data_root="data"):
+    """Veri dizini olan drone id'leri (data/droneN)"""
+    ids = []
+    for path in Path(data_root).glob("drone*"):
+        suffix = path.name[len("drone"):]
+        if suffix.isdigit() and path.is_dir():
+            ids.append(int(suffix))
+    return sorted(ids)
+
+def make_client_fn(epochs_per_round=7, trace_pattern=None, **client_kwargs):
+    """
+    cid -> DroneClient. Veri dizini olmayan drone'lar mevcut dizinleri
+    döngüsel paylaşır (drone 7 -> data/drone2 gibi); profil de döngüseldir.
+    trace_pattern: 'traces/drone{drone_id}.csv' gibi link izi kalıbı
+    (izi olmayan drone profil değerlerini kullanır).
+    """
+    data_ids = available_data_ids()
+    if not data_ids:
+        raise FileNotFoundError("data/droneN bulunamadı, önce prepare_dataset.py çalıştırın")
+
+    def client_fn(cid):
+        drone_id = int(cid)
+        data_id = drone_id if drone_id in data_ids else data_ids[(drone_id - 1) % len(data_ids)]
+        return DroneClient(drone_id=drone_id, epochs_per_round=epochs_per_round,
+                           data_id=data_id, trace=load_drone_trace(trace_pattern, drone_id),
+                           **client_kwargs)
+    return client_fn
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Tek süreçte çok-drone FL simülasyonu")
+    parser.add_argument("--drones", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=6)
+    parser.add_argument("--epochs", type=int, default=7, help="round başına temel epoch")
+    parser.add_argument("--workers", type=int, default=None, help="eşzamanlı client sayısı")
+    parser.add_argument("--fraction", type=float, default=0.8, help="round başına katılım oranı")
+    parser.add_argument("--fedbn", action="store_true")
+    parser.add_argument("--real-time", action="store_true",
+                        help="ağ beklemelerinde gerçekten uyu (varsayılan: sanal saat)")
+    parser.add_argument("--vectorized", action="store_true",
+                        help="lokal eğitimleri tek batched forward ile yürüt (vectorized.py)")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="lokal eğitimleri N süreçlik havuzda yürüt (pool_trainer.py)")
+    parser.add_argument("--shared-memory", action="store_true",
+                        help="global modeli client'lara paylaşılan bellekle gönder (protobuf yok)")
+    parser.add_argument("--aggregation", choices=AGGREGATIONS, default="fedavg",
+                        help="Byzantine-robust birleştirme (median, trimmed_mean, krum)")
+    parser.add_argument("--server-opt", choices=list(SERVER_OPTIMIZERS), default=None,
+                        help="server tarafı optimizer (round'lar arası durumlu)")
+    parser.add_argument("--server-lr", type=float, default=None, help="server optimizer öğrenme oranı")
+    parser.add_argument("--central-eval", action="store_true",
+                        help="global modeli server'da held-out set ile değerlendir")
+    parser.add_argument("--checkpoint", default=None, help="global model checkpoint yolu (örn. global.pt)")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="round başına süre bütçesi (saniye; sanal saatte simüle süre)")
+    parser.add_argument("--trace", default=None,
+                        help="link izi kalıbı, örn. traces/drone{drone_id}.csv (CSV/Parquet)")
+    args = parser.parse_args()
+
+    print("🌸 In-process Federated Learning Simülasyonu")
+    print("="*60)
+    print(f"🎯 {args.drones} drone, {args.rounds} round, {args.workers or 'auto'} worker")
+    for drone_id in range(1, min(args.drones, 5) + 1):
+        profile = get_drone_profile(drone_id)
+        print(f"   Drone {drone_id}: {profile['name']} ({profile['priority']}, "
+              f"{profile['packet_loss']*100:.0f}% loss, {profile['bandwidth_mbps']} Mbit/s)")
+
+    min_fit = max(1, int(args.drones * args.fraction * 0.75))
+    strategy = PriorityFedAvg(
+        fraction_fit=args.fraction,
+        fraction_evaluate=args.fraction,
+        min_fit_clients=min_fit,
+        min_evaluate_clients=min_fit,
+        min_available_clients=args.drones,
+        evaluate_metrics_aggregation_fn=priority_weighted_average,
+        on_fit_config_fn=deadline_fit_config(args.deadline) if args.deadline else fit_config,
+        fedbn=args.fedbn,
+        aggregation=args.aggregation,
+        server_optimizer=args.server_opt,
+        server_opt_lr=args.server_lr,
+        evaluate_fn=get_evaluate_fn(fedbn=args.fedbn) if args.central_eval else None,
+        checkpoint_path=args.checkpoint,
+    )
+
+    trainer = None
+    if args.processes:
+        trainer = ProcessPoolTrainer(workers=args.processes)
+    elif args.vectorized:
+        trainer = VectorizedTrainer()
+
+    engine = SimulationEngine(
+        strategy,
+        make_client_fn(epochs_per_round=args.epochs, trace_pattern=args.trace,
+                       virtual_clock=not args.real_time),
+        num_clients=args.drones,
+        workers=args.workers,
+        trainer=trainer,
+        shared_memory=args.shared_memory,
+    )
+    history, elapsed = engine.run(args.rounds)
+
+    print("\n" + "="*60)
+    print(f"🎉 Simülasyon tamamlandı: simüle {engine.sim_time:.1f}s | gerçek {elapsed:.1f}s")
+    centralized = dict(history.metrics_centralized.get("accuracy", []))
+    for server_round, acc in history.metrics_distributed.get("accuracy", []):
+        held_out = f" | held-out {centralized[server_round]:.2f}%" if server_round in centralized else ""
+        print(f"   Round {server_round}: {acc:.2f}%{held_out}")
+
+if __name__ == "__main__":
+    main()
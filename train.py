@@ -1,4 +1,5 @@
 # train.py
+import time
 import torch
 import torch.nn as nn
 import torch.optim as optim
@@ -8,14 +9,27 @@ def train_epoch(model, train_loader, criterion, optimizer, device):
     """
     Bir epoch eğitim
     """
+    epoch_loss, epoch_acc, _, _ = train_steps(model, train_loader, criterion, optimizer, device)
+    return epoch_loss, epoch_acc
+
+def train_steps(model, train_loader, criterion, optimizer, device, deadline=None):
+    """
+    Bir epoch eğitim; deadline (time.monotonic) geçerse epoch ortasında durur.
+    Dönüş: (loss, acc, yapılan adım sayısı, epoch tamamlandı mı)
+    """
     model.train()
     running_loss = 0.0
     correct = 0
     total = 0
+    steps = 0
     
     pbar = tqdm(train_loader, desc="Training", leave=False)
     
     for points, labels in pbar:
+        if deadline is not None and time.monotonic() >= deadline:
+            pbar.close()
+            break
+        
         points, labels = points.to(device), labels.to(device)
         
         # Forward
@@ -26,6 +40,7 @@ def train_epoch(model, train_loader, criterion, optimizer, device):
         # Backward
         loss. backward()
         optimizer.step()
+        steps += 1
         
         # Metrics
         running_loss += loss.item()
@@ -39,25 +54,32 @@ def train_epoch(model, train_loader, criterion, optimizer, device):
             'acc': f'{100.*correct/total:.2f}%'
         })
     
-    epoch_loss = running_loss / len(train_loader)
-    epoch_acc = 100. * correct / total
+    epoch_loss = running_loss / max(steps, 1)
+    epoch_acc = 100. * correct / total if total else 0.0
     
-    return epoch_loss, epoch_acc
+    return epoch_loss, epoch_acc, steps, steps == len(train_loader)
 
-def test(model, test_loader, criterion, device):
+def test(model, test_loader, criterion, device, feature_cache=None):
     """
     Test/validation
+    
+    feature_cache (feature_cache.FeatureCache): backbone değişmediyse örneklerin
+    global feature'ları cache'ten (örnek kimliğiyle) okunur ve sadece head çalışır
     """
     model.eval()
     running_loss = 0.0
     correct = 0
     total = 0
     
+    forward, batches = model, test_loader
+    if feature_cache is not None:
+        forward, batches = model.head, feature_cache.batches(model, test_loader, device=device)
+    
     with torch.no_grad():
-        for points, labels in test_loader: 
+        for points, labels in batches: 
             points, labels = points. to(device), labels.to(device)
             
-            outputs = model(points)
+            outputs = forward(points)
             loss = criterion(outputs, labels)
             
             running_loss += loss. item()
@@ -70,9 +92,59 @@ def test(model, test_loader, criterion, device):
     
     return test_loss, test_acc
 
-def train_model(model, train_loader, test_loader, epochs=10, lr=0.001, device='cpu'):
+def train_head(model, train_loader, test_loader, epochs=5, lr=0.001, device='cpu', feature_cache=None):
+    """
+    Head-only fine-tuning (kişiselleştirme): backbone donmuş, sadece MLP head eğitilir.
+    Train/test global feature'ları örnek başına bir kez çıkarılır (feature_cache);
+    epoch'lar loader'ın (karıştırılmış) batch'lerini cache'ten toplar, conv yığınını
+    hiç çalıştırmaz. train_model ile aynı history/best_acc dönüşü.
+    """
+    from feature_cache import FeatureCache
+    
+    cache = feature_cache if feature_cache is not None else FeatureCache()
+    head_params = [p for name, p in model.named_parameters() if not name.startswith("backbone.")]
+    
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(head_params, lr=lr, weight_decay=1e-4)
+    history = {'train_loss': [], 'train_acc': [], 'test_loss': [], 'test_acc': []}
+    best_acc = 0.0
+    
+    for epoch in range(epochs):
+        model.train()
+        model.backbone.eval()  # Donmuş: BN istatistikleri de değişmez (hash sabit kalır)
+        running_loss, correct, total, steps = 0.0, 0, 0, 0
+        for features, labels in cache.batches(model, train_loader, device=device):
+            if len(labels) < 2:
+                continue  # BatchNorm1d tek örnekle eğitilemez
+            optimizer.zero_grad()
+            outputs = model.head(features)
+            loss = criterion(outputs, labels)
+            loss.backward()
+            optimizer.step()
+            steps += 1
+            running_loss += loss.item()
+            total += len(labels)
+            correct += outputs.argmax(1).eq(labels).sum().item()
+        
+        test_loss, test_acc = test(model, test_loader, criterion, device, feature_cache=cache)
+        history['train_loss'].append(running_loss / max(steps, 1))
+        history['train_acc'].append(100. * correct / max(total, 1))
+        history['test_loss'].append(test_loss)
+        history['test_acc'].append(test_acc)
+        best_acc = max(best_acc, test_acc)
+        print(f"Head epoch {epoch+1}/{epochs} | "
+              f"Train Loss: {history['train_loss'][-1]:.4f} Acc: {history['train_acc'][-1]:.2f}% | "
+              f"Test Loss: {test_loss:.4f} Acc: {test_acc:.2f}%")
+    
+    return history, best_acc
+
+def train_model(model, train_loader, test_loader, epochs=10, lr=0.001, device='cpu', deadline=None):
     """
     Model eğitimi
+    
+    deadline (time.monotonic): verilirse eğitim bu zamanda (epoch ortasında
+    bile) durur; history['steps'] yapılan, history['planned_steps'] planlanan
+    optimizer adımı sayısıdır.
     """
     criterion = nn.CrossEntropyLoss()
     optimizer = optim.Adam(model.parameters(), lr=lr, weight_decay=1e-4)
@@ -83,12 +155,29 @@ def train_model(model, train_loader, test_loader, epochs=10, lr=0.001, device='c
         'train_loss': [],
         'train_acc': [],
         'test_loss': [],
-        'test_acc': []
+        'test_acc': [],
+        'steps': 0,
+        'planned_steps': epochs * len(train_loader),
+        'deadline_hit': False
     }
     
+    needs_final_test = False
     for epoch in range(epochs):
         # Train
-        train_loss, train_acc = train_epoch(model, train_loader, criterion, optimizer, device)
+        train_loss, train_acc, steps, completed = train_steps(
+            model, train_loader, criterion, optimizer, device, deadline=deadline
+        )
+        history['steps'] += steps
+        
+        if not completed:
+            # Deadline: kısmi epoch'u kaydet ve dur
+            history['deadline_hit'] = True
+            if steps > 0:
+                history['train_loss'].append(train_loss)
+                history['train_acc'].append(train_acc)
+                needs_final_test = True
+            print(f"Epoch {epoch+1}/{epochs} | Deadline: {history['steps']}/{history['planned_steps']} adım")
+            break
         
         # Test
         test_loss, test_acc = test(model, test_loader, criterion, device)
@@ -111,6 +200,16 @@ def train_model(model, train_loader, test_loader, epochs=10, lr=0.001, device='c
         if test_acc > best_acc:
             best_acc = test_acc
     
+    # Deadline yüzünden son durum test edilmediyse bir kez test et
+    if needs_final_test or not history['test_acc']:
+        test_loss, test_acc = test(model, test_loader, criterion, device)
+        history['test_loss'].append(test_loss)
+        history['test_acc'].append(test_acc)
+        best_acc = max(best_acc, test_acc)
+        if not history['train_acc']:
+            history['train_loss'].append(0.0)
+            history['train_acc'].append(0.0)
+    
     return history, best_acc
 
 if __name__ == "__main__":
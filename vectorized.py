@@ -0,0 +1,358 @@
+# vectorized.py
+import time
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from train import test
+
+BN_MOMENTUM = 0.1
+BN_EPS = 1e-5
+DROPOUT = 0.3
+
+# PointNetClassifier katmanları (state_dict isimleriyle)
+CONV_LAYERS = (("backbone.conv1", "backbone.bn1"),
+               ("backbone.conv2", "backbone.bn2"),
+               ("backbone.conv3", "backbone.bn3"))
+HEAD_LAYERS = (("fc1", "bn1"), ("fc2", "bn2"))
+OUTPUT_LAYER = "fc3"
+
+class StackedPointNet:
+    """
+    M adet PointNetClassifier'ın state_dict'i tek tensörlerde ([M, ...]).
+
+    1x1 conv ve linear katmanlar baddbmm ile M model için tek çağrıda çalışır;
+    BatchNorm istatistikleri model başınadır; drone'ların batch boyları farklıysa
+    (son batch) padding maskesi ile hesaplanır. Sadece aktif modeller (idx)
+    hesaplanır; epoch'u biten modeller hesaba girmez.
+    """
+    def __init__(self, models, device):
+        state_dicts = [model.state_dict() for model in models]
+        param_names = {name for name, _ in models[0].named_parameters()}
+        self.keys = list(state_dicts[0].keys())
+        self.num_models = len(models)
+
+        self.tensors = {}
+        for k in self.keys:
+            stacked = torch.stack([sd[k].detach() for sd in state_dicts]).to(device)
+            self.tensors[k] = stacked.requires_grad_() if k in param_names else stacked
+        self.params = [self.tensors[k] for k in self.keys if k in param_names]
+
+    def forward(self, points, mask, idx, training=True):
+        """
+        points: [A, B, N, 3], mask: [A, B] (1 = gerçek örnek), idx: [A] aktif model indeksleri
+        Dönüş: logits [A, B, num_classes]
+
+        Aktivasyonlar Conv1d gibi kanal-önce ([A, C, L]) tutulur; böylece [A, C, L]
+        tensörü (1, A*C, L) olarak görülüp tek F.batch_norm çağrısıyla normalize edilir.
+        """
+        A, B, N, _ = points.shape
+        p = lambda k: self.tensors[k].index_select(0, idx)
+        padded = not bool(mask.all())
+
+        # Shared MLP: 1x1 conv = nokta başına linear
+        x = points.permute(0, 3, 1, 2).reshape(A, 3, B * N)
+        point_mask = mask[:, :, None].expand(A, B, N).reshape(A, B * N) if padded else None
+        for conv, bn in CONV_LAYERS:
+            x = torch.baddbmm(p(conv + ".bias")[:, :, None], p(conv + ".weight")[..., 0], x)
+            x = F.relu(self._batch_norm(x, point_mask, bn, idx, training))
+
+        # Global max pooling
+        x = x.reshape(A, -1, B, N).max(dim=3)[0]  # [A, 1024, B]
+
+        # Classification head
+        sample_mask = mask if padded else None
+        for fc, bn in HEAD_LAYERS:
+            x = torch.baddbmm(p(fc + ".bias")[:, :, None], p(fc + ".weight"), x)
+            x = F.relu(self._batch_norm(x, sample_mask, bn, idx, training))
+            x = F.dropout(x, p=DROPOUT, training=training)
+        x = torch.baddbmm(p(OUTPUT_LAYER + ".bias")[:, :, None], p(OUTPUT_LAYER + ".weight"), x)
+        return x.transpose(1, 2)
+
+    def _batch_norm(self, x, mask, name, idx, training):
+        """x: [A, C, L], mask: [A, L] ya da None (padding yok) - model başına BatchNorm1d"""
+        A, C, L = x.shape
+        full = idx.numel() == self.num_models
+        running_mean = self.tensors[name + ".running_mean"]
+        running_var = self.tensors[name + ".running_var"]
+        weight = self.tensors[name + ".weight"].index_select(0, idx)
+        bias = self.tensors[name + ".bias"].index_select(0, idx)
+
+        if mask is None or not training:
+            # Hızlı yol: A model x C kanal = A*C kanallı tek BatchNorm (running stats yerinde güncellenir)
+            mean = running_mean if full else running_mean.index_select(0, idx)
+            var = running_var if full else running_var.index_select(0, idx)
+            out = F.batch_norm(x.reshape(1, A * C, L), mean.view(-1), var.view(-1),
+                               weight.reshape(-1), bias.reshape(-1), training, BN_MOMENTUM, BN_EPS)
+            if training and not full:
+                running_mean.index_copy_(0, idx, mean)
+                running_var.index_copy_(0, idx, var)
+        else:
+            # Padding'li batch: istatistikler sadece gerçek örneklerden
+            m = mask[:, None, :]
+            count = m.sum(2, keepdim=True)
+            batch_mean = (x * m).sum(2, keepdim=True) / count
+            batch_var = ((x - batch_mean) ** 2 * m).sum(2, keepdim=True) / count
+            out = (x - batch_mean) / torch.sqrt(batch_var + BN_EPS) * weight[:, :, None] + bias[:, :, None]
+
+            with torch.no_grad():
+                unbiased = batch_var * count / (count - 1).clamp(min=1)
+                running_mean.index_copy_(0, idx, (1 - BN_MOMENTUM) * running_mean.index_select(0, idx)
+                                         + BN_MOMENTUM * batch_mean[..., 0])
+                running_var.index_copy_(0, idx, (1 - BN_MOMENTUM) * running_var.index_select(0, idx)
+                                        + BN_MOMENTUM * unbiased[..., 0])
+
+        if training:
+            self.tensors[name + ".num_batches_tracked"].index_add_(
+                0, idx, torch.ones_like(idx, dtype=torch.long))
+        return out.reshape(A, C, L)
+
+    def load_into(self, i, model):
+        """i. modelin güncel ağırlıklarını bir PointNetClassifier'a yaz"""
+        with torch.no_grad():
+            model.load_state_dict({k: self.tensors[k][i].detach().clone() for k in self.keys})
+
+class StackedAdam:
+    """
+    Yığılmış parametreler üzerinde tek Adam (torch.optim.Adam ile aynı formül,
+    weight_decay L2). Adım sayısı ve lr model başına; sadece aktif modeller güncellenir.
+    """
+    def __init__(self, params, num_models, betas=(0.9, 0.999), eps=1e-8, weight_decay=1e-4):
+        self.params = params
+        self.betas = betas
+        self.eps = eps
+        self.weight_decay = weight_decay
+        self.exp_avg = [torch.zeros_like(p) for p in params]
+        self.exp_avg_sq = [torch.zeros_like(p) for p in params]
+        self.steps = torch.zeros(num_models, device=params[0].device)
+
+    def zero_grad(self):
+        for p in self.params:
+            p.grad = None
+
+    @torch.no_grad()
+    def step(self, idx, lrs):
+        """idx: aktif modeller, lrs: [A] model başına learning rate"""
+        beta1, beta2 = self.betas
+        self.steps.index_add_(0, idx, torch.ones_like(idx, dtype=self.steps.dtype))
+        t = self.steps.index_select(0, idx)
+        bias_correction1 = 1 - beta1 ** t
+        bias_correction2_sqrt = torch.sqrt(1 - beta2 ** t)
+
+        for p, exp_avg, exp_avg_sq in zip(self.params, self.exp_avg, self.exp_avg_sq):
+            if p.grad is None:
+                continue
+            shape = (-1,) + (1,) * (p.dim() - 1)
+            grad = p.grad.index_select(0, idx) + self.weight_decay * p.index_select(0, idx)
+
+            m = exp_avg.index_select(0, idx).mul_(beta1).add_(grad, alpha=1 - beta1)
+            v = exp_avg_sq.index_select(0, idx).mul_(beta2).addcmul_(grad, grad, value=1 - beta2)
+            exp_avg.index_copy_(0, idx, m)
+            exp_avg_sq.index_copy_(0, idx, v)
+
+            denom = v.sqrt() / bias_correction2_sqrt.view(shape) + self.eps
+            update = (lrs / bias_correction1).view(shape) * m / denom
+            p.index_add_(0, idx, -update)
+
+class VectorizedTrainer:
+    """
+    Birden fazla drone'un lokal eğitimini tek süreçte, tek batched forward ile yürütür.
+
+    Her iş (job) train_model ile aynı anlamı taşır: kendi loader'ı, epoch sayısı,
+    lr'si ve deadline'ı vardır. Her global adımda aktif modellerin birer batch'i
+    padding ile [A, B, N, 3] olarak yığılır. Epoch'u biten modelin ağırlıkları
+    kendi PointNetClassifier'ına yazılıp train.test ile test edilir. Dönüşteki
+    history train_model ile aynı formattadır.
+    """
+    def __init__(self, device=None):
+        self.device = torch.device(device) if device is not None else None
+
+    def train(self, jobs):
+        """jobs: [{model, train_loader, test_loader, epochs, lr, deadline, label}] -> [(history, best_acc, compute_time)]"""
+        models = [job["model"] for job in jobs]
+        if self.device is None:
+            self.device = next(models[0].parameters()).device  # Client modelleriyle aynı cihaz
+        stacked = StackedPointNet(models, self.device)
+        optimizer = StackedAdam(stacked.params, len(jobs))
+        criterion = nn.CrossEntropyLoss()
+
+        states = []
+        for job in jobs:
+            states.append({
+                "history": {
+                    'train_loss': [], 'train_acc': [], 'test_loss': [], 'test_acc': [],
+                    'steps': 0,
+                    'planned_steps': job["epochs"] * len(job["train_loader"]),
+                    'deadline_hit': False
+                },
+                "best_acc": 0.0,
+                "epoch": 0,
+                "iterator": iter(job["train_loader"]) if job["epochs"] > 0 else None,
+                "loss_sum": 0.0, "correct": 0, "total": 0, "steps": 0,
+                "needs_final_test": False,
+                "done": job["epochs"] <= 0,
+                "compute_time": 0.0
+            })
+
+        start = time.perf_counter()
+        while True:
+            # Deadline'ı geçen işleri kapat
+            now = time.monotonic()
+            for job, state in zip(jobs, states):
+                if not state["done"] and job["deadline"] is not None and now >= job["deadline"]:
+                    self._stop_on_deadline(job, state, start)
+
+            active = [i for i, state in enumerate(states) if not state["done"]]
+            if not active:
+                break
+
+            batches = [next(states[i]["iterator"]) for i in active]
+            idx = torch.tensor(active, device=self.device)
+            points, labels, mask = self._stack_batches(batches)
+
+            # Forward + backward (modeller bağımsız: kayıpların toplamı her modele kendi gradyanını verir)
+            optimizer.zero_grad()
+            logits = stacked.forward(points, mask, idx, training=True)
+            A, B, C = logits.shape
+            per_sample = F.cross_entropy(logits.reshape(A * B, C), labels.reshape(A * B), reduction="none")
+            per_model = (per_sample.view(A, B) * mask).sum(1) / mask.sum(1)
+            per_model.sum().backward()
+
+            lrs = torch.tensor([jobs[i]["lr"] * 0.5 ** (states[i]["epoch"] // 20) for i in active],
+                               device=self.device)  # StepLR(step_size=20, gamma=0.5)
+            optimizer.step(idx, lrs)
+
+            # Metrikler
+            with torch.no_grad():
+                correct = ((logits.argmax(2) == labels).float() * mask).sum(1).tolist()
+            for a, i in enumerate(active):
+                state = states[i]
+                state["loss_sum"] += per_model[a].item()
+                state["correct"] += int(correct[a])
+                state["total"] += int(mask[a].sum().item())
+                state["steps"] += 1
+                state["history"]['steps'] += 1
+                if state["steps"] == len(jobs[i]["train_loader"]):
+                    self._end_epoch(i, jobs[i], state, stacked, criterion, start)
+
+        # Son ağırlıkları modellere yaz; deadline ile kesilenleri test et
+        for i, (job, state) in enumerate(zip(jobs, states)):
+            stacked.load_into(i, job["model"])
+            history = state["history"]
+            if state["needs_final_test"] or not history['test_acc']:
+                test_loss, test_acc = test(job["model"], job["test_loader"], criterion, self.device)
+                history['test_loss'].append(test_loss)
+                history['test_acc'].append(test_acc)
+                state["best_acc"] = max(state["best_acc"], test_acc)
+                if not history['train_acc']:
+                    history['train_loss'].append(0.0)
+                    history['train_acc'].append(0.0)
+
+        return [(state["history"], state["best_acc"], state["compute_time"]) for state in states]
+
+    def _stack_batches(self, batches):
+        """Farklı boydaki batch'leri [A, B_max, N, 3] + maske olarak yığ"""
+        B = max(len(labels) for _, labels in batches)
+        num_points = batches[0][0].shape[1]
+        points = torch.zeros(len(batches), B, num_points, 3, device=self.device)
+        labels = torch.zeros(len(batches), B, dtype=torch.long, device=self.device)
+        mask = torch.zeros(len(batches), B, device=self.device)
+        for a, (p, l) in enumerate(batches):
+            points[a, :len(l)] = p.to(self.device)
+            labels[a, :len(l)] = l.to(self.device)
+            mask[a, :len(l)] = 1.0
+        return points, labels, mask
+
+    def _epoch_metrics(self, state):
+        loss = state["loss_sum"] / max(state["steps"], 1)
+        acc = 100. * state["correct"] / state["total"] if state["total"] else 0.0
+        return loss, acc
+
+    def _end_epoch(self, i, job, state, stacked, criterion, start):
+        """train_model'deki epoch sonu: test, history, sonraki epoch"""
+        history = state["history"]
+        train_loss, train_acc = self._epoch_metrics(state)
+        stacked.load_into(i, job["model"])
+        test_loss, test_acc = test(job["model"], job["test_loader"], criterion, self.device)
+
+        history['train_loss'].append(train_loss)
+        history['train_acc'].append(train_acc)
+        history['test_loss'].append(test_loss)
+        history['test_acc'].append(test_acc)
+        state["best_acc"] = max(state["best_acc"], test_acc)
+
+        state["epoch"] += 1
+        print(f"[{job['label']}] Epoch {state['epoch']}/{job['epochs']} | "
+              f"Train Loss: {train_loss:.4f} Acc: {train_acc:.2f}% | "
+              f"Test Loss: {test_loss:.4f} Acc: {test_acc:.2f}%")
+
+        state.update(loss_sum=0.0, correct=0, total=0, steps=0)
+        if state["epoch"] >= job["epochs"]:
+            state["done"] = True
+            state["compute_time"] = time.perf_counter() - start
+        else:
+            state["iterator"] = iter(job["train_loader"])
+
+    def _stop_on_deadline(self, job, state, start):
+        """Deadline: kısmi epoch'u kaydet ve işi bitir"""
+        history = state["history"]
+        history['deadline_hit'] = True
+        if state["steps"] > 0:
+            train_loss, train_acc = self._epoch_metrics(state)
+            history['train_loss'].append(train_loss)
+            history['train_acc'].append(train_acc)
+            state["needs_final_test"] = True
+        print(f"[{job['label']}] Epoch {state['epoch']+1}/{job['epochs']} | "
+              f"Deadline: {history['steps']}/{history['planned_steps']} adım")
+        state["done"] = True
+        state["compute_time"] = time.perf_counter() - start
+
+def benchmark(num_models=5, batch_size=16, num_points=1024, steps=10):
+    """Sıralı (model başına ayrı Adam) vs yığılmış eğitim: toplam örnek/saniye"""
+    from model import get_model
+
+    models = [get_model() for _ in range(num_models)]
+    points = torch.randn(num_models, batch_size, num_points, 3)
+    labels = torch.randint(0, 2, (num_models, batch_size))
+    criterion = nn.CrossEntropyLoss()
+
+    # Doğruluk: eval modunda yığılmış forward tek tek modellerle aynı olmalı
+    stacked = StackedPointNet(models, "cpu")
+    idx = torch.arange(num_models)
+    with torch.no_grad():
+        expected = torch.stack([m.eval()(points[i]) for i, m in enumerate(models)])
+        got = stacked.forward(points, torch.ones(num_models, batch_size), idx, training=False)
+    print(f" Eval forward max fark: {(expected - got).abs().max().item():.2e}")
+
+    optimizers = [torch.optim.Adam(m.parameters(), lr=0.001, weight_decay=1e-4) for m in models]
+    start = time.perf_counter()
+    for _ in range(steps):
+        for i, (model, optimizer) in enumerate(zip(models, optimizers)):
+            model.train()
+            optimizer.zero_grad()
+            criterion(model(points[i]), labels[i]).backward()
+            optimizer.step()
+    sequential = time.perf_counter() - start
+
+    optimizer = StackedAdam(stacked.params, num_models)
+    mask = torch.ones(num_models, batch_size)
+    lrs = torch.full((num_models,), 0.001)
+    start = time.perf_counter()
+    for _ in range(steps):
+        optimizer.zero_grad()
+        logits = stacked.forward(points, mask, idx, training=True)
+        loss = F.cross_entropy(logits.reshape(-1, 2), labels.reshape(-1), reduction="none")
+        loss.view(num_models, batch_size).mean(1).sum().backward()
+        optimizer.step(idx, lrs)
+    vectorized = time.perf_counter() - start
+
+    samples = num_models * batch_size * steps
+    print(f" Sıralı:     {samples / sequential:7.1f} örnek/s ({sequential:.2f}s)")
+    print(f" Yığılmış:   {samples / vectorized:7.1f} örnek/s ({vectorized:.2f}s) "
+          f"-> x{sequential / vectorized:.2f}")
+
+if __name__ == "__main__":
+    import sys
+
+    num_models = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f" Vectorized training benchmark: {num_models} model")
+    benchmark(num_models=num_models)